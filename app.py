@@ -1,15 +1,38 @@
+import asyncio
 import base64
+import hmac
 import json
 import logging
 import os
 import random
 import re
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
 from contextlib import asynccontextmanager
 from datetime import date
+from glob import escape as glob_escape
 from http import HTTPStatus
 from io import BytesIO
+from itertools import accumulate
 from pathlib import Path
-from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+import content_hash
+import dropbox_client
+import fuzzy_match
+import group_catalog
+import hash_cache
+import hash_index
+import member_search
+import name_aliases
+import perceptual_hash
+import photo_index
+import photo_manifest
+import photo_pack
+import sessions
+import upload_queue
 
 
 try:
@@ -40,6 +63,7 @@ try:
         InlineKeyboardButton,
         InputMediaPhoto,
     )
+    from telegram.error import BadRequest
     from telegram.ext import (
         Application,
         CommandHandler,
@@ -66,6 +90,9 @@ except Exception:  # pragma: no cover - used only when telegram missing
             self.media = media
             self.caption = caption
 
+    class BadRequest(Exception):
+        pass
+
     class Application:
         @classmethod
         def builder(cls):
@@ -138,10 +165,20 @@ kpop_groups: Dict[str, List[str]] = {
 }
 
 AI_GROUPS_FILE = "top50_groups.json"
+# Другие написания групп и участников (хангыль, настоящие имена и т. п.),
+# см. name_aliases.py
+ALIASES_FILE = os.environ.get("ALIASES_FILE", "aliases.json")
 PHOTO_GAME_QUESTIONS = 20
 DROPBOX_ROOT = os.environ.get("DROPBOX_ROOT", "./dropbox_sync")
 UPLOAD_PASSWORD = os.environ.get("UPLOAD_PASSWORD")
 
+# Сколько опечаток прощается в ответе (для коротких имён меньше),
+# см. fuzzy_match.py; 0 — только точное совпадение
+ANSWER_TOLERANCE: Dict[str, int] = {
+    mode: int(os.environ.get(f"ANSWER_TOLERANCE_{mode.upper()}", default))
+    for mode, default in (("game", 3), ("photo_game", 2), ("learn", 1), ("find", 2))
+}
+
 # Ограничение по количеству загружаемых фото в сутки для одного пользователя
 UPLOAD_LIMIT_PER_DAY = 25
 USER_UPLOADS: Dict[int, Tuple[date, int]] = {}
@@ -174,77 +211,65 @@ _PLACEHOLDER_COVER_BYTES: bytes = base64.b64decode(
 )
 
 
-CHUNK_SIZE = 4 * 1024 * 1024  # 4MB used by Dropbox for content hashes
+_dropbox_content_hash = content_hash.hash_file
+_dropbox_content_hash_bytes = content_hash.hash_bytes
 
 
-def _dropbox_content_hash(path: Path) -> str:
-    """Compute the Dropbox content hash for ``path``."""
-    import hashlib
+_HASH_CACHE: Optional[hash_cache.HashCache] = None
 
-    hasher = hashlib.sha256()
-    with path.open("rb") as f:
-        while True:
-            chunk = f.read(CHUNK_SIZE)
-            if not chunk:
-                break
-            hasher.update(hashlib.sha256(chunk).digest())
-    return hasher.hexdigest()
 
+def file_hash_cache() -> hash_cache.HashCache:
+    """Кэш content hash локальных файлов (общий с ``sync_dropbox.py``)."""
+    global _HASH_CACHE
+    path = hash_cache.cache_path(Path(DROPBOX_ROOT) / "kpop_images")
+    if _HASH_CACHE is None or _HASH_CACHE.path != path:
+        _HASH_CACHE = hash_cache.HashCache.load(path, _dropbox_content_hash)
+    return _HASH_CACHE
 
-def _dropbox_content_hash_bytes(data: bytes) -> str:
-    """Compute the Dropbox content hash for raw ``data``."""
-    import hashlib
 
-    hasher = hashlib.sha256()
-    bio = BytesIO(data)
-    while True:
-        chunk = bio.read(CHUNK_SIZE)
-        if not chunk:
-            break
-        hasher.update(hashlib.sha256(chunk).digest())
-    return hasher.hexdigest()
+def _save_hash_cache() -> None:
+    try:
+        file_hash_cache().save()
+    except OSError:
+        logging.warning("Could not save file hash cache")
 
 
 def _ensure_cover_image(dbx: Optional["dropbox.Dropbox"] = None) -> Path:
     """Download the cover image from Dropbox if needed.
 
     Only downloads when the local file is missing or has different content
-    hash compared to Dropbox. Returns the local path to the image.
+    hash compared to Dropbox. The new file replaces the old one only after
+    its hash was verified. Returns the local path to the image.
+
+    Runs while the module is imported, so Dropbox calls are not retried:
+    without network the bot starts at once with the local (or placeholder)
+    cover instead of waiting out the backoff.
     """
 
     local_path = COVER_IMAGE_PATH
     local_path.parent.mkdir(parents=True, exist_ok=True)
+    rel_path = COVER_IMAGE_REMOTE_PATH.lstrip("/")
 
     if dbx is None:
-        try:
-            import dropbox  # type: ignore
-        except Exception:  # pragma: no cover - library missing
-            return local_path
-        app_key = os.environ.get("DROPBOX_APP_KEY")
-        app_secret = os.environ.get("DROPBOX_APP_SECRET")
-        refresh_token = os.environ.get("DROPBOX_REFRESH_TOKEN")
-        if not all([app_key, app_secret, refresh_token]):
-            return local_path
-        try:
-            dbx = dropbox.Dropbox(
-                app_key=app_key,
-                app_secret=app_secret,
-                oauth2_refresh_token=refresh_token,
-            )
-        except Exception:  # pragma: no cover - network/auth errors
+        dbx = dropbox_client.get_client()
+        if dbx is None:
             return local_path
 
     try:
-        metadata = dbx.files_get_metadata(COVER_IMAGE_REMOTE_PATH)
-        if local_path.exists():
-            try:
-                if _dropbox_content_hash(local_path) == metadata.content_hash:
-                    return local_path
-            except OSError:
-                pass
-        _, res = dbx.files_download(COVER_IMAGE_REMOTE_PATH)
-        with local_path.open("wb") as f:
-            f.write(res.content)
+        metadata = dropbox_client.call_with_backoff(
+            dbx, "files_get_metadata", COVER_IMAGE_REMOTE_PATH, max_retries=0
+        )
+        cache = file_hash_cache()
+        try:
+            if cache.hash_of(local_path, rel_path) == metadata.content_hash:
+                return local_path
+        except OSError:
+            pass
+        dropbox_client.download_file(
+            dbx, COVER_IMAGE_REMOTE_PATH, local_path, metadata.content_hash, max_retries=0
+        )
+        cache.put(local_path, rel_path, metadata.content_hash)
+        _save_hash_cache()
     except Exception:  # pragma: no cover - network/auth errors
         pass
     return local_path
@@ -276,46 +301,117 @@ def load_quiz_questions(path: str = QUIZ_FILE) -> List[Dict[str, str]]:
 
 QUIZ_POOL: List[Dict[str, str]] = load_quiz_questions()
 
+NAME_ALIASES = name_aliases.load_aliases(ALIASES_FILE)
 
-def _scan_dropbox_photos(root: Path = Path(DROPBOX_ROOT) / "kpop_images") -> Dict[str, List[str]]:
-    """Обходит локальную синхронизацию Dropbox и строит карту
-    ``нормализованное имя участника -> относительный путь к файлу``.
 
-    Для каждого каталога участницы берётся первый попавшийся файл.
-    В качестве ключей используются как полное имя папки, так и отдельные
-    токены, разделённые пробелами, что позволяет поддерживать сокращённые
-    варианты имён.
-    """
+def _scan_dropbox_photos(root: Path = Path(DROPBOX_ROOT) / "kpop_images") -> photo_index.PhotoIndex:
+    """Строит индекс ``(группа, участник) -> относительные пути к файлам``
+    по локальной синхронизации Dropbox.
 
-    mapping: Dict[str, List[str]] = {}
+    Список файлов берётся из манифеста (см. ``photo_manifest``): обычно это
+    одно чтение JSON и ``stat`` каждого каталога, а заново перечисляются
+    только каталоги, изменившиеся с прошлого запуска.
+    Сокращённые варианты имён (отдельные токены имени папки) индекс
+    хранит в таблице псевдонимов, см. ``photo_index``; папки, названные
+    другим написанием из ``ALIASES_FILE``, относятся к основному имени.
+    """
     if not root.exists():
-        return mapping
+        return photo_index.PhotoIndex(NAME_ALIASES)
+
+    prefix = str(root.relative_to(DROPBOX_ROOT)).replace("\\", "/")
+    manifest = photo_manifest.update_manifest(root)
+    return photo_index.PhotoIndex.build(
+        [
+            (group_name, name, [f"/{prefix}/{group_name}/{name}/{f}" for f in files])
+            for group_name, name, files in photo_manifest.iter_member_files(manifest)
+        ],
+        NAME_ALIASES,
+    )
 
-    for group_dir in root.iterdir():
-        if not group_dir.is_dir():
-            continue
-        for member_dir in group_dir.iterdir():
-            if not member_dir.is_dir():
-                continue
-            files = sorted(member_dir.iterdir())
-            if not files:
-                continue
-            rel_paths = [
-                str(f.relative_to(DROPBOX_ROOT)).replace("\\", "/")
-                for f in files
-            ]
-            name = member_dir.name
-            tokens = re.split(r"\s+", name)
-            candidates = {name, *tokens}
-            for cand in candidates:
-                norm = re.sub(r"[-_\s]", "", cand.lower())
-                lst = mapping.setdefault(norm, [])
-                for rel in rel_paths:
-                    lst.append(f"/{rel}")
-    return mapping
 
+PHOTO_INDEX = _scan_dropbox_photos()
 
-DROPBOX_PHOTOS = _scan_dropbox_photos()
+# Сколько байтов фото держать в памяти (по умолчанию 64 МБ, 0 — без кэша)
+PHOTO_CACHE_MAX_BYTES = int(os.environ.get("PHOTO_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+
+class PhotoByteCache:
+    """Общий LRU-кэш байтов фото с ограничением по суммарному размеру.
+
+    Ключ — относительный путь в ``DROPBOX_ROOT``. Файлы больше бюджета не
+    кэшируются; при переполнении вытесняются давно не использованные.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._items.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._items[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "items": len(self._items),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+PHOTO_CACHE = PhotoByteCache(PHOTO_CACHE_MAX_BYTES)
+
+
+def reload_dropbox_photos() -> None:
+    """Перестраивает карту фото после повторной синхронизации
+    и сбрасывает кэш байтов, чтобы не отдавать устаревшие файлы."""
+    global PHOTO_INDEX, _HASH_INDEX, _PHASH_INDEX, _HASH_CACHE, _PHOTO_PACK
+    PHOTO_INDEX = _scan_dropbox_photos(Path(DROPBOX_ROOT) / "kpop_images")
+    PHOTO_CACHE.clear()
+    FILENAME_ALLOCATOR.reset()
+    _HASH_INDEX = None
+    _PHASH_INDEX = None
+    _HASH_CACHE = None
+    _PHOTO_PACK = None
 
 
 def load_ai_kpop_groups(path: str = AI_GROUPS_FILE) -> Dict[str, List[str]]:
@@ -360,12 +456,6 @@ correct_grnames: Dict[str, str] = {
 #  УТИЛИТЫ
 # =======================
 
-def dictionary_to_list(dictionary: Dict[str, List[str]]) -> List[str]:
-    all_values: List[str] = []
-    for _k, value in dictionary.items():
-        all_values.extend(value)
-    return all_values
-
 def norm_group_key(s: str) -> str:
     """Normalize user-provided group names.
 
@@ -375,34 +465,6 @@ def norm_group_key(s: str) -> str:
     """
     return " ".join(s.lower().split())
 
-def build_pretty_map(
-    groups: Dict[str, List[str]], names_map: Optional[Dict[str, str]] = None
-) -> Dict[str, str]:
-    """Строит словарь допустимых названий групп -> ключ словаря."""
-    mapping: Dict[str, str] = {}
-    for k in groups.keys():
-        low = k.lower()
-        mapping[low] = k
-        mapping[low.replace(" ", "")] = k
-    if names_map:
-        for key, pretty in names_map.items():
-            low = pretty.lower()
-            mapping[low] = key
-            mapping[low.replace(" ", "")] = key
-    return mapping
-
-
-def build_member_map(groups: Dict[str, List[str]]) -> Dict[str, Set[str]]:
-    """Создаёт словарь ``имя участника -> множество групп``,
-    чтобы корректно обрабатывать случаи, когда одно и то же имя
-    встречается в нескольких группах.
-    Сопоставление выполняется в нижнем регистре."""
-    member_map: Dict[str, Set[str]] = {}
-    for group_key, members in groups.items():
-        for member in members:
-            member_map.setdefault(member.lower(), set()).add(group_key)
-    return member_map
-
 # --- Load and merge AI-generated groups ------------------------------------
 ai_kpop_groups_raw: Optional[Dict[str, List[str]]] = load_ai_kpop_groups() or None
 ai_kpop_groups: Optional[Dict[str, List[str]]]
@@ -420,8 +482,18 @@ ALL_GROUPS: Dict[str, List[str]] = {**kpop_groups}
 if ai_kpop_groups:
     ALL_GROUPS.update(ai_kpop_groups)
 
+# Каталоги для игр компилируются один раз при загрузке и разделяются всеми
+# сессиями (см. group_catalog.py)
+BASE_CATALOG = group_catalog.Catalog.compile(kpop_groups, correct_grnames, NAME_ALIASES)
+AI_CATALOG: Optional[group_catalog.Catalog] = (
+    group_catalog.Catalog.compile(ai_kpop_groups, ai_correct_grnames, NAME_ALIASES)
+    if ai_kpop_groups
+    else None
+)
+ALL_CATALOG = group_catalog.Catalog.compile(ALL_GROUPS, correct_grnames, NAME_ALIASES)
+
 # Быстрые словари для сопоставления "красивого" названия -> ключ группы
-PRETTY_TO_KEY: Dict[str, str] = {v.lower(): k for k, v in correct_grnames.items()}
+PRETTY_TO_KEY: Mapping[str, str] = ALL_CATALOG.pretty_map
 
 def menu_keyboard() -> InlineKeyboardMarkup:
     entries = [
@@ -533,138 +605,549 @@ def upload_members_keyboard(group_key: str) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(buttons)
 
 
-def _next_member_filename(group_key: str, member: str, suffix: str) -> str:
-    """Возвращает имя файла вида ``{member}__NN{suffix}`` с незанятым номером."""
-    member_dir = Path(DROPBOX_ROOT) / "kpop_images" / group_key / member
-    member_dir.mkdir(parents=True, exist_ok=True)
+def _member_number_pattern(member: str) -> "re.Pattern[str]":
+    # В Dropbox имена могут быть в исходном регистре, локально — в нижнем
+    return re.compile(rf"^{re.escape(member)}__([0-9]{{2}})", re.IGNORECASE)
 
-    used: Set[int] = set()
-    pattern = re.compile(rf"^{re.escape(member)}__([0-9]{{2}})")
 
-    # локальные файлы
-    for file in member_dir.glob(f"{member}__*"):
-        m = pattern.match(file.stem)
-        if m:
-            try:
+class MemberFilenameAllocator:
+    """Выдаёт свободные номера ``{member}__NN`` без запросов к Dropbox.
+
+    Занятые номера каждой папки участника считываются из локальной папки
+    один раз и дальше ведутся в памяти; выданный номер сразу считается
+    занятым, поэтому параллельные загрузки одному участнику не получат
+    одинаковых имён. С Dropbox номера сверяются лениво — при конфликте
+    имён во время загрузки (см. ``reconcile``) и после синхронизации
+    (``reset``).
+    """
+
+    def __init__(self) -> None:
+        self._used: Dict[str, Set[int]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _numbers(member: str, names: Iterable[str]) -> Set[int]:
+        pattern = _member_number_pattern(member)
+        used: Set[int] = set()
+        for name in names:
+            m = pattern.match(Path(name).stem)
+            if m:
                 used.add(int(m.group(1)))
-            except ValueError:
-                continue
+        return used
 
-    # файлы в Dropbox (если доступно API)
-    try:
-        import dropbox  # type: ignore
-
-        app_key = os.environ.get("DROPBOX_APP_KEY")
-        app_secret = os.environ.get("DROPBOX_APP_SECRET")
-        refresh_token = os.environ.get("DROPBOX_REFRESH_TOKEN")
-        if all([app_key, app_secret, refresh_token]):
-            dbx = dropbox.Dropbox(
-                app_key=app_key,
-                app_secret=app_secret,
-                oauth2_refresh_token=refresh_token,
-            )
-            remote_folder = f"/kpop_images/{group_key}/{member}"
+    def _used_for(self, member_dir: Path, member: str) -> Set[int]:
+        key = str(member_dir)
+        used = self._used.get(key)
+        if used is None:
             try:
-                res = dbx.files_list_folder(remote_folder)
-                while True:
-                    for entry in res.entries:
-                        if isinstance(entry, dropbox.files.FileMetadata):
-                            m = pattern.match(Path(entry.name).stem)
-                            if m:
-                                try:
-                                    used.add(int(m.group(1)))
-                                except ValueError:
-                                    continue
-                    if res.has_more:
-                        res = dbx.files_list_folder_continue(res.cursor)
-                    else:
-                        break
-            except Exception:
-                pass
-    except Exception:
-        pass
+                names = [p.name for p in member_dir.glob(f"{glob_escape(member)}__*")]
+            except OSError:
+                names = []
+            used = self._used[key] = self._numbers(member, names)
+        return used
+
+    def allocate(self, member_dir: Path, member: str, suffix: str) -> str:
+        with self._lock:
+            used = self._used_for(member_dir, member)
+            idx = 1
+            while idx in used:
+                idx += 1
+            used.add(idx)
+        return f"{member}__{idx:02d}{suffix}"
+
+    def release(self, member_dir: Path, member: str, filename: str) -> None:
+        with self._lock:
+            self._used_for(member_dir, member).difference_update(
+                self._numbers(member, [filename])
+            )
+
+    def reconcile(self, member_dir: Path, member: str, names: Iterable[str]) -> None:
+        """Помечает занятыми номера из ``names`` (например, листинга Dropbox)."""
+        with self._lock:
+            self._used_for(member_dir, member).update(self._numbers(member, names))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._used.clear()
+
+
+FILENAME_ALLOCATOR = MemberFilenameAllocator()
+
+
+def _member_dir(group_key: str, member: str) -> Path:
+    """Локальная папка участника.
+
+    Путь в нижнем регистре, как ``path_lower`` в листинге Dropbox: иначе
+    синхронизация скачает загруженное фото второй раз под другим путём.
+    """
+    return Path(DROPBOX_ROOT) / "kpop_images" / group_key.lower() / member.lower()
+
+
+def _next_member_filename(group_key: str, member: str, suffix: str) -> str:
+    """Возвращает имя файла вида ``{member}__NN{suffix}`` (в нижнем регистре)
+    с незанятым номером."""
+    member_dir = _member_dir(group_key, member)
+    member_dir.mkdir(parents=True, exist_ok=True)
+    return FILENAME_ALLOCATOR.allocate(member_dir, member.lower(), suffix)
+
+
+def _remote_member_filenames(dbx, group_key: str, member: str) -> List[str]:
+    """Имена файлов участника в Dropbox."""
+    file_metadata = dropbox_client.dropbox.files.FileMetadata
+    names: List[str] = []
+    res = dropbox_client.call_with_backoff(
+        dbx, "files_list_folder", f"/kpop_images/{group_key}/{member}"
+    )
+    while True:
+        names.extend(e.name for e in res.entries if isinstance(e, file_metadata))
+        if not res.has_more:
+            return names
+        res = dropbox_client.call_with_backoff(dbx, "files_list_folder_continue", res.cursor)
+
+
+class DuplicatePhotoError(FileExistsError):
+    """Фото с таким же содержимым уже есть в библиотеке по пути ``path``."""
+
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        self.path = path
+
+    @property
+    def owner(self) -> Tuple[str, str]:
+        """``(группа, участник)``, у которых уже лежит это фото."""
+        parts = self.path.split("/")
+        return (parts[-3], parts[-2]) if len(parts) >= 3 else ("", "")
+
+
+class NearDuplicatePhotoError(DuplicatePhotoError):
+    """В библиотеке есть визуально почти такое же фото (пережатое,
+    уменьшенное и т.п.); ``distance`` — расстояние Хэмминга между dHash."""
 
-    idx = 1
-    while idx in used:
-        idx += 1
-    return f"{member}__{idx:02d}{suffix}"
+    def __init__(self, path: str, distance: int) -> None:
+        super().__init__(path)
+        self.distance = distance
+
+
+# Максимальное расстояние между dHash, при котором фото считаются копиями
+NEAR_DUPLICATE_THRESHOLD = int(
+    os.environ.get("NEAR_DUPLICATE_THRESHOLD", perceptual_hash.DEFAULT_THRESHOLD)
+)
+
+# Удерживается, пока меняются файлы библиотеки и индексы: при сохранении
+# фото пользователя, переименовании при загрузке и удалении файлов
+# фоновой синхронизацией.
+LIBRARY_LOCK = threading.RLock()
+
+_HASH_INDEX: Optional[hash_index.ContentHashIndex] = None
+_PHASH_INDEX: Optional[perceptual_hash.PerceptualIndex] = None
+
+
+def photo_hash_index() -> hash_index.ContentHashIndex:
+    """Индекс ``content hash -> пути`` для всей библиотеки фото.
+
+    Загружается один раз; при загрузке досчитываются хеши файлов, которых
+    в индексе ещё нет (например, после ручного копирования).
+    """
+    global _HASH_INDEX
+    images_root = Path(DROPBOX_ROOT) / "kpop_images"
+    path = hash_index.index_path(images_root)
+    if _HASH_INDEX is None or _HASH_INDEX.path != path:
+        index = hash_index.ContentHashIndex.load(path)
+        manifest = photo_manifest.update_manifest(images_root)
+        root = Path(DROPBOX_ROOT)
+        cache = file_hash_cache()
+        index.reconcile(
+            root,
+            (
+                f"kpop_images/{group}/{member}/{name}"
+                for group, member, files in photo_manifest.iter_member_files(manifest)
+                for name in files
+            ),
+            lambda file_path: cache.hash_of(file_path, file_path.relative_to(root).as_posix()),
+        )
+        try:
+            index.save()
+        except OSError:
+            logging.warning("Could not save photo hash index to %s", path)
+        _save_hash_cache()
+        _HASH_INDEX = index
+    return _HASH_INDEX
+
+
+def photo_phash_index() -> perceptual_hash.PerceptualIndex:
+    """Индекс перцептивных хешей (dHash) всей библиотеки фото."""
+    global _PHASH_INDEX
+    images_root = Path(DROPBOX_ROOT) / "kpop_images"
+    if _PHASH_INDEX is None or _PHASH_INDEX.path != perceptual_hash.index_path(images_root):
+        index = perceptual_hash.load_library_index(Path(DROPBOX_ROOT))
+        try:
+            index.save()
+        except OSError:
+            logging.warning("Could not save perceptual hash index to %s", index.path)
+        _PHASH_INDEX = index
+    return _PHASH_INDEX
 
 
 def save_user_photo(group_key: str, member: str, data: bytes, suffix: str) -> bool:
     """Сохраняет фото локально и в Dropbox.
 
-    Raises ``FileExistsError`` если в каталоге уже есть файл с таким же
-    содержимым. Возвращает ``True`` при успешном сохранении.
+    Raises ``DuplicatePhotoError`` (подкласс ``FileExistsError``), если
+    такое же фото уже есть в библиотеке — у этого или другого участника,
+    и ``NearDuplicatePhotoError``, если есть его пережатая или уменьшенная
+    копия. Возвращает ``True`` при успешном сохранении.
     """
-    local_dir = Path(DROPBOX_ROOT) / "kpop_images" / group_key / member
+    local_dir = _member_dir(group_key, member)
     local_dir.mkdir(parents=True, exist_ok=True)
 
-    # Проверяем, нет ли уже такого файла по content hash
     new_hash = _dropbox_content_hash_bytes(data)
-    for file in local_dir.iterdir():
+    phash = perceptual_hash.dhash_bytes(data)
+
+    # Проверка на дубликаты и запись — под одной блокировкой: иначе два
+    # одинаковых фото, загруженных одновременно, оба пройдут проверку.
+    # Индексы берём здесь же, чтобы синхронизация не подменила их между
+    # проверкой и записью; она же не удалит файл, пока он не в очереди.
+    with LIBRARY_LOCK:
+        # Проверяем, нет ли уже такого файла по content hash
+        index = photo_hash_index()
+        existing = index.lookup(new_hash)
+        if existing:
+            raise DuplicatePhotoError(existing[0])
+        phashes = photo_phash_index() if phash is not None else None
+        if phashes is not None:
+            near = phashes.search(phash, NEAR_DUPLICATE_THRESHOLD)  # type: ignore[arg-type]
+            if near:
+                distance, near_path = near[0]
+                raise NearDuplicatePhotoError(near_path, distance)
+
+        filename = _next_member_filename(group_key, member, suffix)
+        local_path = local_dir / filename
         try:
-            existing_hash = _dropbox_content_hash(file)
+            with local_path.open("wb") as f:
+                f.write(data)
         except OSError:
-            continue
-        if existing_hash == new_hash:
-            raise FileExistsError
+            FILENAME_ALLOCATOR.release(local_dir, member.lower(), filename)
+            return False
+
+        # Обновляем локальную карту
+        rel_path = str(local_path.relative_to(DROPBOX_ROOT)).replace("\\", "/")
+        PHOTO_INDEX.add(group_key, member, f"/{rel_path}")
+        PHOTO_CACHE.invalidate(f"/{rel_path}")
+        photo_manifest.update_manifest(Path(DROPBOX_ROOT) / "kpop_images")
+        index.add(rel_path, new_hash)
+        file_hash_cache().put(local_path, rel_path, new_hash)
+        pack = library_pack()
+        if pack is not None:
+            try:
+                pack.append(rel_path, data, local_path.stat().st_mtime_ns)
+            except OSError:
+                logging.warning("Could not add %s to the photo pack", rel_path)
+        if phashes is not None:
+            phashes.add(rel_path, phash)  # type: ignore[arg-type]
+        try:
+            index.save()
+            if phashes is not None:
+                phashes.save()
+        except OSError:
+            logging.warning("Could not save photo hash indexes")
+        _save_hash_cache()
+
+        # Загрузку в Dropbox выполнит фоновый обработчик очереди
+        try:
+            photo_upload_queue().enqueue(rel_path)
+        except OSError:
+            logging.exception("Could not queue %s for Dropbox upload", rel_path)
+        return True
+
+
+# =======================
+#  ОЧЕРЕДЬ ЗАГРУЗКИ В DROPBOX
+# =======================
+
+def photo_upload_queue() -> upload_queue.UploadQueue:
+    return upload_queue.UploadQueue(upload_queue.queue_dir(Path(DROPBOX_ROOT) / "kpop_images"))
 
-    filename = _next_member_filename(group_key, member, suffix)
-    local_path = local_dir / filename
+
+def _is_upload_conflict(exc: Exception) -> bool:
+    error = getattr(exc, "error", None)
     try:
-        with local_path.open("wb") as f:
-            f.write(data)
-    except OSError:
+        return bool(error.is_path() and error.get_path().reason.is_conflict())
+    except AttributeError:
         return False
 
-    # Обновляем локальную карту
-    rel_path = str(local_path.relative_to(DROPBOX_ROOT)).replace("\\", "/")
-    norm = re.sub(r"[-_\s]", "", member.lower())
-    DROPBOX_PHOTOS.setdefault(norm, []).append(f"/{rel_path}")
 
-    # Попытка загрузить в Dropbox
-    try:
-        import dropbox  # type: ignore
-        app_key = os.environ.get("DROPBOX_APP_KEY")
-        app_secret = os.environ.get("DROPBOX_APP_SECRET")
-        refresh_token = os.environ.get("DROPBOX_REFRESH_TOKEN")
-        if all([app_key, app_secret, refresh_token]):
-            dbx = dropbox.Dropbox(
-                app_key=app_key,
-                app_secret=app_secret,
-                oauth2_refresh_token=refresh_token,
+def _rename_local_photo(old_rel: str, new_rel: str) -> None:
+    """Переименовывает загруженное фото и обновляет все индексы."""
+    with LIBRARY_LOCK:
+        root = Path(DROPBOX_ROOT)
+        os.replace(root / old_rel, root / new_rel)
+        PHOTO_INDEX.rename(f"/{old_rel}", f"/{new_rel}")
+        PHOTO_CACHE.invalidate(f"/{old_rel}")
+        photo_manifest.update_manifest(root / "kpop_images")
+        photo_upload_queue().retarget(old_rel, new_rel)
+        index = photo_hash_index()
+        content_hash = index.hash_of(old_rel)
+        if content_hash:
+            index.remove(old_rel)
+            index.add(new_rel, content_hash)
+            index.save()
+            cache = file_hash_cache()
+            cache.discard(old_rel)
+            cache.put(root / new_rel, new_rel, content_hash)
+            _save_hash_cache()
+        if _PHASH_INDEX is not None and old_rel in _PHASH_INDEX.hashes:
+            phash = _PHASH_INDEX.hashes[old_rel]
+            _PHASH_INDEX.remove(old_rel)
+            _PHASH_INDEX.add(new_rel, phash)
+            _PHASH_INDEX.save()
+        pack = library_pack()
+        if pack is not None:
+            pack.rename(old_rel, new_rel)
+
+
+def upload_photo_to_dropbox(rel_path: str) -> str:
+    """Загружает локальный файл ``rel_path`` в Dropbox по тому же пути.
+
+    Если в Dropbox уже есть другой файл с таким именем (его загрузили с
+    другой машины), номера участника сверяются с Dropbox, локальный файл
+    получает свободное имя и загрузка повторяется. Возвращает итоговый
+    путь. Бросает исключение, если загрузку стоит повторить позже.
+    """
+    dbx = dropbox_client.get_client()
+    if dbx is None:
+        raise RuntimeError("Dropbox is not configured")
+    files = dropbox_client.dropbox.files
+    for _ in range(3):
+        data = (Path(DROPBOX_ROOT) / rel_path).read_bytes()
+        try:
+            dropbox_client.call_with_backoff(
+                dbx, "files_upload", data, f"/{rel_path}", mode=files.WriteMode.add, autorename=False
             )
-            remote_path = f"/kpop_images/{group_key}/{member}/{filename}"
-            dbx.files_upload(data, remote_path, mode=dropbox.files.WriteMode.overwrite)
-    except Exception:
-        pass
+            return rel_path
+        except Exception as exc:
+            if not _is_upload_conflict(exc):
+                raise
+        remote = dropbox_client.call_with_backoff(dbx, "files_get_metadata", f"/{rel_path}")
+        if getattr(remote, "content_hash", None) == _dropbox_content_hash_bytes(data):
+            return rel_path  # то же фото уже в Dropbox (например, до перезапуска)
+        _, group_key, member, filename = rel_path.split("/")
+        member_dir = Path(DROPBOX_ROOT) / "kpop_images" / group_key / member
+        FILENAME_ALLOCATOR.reconcile(
+            member_dir, member, _remote_member_filenames(dbx, group_key, member)
+        )
+        new_name = FILENAME_ALLOCATOR.allocate(member_dir, member, Path(filename).suffix)
+        new_rel = f"kpop_images/{group_key}/{member}/{new_name}"
+        _rename_local_photo(rel_path, new_rel)
+        logging.info("Name conflict in Dropbox: %s renamed to %s", rel_path, new_rel)
+        rel_path = new_rel
+    raise RuntimeError(f"Could not find a free name in Dropbox for {rel_path}")
+
+
+_UPLOAD_WAKEUP: Optional[asyncio.Event] = None
+
+
+def notify_upload_worker() -> None:
+    """Будит фоновый обработчик после постановки нового задания."""
+    if _UPLOAD_WAKEUP is not None:
+        _UPLOAD_WAKEUP.set()
+
+
+async def process_upload_queue() -> int:
+    """Загружает все задания, время которых пришло. Возвращает число успешных."""
+    queue = photo_upload_queue()
+    uploaded = 0
+    for job in queue.due():
+        rel_path = str(job["path"])
+        try:
+            await asyncio.to_thread(upload_photo_to_dropbox, rel_path)
+        except FileNotFoundError:
+            logging.warning("Dropping upload of missing file %s", rel_path)
+            queue.complete(job)
+        except Exception as exc:
+            # Конфликт имён мог переименовать файл до ошибки: берём путь
+            # из задания на диске, а не устаревшую копию в памяти
+            job = queue.refresh(job)
+            if not queue.retry_later(job, repr(exc)):
+                logging.error("Giving up uploading %s: %r", job["path"], exc)
+        else:
+            queue.complete(job)
+            uploaded += 1
+    return uploaded
+
+
+async def run_upload_worker(idle_interval: float = 60.0) -> None:
+    """Бесконечный цикл фоновой загрузки фото в Dropbox."""
+    global _UPLOAD_WAKEUP
+    _UPLOAD_WAKEUP = asyncio.Event()
+    while True:
+        try:
+            await process_upload_queue()
+        except Exception:
+            logging.exception("Upload worker iteration failed")
+        wait = photo_upload_queue().next_due_in()
+        timeout = idle_interval if wait is None else min(wait, idle_interval)
+        try:
+            await asyncio.wait_for(_UPLOAD_WAKEUP.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        _UPLOAD_WAKEUP.clear()
+
+
+# =======================
+#  ФОНОВАЯ СИНХРОНИЗАЦИЯ С DROPBOX
+# =======================
+
+# Период синхронизации в секундах; 0 — только по запросу через /admin/sync
+DROPBOX_SYNC_INTERVAL = float(os.environ.get("DROPBOX_SYNC_INTERVAL", "0"))
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+_SYNC_RUN_LOCK = threading.Lock()
+_SYNC_WAKEUP: Optional[asyncio.Event] = None
+_SYNC_FULL_REQUESTED = False
+SYNC_STATUS: Dict[str, object] = {
+    "running": False,
+    "last_started": None,
+    "last_finished": None,
+    "last_result": None,
+    "last_error": None,
+}
+
+
+def sync_library(full: bool = False) -> Dict[str, int]:
+    """Синхронизирует папку с Dropbox и подменяет карту фото новой.
+
+    Выполняется в отдельном потоке: пока идёт синхронизация, обработчики
+    работают со старой картой, новая подставляется одним присваиванием.
+    """
+    import sync_dropbox  # требует Dropbox SDK
+
+    dbx = dropbox_client.get_client()
+    if dbx is None:
+        raise RuntimeError("Dropbox is not configured")
+    with _SYNC_RUN_LOCK:
+        progress = sync_dropbox.sync_folder(
+            dbx, sync_dropbox.REMOTE_FOLDER, Path(DROPBOX_ROOT), full=full, lock=LIBRARY_LOCK
+        )
+        if progress.downloaded or progress.removed:
+            pack = library_pack()
+            if pack is not None:
+                images_root = Path(DROPBOX_ROOT) / "kpop_images"
+                pack.update(Path(DROPBOX_ROOT), photo_manifest.library_paths(images_root))
+            with LIBRARY_LOCK:
+                reload_dropbox_photos()
+            if progress.removed and FILE_ID_CACHE.prune():
+                FILE_ID_CACHE.flush()
+    return {
+        "files": progress.total,
+        "downloaded": progress.downloaded,
+        "removed": progress.removed,
+        "failed": progress.failed,
+    }
+
+
+def request_library_sync(full: bool = False) -> bool:
+    """Просит фоновый обработчик синхронизироваться как можно скорее.
+
+    Несколько запросов подряд сливаются в одну синхронизацию. Возвращает
+    ``False``, если обработчик не запущен.
+    """
+    global _SYNC_FULL_REQUESTED
+    if _SYNC_WAKEUP is None:
+        return False
+    _SYNC_FULL_REQUESTED = _SYNC_FULL_REQUESTED or full
+    _SYNC_WAKEUP.set()
     return True
 
+
+async def run_library_sync(full: bool = False) -> None:
+    SYNC_STATUS.update(running=True, last_started=time.time())
+    try:
+        result = await asyncio.to_thread(sync_library, full)
+    except Exception as exc:
+        logging.exception("Dropbox sync failed")
+        SYNC_STATUS.update(last_error=repr(exc))
+    else:
+        SYNC_STATUS.update(last_result=result, last_error=None)
+    finally:
+        SYNC_STATUS.update(running=False, last_finished=time.time())
+
+
+async def run_sync_worker(interval: float = DROPBOX_SYNC_INTERVAL) -> None:
+    """Бесконечный цикл синхронизации: раз в ``interval`` секунд (если он
+    задан) и по ``request_library_sync``."""
+    global _SYNC_WAKEUP, _SYNC_FULL_REQUESTED
+    _SYNC_WAKEUP = asyncio.Event()
+    while True:
+        try:
+            await asyncio.wait_for(_SYNC_WAKEUP.wait(), interval or None)
+        except asyncio.TimeoutError:
+            pass
+        _SYNC_WAKEUP.clear()
+        full, _SYNC_FULL_REQUESTED = _SYNC_FULL_REQUESTED, False
+        await run_library_sync(full)
+
+
+# Уведомления Dropbox об изменениях (вебхук): синхронизация запускается через
+# DROPBOX_WEBHOOK_DEBOUNCE секунд после последнего уведомления, но не позже
+# чем через DROPBOX_WEBHOOK_MAX_DELAY после первого.
+DROPBOX_APP_SECRET = os.environ.get("DROPBOX_APP_SECRET", "")
+DROPBOX_WEBHOOK_DEBOUNCE = float(os.environ.get("DROPBOX_WEBHOOK_DEBOUNCE", "5"))
+DROPBOX_WEBHOOK_MAX_DELAY = 60.0
+
+_WEBHOOK_TIMER: Optional[asyncio.TimerHandle] = None
+_WEBHOOK_PENDING_SINCE: Optional[float] = None
+
+
+def verify_dropbox_signature(body: bytes, signature: Optional[str]) -> bool:
+    """Проверяет ``X-Dropbox-Signature`` (HMAC-SHA256 тела с app secret)."""
+    if not DROPBOX_APP_SECRET or not signature:
+        return False
+    expected = hmac.new(DROPBOX_APP_SECRET.encode(), body, "sha256").hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def _fire_webhook_sync() -> None:
+    global _WEBHOOK_TIMER, _WEBHOOK_PENDING_SINCE
+    _WEBHOOK_TIMER = None
+    _WEBHOOK_PENDING_SINCE = None
+    if not request_library_sync():
+        logging.warning("Dropbox webhook received but the sync worker is not running")
+
+
+def schedule_webhook_sync() -> None:
+    """Откладывает синхронизацию, чтобы серия уведомлений дала одну."""
+    global _WEBHOOK_TIMER, _WEBHOOK_PENDING_SINCE
+    loop = asyncio.get_running_loop()
+    now = loop.time()
+    if _WEBHOOK_PENDING_SINCE is None:
+        _WEBHOOK_PENDING_SINCE = now
+    if _WEBHOOK_TIMER is not None:
+        _WEBHOOK_TIMER.cancel()
+    deadline = _WEBHOOK_PENDING_SINCE + DROPBOX_WEBHOOK_MAX_DELAY
+    delay = max(0.0, min(DROPBOX_WEBHOOK_DEBOUNCE, deadline - now))
+    _WEBHOOK_TIMER = loop.call_later(delay, _fire_webhook_sync)
+
+
+def _admin_authorized(req) -> bool:
+    """Проверяет ``ADMIN_TOKEN`` из ``X-Admin-Token`` или ``Authorization: Bearer``."""
+    if not ADMIN_TOKEN:
+        return False
+    token = req.headers.get("x-admin-token")
+    if token is None:
+        scheme, _, value = req.headers.get("authorization", "").partition(" ")
+        token = value if scheme.lower() == "bearer" else ""
+    return hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
 # =======================
 #  СОСТОЯНИЕ ПОЛЬЗОВАТЕЛЯ
 # =======================
-# user_data схема:
+# user_data схема (классы сессий — в sessions.py):
 # {
-#   "mode": "idle" | "find" | "game" | "learn_menu" | "learn_train" | "quiz",
-#   "game": {
-#       "members": list[str],
-#       "index": int,
-#       "score": int,
-#       "current_member": str | None
-#   },
-#   "quiz": {
-#       "questions": list[dict],
-#       "index": int,
-#       "score": int,
-#       "current": dict | None,
-#       "total": int,
-#   },
-#   "learn": {
-#       "group_key": str,
-#       "to_learn": list[str],
-#       "known": set[str],
-#       "current": str | None
-#   }
+#   "mode": "idle" | "find" | "game" | "ai_game" | "photo_game" | "quiz"
+#           | "catalog" | "learn_menu" | "learn_train" | ...,
+#   "game": GameSession | PhotoGameSession,
+#   "quiz": QuizSession,
+#   "learn": LearnSession,
+#   "catalog": CatalogSession,
 # }
 
 def reset_state(context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -673,62 +1156,385 @@ def reset_state(context: ContextTypes.DEFAULT_TYPE) -> None:
 
 # ----- Игра «Угадай группу»
 
-def _init_game(
-    context: ContextTypes.DEFAULT_TYPE,
-    groups: Dict[str, List[str]],
-    names_map: Optional[Dict[str, str]] = None,
-) -> None:
-    all_members = dictionary_to_list(groups)
-    sample_size = min(10, len(all_members))
-    random_members = random.sample(all_members, sample_size)
+def _init_game(context: ContextTypes.DEFAULT_TYPE, catalog: group_catalog.Catalog) -> None:
+    """Начинает игру по готовому каталогу: выбираются только 10 имён."""
+    sample_size = min(10, len(catalog.members))
+    random_members = random.sample(catalog.members, sample_size)
     context.user_data["mode"] = "game"
-    context.user_data["game"] = {
-        "members": random_members,
-        "index": 0,
-        "score": 0,
-        "current_member": None,
-        "groups": groups,
-        "pretty_map": build_pretty_map(groups, names_map),
-        "member_map": build_member_map(groups),
-        "total": sample_size,
-    }
+    context.user_data["game"] = sessions.GameSession(
+        members=random_members, catalog=catalog, total=sample_size
+    )
 
 
 def start_game(context: ContextTypes.DEFAULT_TYPE) -> bool:
-    _init_game(context, kpop_groups, correct_grnames)
+    _init_game(context, BASE_CATALOG)
     return True
 
 
 def start_ai_game(context: ContextTypes.DEFAULT_TYPE) -> bool:
     """Инициализирует режим игры с ИИ."""
-    if not ai_kpop_groups:
+    if AI_CATALOG is None:
         return False
-    _init_game(context, ai_kpop_groups, ai_correct_grnames)
+    _init_game(context, AI_CATALOG)
     context.user_data["mode"] = "ai_game"
     return True
 
 
-def fetch_dropbox_images(name: str) -> List[bytes]:
-    """Возвращает все изображения участника из локальной папки Dropbox."""
-    norm = re.sub(r"[-_\s]", "", name.lower())
-    rel_paths = DROPBOX_PHOTOS.get(norm, [])
-    images: List[bytes] = []
-    for rel_path in rel_paths:
-        file_path = Path(DROPBOX_ROOT) / rel_path.lstrip("/")
+def member_photo_paths(name: str, group: Optional[str] = None) -> Sequence[str]:
+    """Относительные пути ко всем фото участника (файлы не читаются).
+
+    Если группа известна, берутся фото только этого участника группы;
+    без неё — фото всех участников с таким именем.
+    """
+    if group is not None:
+        return PHOTO_INDEX.paths(group, name)
+    return PHOTO_INDEX.lookup(name)
+
+
+# Фото можно отдавать из pack-файла через mmap (см. photo_pack.py)
+PHOTO_PACK_ENABLED = os.environ.get("PHOTO_PACK", "") == "1"
+_PHOTO_PACK: Optional[photo_pack.PhotoPack] = None
+
+
+def library_pack() -> Optional[photo_pack.PhotoPack]:
+    """Pack-файл библиотеки или ``None``, если он отключён."""
+    global _PHOTO_PACK
+    if not PHOTO_PACK_ENABLED:
+        return None
+    path = photo_pack.index_path(Path(DROPBOX_ROOT) / "kpop_images")
+    if _PHOTO_PACK is None or _PHOTO_PACK.index_file != path:
+        _PHOTO_PACK = photo_pack.PhotoPack.load(path)
+    return _PHOTO_PACK
+
+
+def read_dropbox_photo(rel_path: str) -> Optional[bytes | memoryview]:
+    """Читает одно фото по относительному пути или возвращает ``None``.
+
+    При включённом pack-файле возвращает ``memoryview`` без копирования,
+    если копия в pack совпадает с файлом по размеру и mtime (файл мог
+    смениться после сборки pack); иначе повторные чтения обслуживаются из
+    ``PHOTO_CACHE``.
+    """
+    file_path = Path(DROPBOX_ROOT) / rel_path.lstrip("/")
+    pack = library_pack()
+    if pack is not None:
         try:
-            with open(file_path, "rb") as f:
-                images.append(f.read())
+            st = file_path.stat()
         except OSError:
-            continue
+            return None
+        view = pack.get(rel_path.lstrip("/"), st)
+        if view is not None:
+            return view
+    data = PHOTO_CACHE.get(rel_path)
+    if data is not None:
+        return data
+    try:
+        with open(file_path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    PHOTO_CACHE.put(rel_path, data)
+    return data
+
+
+def fetch_dropbox_images(name: str, group: Optional[str] = None) -> List[bytes | memoryview]:
+    """Возвращает все изображения участника из локальной папки Dropbox."""
+    images: List[bytes | memoryview] = []
+    for rel_path in member_photo_paths(name, group):
+        img = read_dropbox_photo(rel_path)
+        if img is not None:
+            images.append(img)
     return images
 
 
-def fetch_dropbox_image(name: str) -> Optional[bytes]:
+def pick_dropbox_photos(name: str, count: int, group: Optional[str] = None) -> List[str]:
+    """До ``count`` различных случайных путей к фото участника.
+
+    Выбор идёт только по индексу путей, файлы не читаются.
+    """
+    paths = member_photo_paths(name, group)
+    return random.sample(paths, min(count, len(paths)))
+
+
+def pick_dropbox_photo(name: str, group: Optional[str] = None) -> Optional[str]:
+    """Случайный путь к фото участника или ``None``."""
+    paths = member_photo_paths(name, group)
+    return random.choice(paths) if paths else None
+
+
+def fetch_dropbox_sample(
+    name: str, count: int, group: Optional[str] = None
+) -> List[bytes | memoryview]:
+    """До ``count`` различных случайных фото участника.
+
+    Читаются только выбранные файлы; если какой-то из них пропал с диска,
+    вместо него берётся следующий кандидат.
+    """
+    paths = member_photo_paths(name, group)
+    picked = random.sample(paths, min(count, len(paths)))
+    tried = set(picked)
+    images: List[bytes | memoryview] = []
+    while picked:
+        img = read_dropbox_photo(picked.pop())
+        if img is not None:
+            images.append(img)
+        elif len(tried) < len(paths):
+            # Файл пропал — берём ещё одного случайного кандидата
+            candidate = random.choice(paths)
+            while candidate in tried:
+                candidate = random.choice(paths)
+            tried.add(candidate)
+            picked.append(candidate)
+    return images
+
+
+def fetch_dropbox_image(name: str, group: Optional[str] = None) -> Optional[bytes | memoryview]:
     """Возвращает случайное изображение участника или ``None``."""
-    images = fetch_dropbox_images(name)
-    if not images:
-        return None
-    return random.choice(images)
+    images = fetch_dropbox_sample(name, 1, group)
+    return images[0] if images else None
+
+
+# ----- Кэш Telegram file_id ------------------------------------------------
+
+TELEGRAM_FILE_ID_CACHE_FILE = "telegram_file_ids.json"
+# Через сколько секунд после отправки фото сохранять кэш file_id на диск:
+# все отправки за это время записываются одним файлом
+FILE_ID_FLUSH_DELAY = float(os.environ.get("FILE_ID_FLUSH_DELAY", "5"))
+
+# Фото для отправки: относительный путь в DROPBOX_ROOT или сами байты
+PhotoSource = str | bytes | memoryview
+
+
+class TelegramFileIdCache:
+    """Постоянный кэш ``content hash -> Telegram file_id``.
+
+    После первой отправки Telegram возвращает ``file_id``, по которому то же
+    фото можно отправить повторно без загрузки байтов. Для файлов на диске
+    дополнительно запоминается ``путь -> (size, mtime_ns, hash)``, поэтому
+    неизменённый файл даже не читается; если файл изменился, меняется его
+    хеш и старый ``file_id`` больше не используется.
+
+    ``hash_for_path`` вызывается из пула потоков, поэтому словари меняются
+    только под ``_lock``, а на диск пишется их снимок. Запись откладывается
+    (``schedule_flush``) и идёт в пуле потоков, а не после каждой отправки.
+    """
+
+    def __init__(self) -> None:
+        self._path: Optional[Path] = None
+        self._dirty = False
+        self._lock = threading.RLock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self.file_ids: Dict[str, str] = {}
+        self.paths: Dict[str, List] = {}
+
+    def _ensure_loaded(self) -> None:
+        path = Path(DROPBOX_ROOT) / photo_manifest.STATE_DIR_NAME / TELEGRAM_FILE_ID_CACHE_FILE
+        with self._lock:
+            if path == self._path:
+                return
+            self._path = path
+            self._dirty = False
+            self.file_ids, self.paths = {}, {}
+            try:
+                with path.open("r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self.file_ids = dict(data.get("file_ids", {}))
+                self.paths = dict(data.get("paths", {}))
+            except (OSError, ValueError, AttributeError):
+                pass
+
+    def hash_for_path(
+        self, rel_path: str
+    ) -> Tuple[Optional[str], Optional[bytes | memoryview]]:
+        """Возвращает ``(hash, data)``; ``data`` равно ``None``, если файл
+        не пришлось читать. Для отсутствующего файла — ``(None, None)``."""
+        self._ensure_loaded()
+        file_path = Path(DROPBOX_ROOT) / rel_path.lstrip("/")
+        try:
+            st = file_path.stat()
+        except OSError:
+            return None, None
+        with self._lock:
+            known = self.paths.get(rel_path)
+        if known and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+            return known[2], None
+        PHOTO_CACHE.invalidate(rel_path)
+        data = read_dropbox_photo(rel_path)
+        if data is None:
+            return None, None
+        content_hash = _dropbox_content_hash_bytes(data)
+        with self._lock:
+            self.paths[rel_path] = [st.st_size, st.st_mtime_ns, content_hash]
+            self._dirty = True
+        return content_hash, data
+
+    def get(self, content_hash: str) -> Optional[str]:
+        self._ensure_loaded()
+        with self._lock:
+            return self.file_ids.get(content_hash)
+
+    def remember(self, content_hash: str, file_id: str) -> None:
+        self._ensure_loaded()
+        with self._lock:
+            if self.file_ids.get(content_hash) != file_id:
+                self.file_ids[content_hash] = file_id
+                self._dirty = True
+
+    def forget(self, content_hash: str) -> None:
+        self._ensure_loaded()
+        with self._lock:
+            if self.file_ids.pop(content_hash, None) is not None:
+                self._dirty = True
+
+    def prune(self) -> int:
+        """Убирает записи о файлах, которых больше нет на диске."""
+        self._ensure_loaded()
+        root = Path(DROPBOX_ROOT)
+        with self._lock:
+            known = list(self.paths)
+        gone = [rel for rel in known if not (root / rel.lstrip("/")).exists()]
+        with self._lock:
+            for rel in gone:
+                self.paths.pop(rel, None)
+            if gone:
+                self._dirty = True
+        return len(gone)
+
+    def flush(self) -> None:
+        """Пишет снимок кэша на диск (вызывать вне цикла событий)."""
+        with self._lock:
+            if not self._dirty or self._path is None:
+                return
+            path = self._path
+            snapshot = {"file_ids": dict(self.file_ids), "paths": dict(self.paths)}
+            self._dirty = False
+        try:
+            photo_manifest.write_json_atomic(path, snapshot)
+        except OSError:
+            with self._lock:
+                self._dirty = True
+            logging.warning("Could not save Telegram file_id cache to %s", path)
+
+    def schedule_flush(self, delay: Optional[float] = None) -> None:
+        """Сохраняет кэш через ``delay`` секунд в пуле потоков; пока запись
+        запланирована, новые вызовы ничего не делают."""
+        if self._flush_task is not None and not self._flush_task.done():
+            return
+        delay = FILE_ID_FLUSH_DELAY if delay is None else delay
+
+        async def later() -> None:
+            await asyncio.sleep(delay)
+            await asyncio.to_thread(self.flush)
+
+        try:
+            self._flush_task = asyncio.get_running_loop().create_task(later())
+        except RuntimeError:  # нет цикла событий — пишем сразу
+            self.flush()
+
+
+FILE_ID_CACHE = TelegramFileIdCache()
+
+
+async def _photo_payload(
+    source: PhotoSource,
+) -> Tuple[Optional[str], Optional[bytes | memoryview]]:
+    """``(hash, data)`` для отправки фото; хеширование и чтение файла идут
+    в пуле потоков, чтобы не блокировать цикл событий."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return await content_hash.hash_bytes_async(source), source
+    return await asyncio.to_thread(FILE_ID_CACHE.hash_for_path, source)
+
+
+def _sent_file_id(message) -> Optional[str]:
+    """``file_id`` самого большого размера из ответа Telegram."""
+    photos = getattr(message, "photo", None)
+    if photos:
+        return getattr(photos[-1], "file_id", None)
+    return None
+
+
+async def reply_photo_cached(msg, source: PhotoSource, **kwargs) -> bool:
+    """``reply_photo``, использующий сохранённый ``file_id`` вместо загрузки.
+
+    Возвращает ``False``, если фото не удалось прочитать.
+    """
+    content_hash, data = await _photo_payload(source)
+    if content_hash is None:
+        return False
+    file_id = FILE_ID_CACHE.get(content_hash)
+    if file_id:
+        try:
+            await msg.reply_photo(file_id, **kwargs)
+            return True
+        except BadRequest:
+            # file_id мог устареть (например, сменился бот) — загрузим заново.
+            # Сетевые ошибки и таймауты id не портят, их пробрасываем.
+            FILE_ID_CACHE.forget(content_hash)
+    if data is None:
+        data = await asyncio.to_thread(read_dropbox_photo, source)  # type: ignore[arg-type]
+        if data is None:
+            return False
+    sent = await msg.reply_photo(BytesIO(data), **kwargs)
+    file_id = _sent_file_id(sent)
+    if file_id:
+        FILE_ID_CACHE.remember(content_hash, file_id)
+    FILE_ID_CACHE.schedule_flush()
+    return True
+
+
+async def reply_media_group_cached(
+    msg, photos: List[Tuple[PhotoSource, Optional[str]]]
+) -> None:
+    """``reply_media_group`` для пар ``(фото, подпись)`` с кэшем ``file_id``."""
+    entries: List[Tuple[str, Optional[bytes | memoryview], PhotoSource, Optional[str]]] = []
+    payloads = await asyncio.gather(*(_photo_payload(source) for source, _ in photos))
+    for (source, caption), (content_hash, data) in zip(photos, payloads):
+        if content_hash is not None:
+            entries.append((content_hash, data, source, caption))
+    if not entries:
+        return
+
+    async def build(use_cache: bool) -> Tuple[List[InputMediaPhoto], List[str]]:
+        """Альбом и хеши его фото; пропавшие с диска фото пропускаются."""
+        media: List[InputMediaPhoto] = []
+        hashes: List[str] = []
+        for i, (content_hash, data, source, caption) in enumerate(entries):
+            file_id = FILE_ID_CACHE.get(content_hash) if use_cache else None
+            if file_id:
+                media.append(InputMediaPhoto(file_id, caption=caption))
+                hashes.append(content_hash)
+                continue
+            if data is None:
+                data = await asyncio.to_thread(read_dropbox_photo, source)  # type: ignore[arg-type]
+                if data is None:
+                    continue
+                entries[i] = (content_hash, data, source, caption)
+            media.append(InputMediaPhoto(BytesIO(data), caption=caption))
+            hashes.append(content_hash)
+        return media, hashes
+
+    used_cache = any(FILE_ID_CACHE.get(h) for h, *_ in entries)
+    media, hashes = await build(use_cache=True)
+    if not media:
+        return
+    try:
+        sent = await msg.reply_media_group(media)
+    except BadRequest:
+        if not used_cache:
+            raise
+        # Telegram не говорит, какой из id устарел: загружаем все фото
+        # заново, их новые id заменят старые
+        for content_hash, *_ in entries:
+            FILE_ID_CACHE.forget(content_hash)
+        media, hashes = await build(use_cache=False)
+        if not media:
+            return
+        sent = await msg.reply_media_group(media)
+    for content_hash, message in zip(hashes, sent or []):
+        file_id = _sent_file_id(message)
+        if file_id:
+            FILE_ID_CACHE.remember(content_hash, file_id)
+    FILE_ID_CACHE.schedule_flush()
 
 
 def start_quiz(context: ContextTypes.DEFAULT_TYPE) -> bool:
@@ -738,105 +1544,116 @@ def start_quiz(context: ContextTypes.DEFAULT_TYPE) -> bool:
     sample_size = min(10, len(QUIZ_POOL))
     questions = random.sample(QUIZ_POOL, sample_size)
     context.user_data["mode"] = "quiz"
-    context.user_data["quiz"] = {
-        "questions": questions,
-        "index": 0,
-        "score": 0,
-        "current": None,
-        "total": sample_size,
-    }
+    context.user_data["quiz"] = sessions.QuizSession(questions=questions, total=sample_size)
     return True
 def next_quiz_question(context: ContextTypes.DEFAULT_TYPE) -> Optional[Dict[str, str]]:
     """Возвращает следующий вопрос квиза."""
-    g = context.user_data.get("quiz", {})
-    idx: int = g.get("index", 0)
-    questions: List[Dict[str, str]] = g.get("questions", [])
-    if idx >= len(questions):
+    g: Optional[sessions.QuizSession] = context.user_data.get("quiz")
+    if g is None or g.index >= len(g.questions):
         return None
-    q = questions[idx]
-    g["current"] = q
-    context.user_data["quiz"] = g
-    return q
+    g.current = g.questions[g.index]
+    return g.current
 
 
 async def ask_quiz_question(msg, question: Dict[str, str], prefix: str = "") -> None:
     """Отправляет пользователю вопрос квиза, при наличии иллюстрации."""
     text = f"{prefix}{question['question']}"
     idol = question.get("idol")
-    img = fetch_dropbox_image(idol) if idol else None
-    if img:
-        await msg.reply_photo(BytesIO(img), caption=text, reply_markup=in_game_keyboard())
-    else:
-        await msg.reply_text(text, reply_markup=in_game_keyboard())
+    photo = pick_dropbox_photo(idol) if idol else None
+    if photo and await reply_photo_cached(msg, photo, caption=text, reply_markup=in_game_keyboard()):
+        return
+    await msg.reply_text(text, reply_markup=in_game_keyboard())
 
 
 def start_photo_game(context: ContextTypes.DEFAULT_TYPE) -> bool:
-    """Инициализирует игру "Угадай по фото" с загрузкой из Dropbox."""
-    all_members = list({m for members in ALL_GROUPS.values() for m in members})
-    items: List[Dict[str, bytes | str]] = []
+    """Инициализирует игру "Угадай по фото".
+
+    Выбор идёт по индексу путей ``PHOTO_INDEX``: в сессии хранятся только
+    имя и путь к файлу, а само изображение читается перед отправкой.
+    Тёзки из разных групп — разные участники со своими фото.
+    """
+    all_members = list(
+        dict.fromkeys((group, m) for group, members in ALL_GROUPS.items() for m in members)
+    )
+    available: List[Tuple[str, Sequence[str]]] = []
     missing: List[str] = []
-    for name in all_members:
-        imgs = fetch_dropbox_images(name)
-        if imgs:
-            for img in imgs:
-                items.append({"image": img, "name": name})
+    for group, name in all_members:
+        paths = member_photo_paths(name, group)
+        if paths:
+            available.append((name, paths))
         else:
             missing.append(name)
-    if len(items) < PHOTO_GAME_QUESTIONS:
+    offsets = list(accumulate(len(paths) for _, paths in available))
+    total = offsets[-1] if offsets else 0
+    if total < PHOTO_GAME_QUESTIONS:
         if missing:
             logging.warning("Missing Dropbox images for: %s", ", ".join(missing))
         return False
     # выбираем ровно PHOTO_GAME_QUESTIONS уникальных случайных фото
-    items = random.sample(items, PHOTO_GAME_QUESTIONS)
+    items: List[sessions.PhotoItem] = []
+    for pos in random.sample(range(total), PHOTO_GAME_QUESTIONS):
+        i = bisect_right(offsets, pos)
+        name, paths = available[i]
+        items.append(sessions.PhotoItem(name, paths[pos - (offsets[i] - len(paths))]))
     context.user_data["mode"] = "photo_game"
-    context.user_data["game"] = {
-        "items": items,
-        "index": 0,
-        "score": 0,
-        "current": None,
-        "total": len(items),
-    }
+    context.user_data["game"] = sessions.PhotoGameSession(items=items, total=len(items))
     return True
 
 
-def next_photo(context: ContextTypes.DEFAULT_TYPE) -> Optional[Dict[str, bytes | str]]:
-    g = context.user_data.get("game", {})
-    idx: int = g.get("index", 0)
-    items: List[Dict[str, bytes | str]] = g.get("items", [])
-    if idx >= len(items):
+def next_photo(context: ContextTypes.DEFAULT_TYPE) -> Optional[sessions.PhotoItem]:
+    g: Optional[sessions.PhotoGameSession] = context.user_data.get("game")
+    if g is None or g.index >= len(g.items):
         return None
-    item = items[idx]
-    g["current"] = item
-    context.user_data["game"] = g
-    return item
+    g.current = g.items[g.index]
+    return g.current
+
+
+async def send_photo_question(msg, item: sessions.PhotoItem) -> None:
+    """Отправляет фото из игры, читая с диска только этот файл."""
+    if not await reply_photo_cached(
+        msg, item.path, caption="Кто это?", reply_markup=in_game_keyboard()
+    ):
+        await msg.reply_text("Кто это? (фото недоступно)", reply_markup=in_game_keyboard())
 
 def next_question(context: ContextTypes.DEFAULT_TYPE) -> Optional[str]:
-    g = context.user_data.get("game", {})
-    idx: int = g.get("index", 0)
-    members: List[str] = g.get("members", [])
-    total: int = g.get("total", len(members))
-    if idx >= total:
+    g: Optional[sessions.GameSession] = context.user_data.get("game")
+    if g is None or g.index >= g.total:
         return None
-    member = members[idx]
-    g["current_member"] = member
-    context.user_data["game"] = g
-    return member
+    g.current_member = g.members[g.index]
+    return g.current_member
 
 
 def finish_text(context: ContextTypes.DEFAULT_TYPE) -> str:
-    g = context.user_data.get("game", {})
-    score = g.get("score", 0)
-    total = g.get("total", 10)
+    g = context.user_data.get("game")
+    score = g.score if g is not None else 0
+    total = g.total if g is not None else 10
     return f"Игра окончена! Ты угадал {score} из {total}."
 
 
-def progress_text(g: Dict[str, int]) -> str:
+def progress_text(
+    g: sessions.GameSession | sessions.PhotoGameSession | sessions.QuizSession,
+) -> str:
     """Return a text snippet with current score and remaining questions."""
-    total = g.get("total", 0)
-    score = g.get("score", 0)
-    index = g.get("index", 0)
-    remaining = max(total - index, 0)
-    return f"Правильных ответов: {score} из {total}. Осталось вопросов: {remaining}."
+    remaining = max(g.total - g.index, 0)
+    return f"Правильных ответов: {g.score} из {g.total}. Осталось вопросов: {remaining}."
+
+
+FIND_HEADERS = {
+    "prefix": "Нашлись участники:",
+    "fuzzy": "Возможно, вы имели в виду:",
+}
+
+
+def find_text(result: member_search.SearchResult) -> str:
+    """Ответ режима «Найти участника»: все группы с этим именем и есть ли фото."""
+    if not result.hits:
+        return "Такой участник не найден"
+    lines = [FIND_HEADERS[result.kind]] if result.kind in FIND_HEADERS else []
+    for hit in result.hits:
+        title = ALL_CATALOG.titles[hit.group]
+        photos = "есть фото" if PHOTO_INDEX.has_photos(hit.group, hit.member) else "фото пока нет"
+        lines.append(f"{hit.member} — участник группы *{title}* ({photos})")
+    return "\n".join(lines)
 
 
 async def launch_game(
@@ -916,12 +1733,7 @@ async def launch_photo_game(query, context: ContextTypes.DEFAULT_TYPE) -> None:
         reply_markup=in_game_keyboard(),
     )
     if item:
-        img: bytes = item["image"]  # type: ignore[assignment]
-        await query.message.reply_photo(
-            BytesIO(img),
-            caption="Кто это?",
-            reply_markup=in_game_keyboard(),
-        )
+        await send_photo_question(query.message, item)
 
 # ----- Каталог фото --------------------------------------------------------
 
@@ -956,9 +1768,7 @@ def catalog_groups_keyboard() -> InlineKeyboardMarkup:
     row: List[InlineKeyboardButton] = []
     for key in correct_grnames.keys():
         members = ALL_GROUPS.get(key, [])
-        has_photo = any(
-            re.sub(r"[-_\s]", "", m.lower()) in DROPBOX_PHOTOS for m in members
-        )
+        has_photo = any(PHOTO_INDEX.has_photos(key, m) for m in members)
         if not has_photo:
             continue
         title = correct_grnames[key]
@@ -974,27 +1784,28 @@ def catalog_groups_keyboard() -> InlineKeyboardMarkup:
 
 def build_catalog_for_group(
     group_key: str, groups: Dict[str, List[str]] = ALL_GROUPS
-) -> List[Dict[str, bytes | str]]:
-    """Собирает фотографии участников выбранной группы в случайном порядке."""
-    items: List[Dict[str, bytes | str]] = []
+) -> List[sessions.CatalogItem]:
+    """Собирает фотографии участников выбранной группы в случайном порядке.
+
+    В каталоге хранятся только пути: файл читается перед отправкой.
+    """
+    items: List[sessions.CatalogItem] = []
     for name in groups.get(group_key, []):
-        imgs = fetch_dropbox_images(name)
-        for img in imgs:
-            items.append({"image": img, "name": name, "group": group_key})
+        for path in member_photo_paths(name, group_key):
+            items.append(sessions.CatalogItem(path, name, group_key))
     random.shuffle(items)
     return items
 
 
 def build_catalog_random(
     groups: Dict[str, List[str]] = ALL_GROUPS,
-) -> List[Dict[str, bytes | str]]:
+) -> List[sessions.CatalogItem]:
     """Собирает фотографии всех участников во всех группах в случайном порядке."""
-    items: List[Dict[str, bytes | str]] = []
+    items: List[sessions.CatalogItem] = []
     for group_key, members in groups.items():
         for name in members:
-            imgs = fetch_dropbox_images(name)
-            for img in imgs:
-                items.append({"image": img, "name": name, "group": group_key})
+            for path in member_photo_paths(name, group_key):
+                items.append(sessions.CatalogItem(path, name, group_key))
     random.shuffle(items)
     return items
 
@@ -1004,11 +1815,7 @@ def start_random_catalog(context: ContextTypes.DEFAULT_TYPE) -> bool:
     if not items:
         return False
     context.user_data["mode"] = "catalog"
-    context.user_data["catalog"] = {
-        "items": items,
-        "index": 0,
-        "mode": "random",
-    }
+    context.user_data["catalog"] = sessions.CatalogSession(items=items, mode="random")
     return True
 
 
@@ -1019,40 +1826,37 @@ def start_group_catalog(
     if not items:
         return False
     context.user_data["mode"] = "catalog"
-    context.user_data["catalog"] = {
-        "items": items,
-        "index": 0,
-        "mode": "group",
-        "group": group_key,
-    }
+    context.user_data["catalog"] = sessions.CatalogSession(
+        items=items, mode="group", group=group_key
+    )
     return True
 
 
 def next_catalog_item(
     context: ContextTypes.DEFAULT_TYPE,
-) -> Optional[Dict[str, bytes | str]]:
-    catalog = context.user_data.get("catalog", {})
-    idx: int = catalog.get("index", 0)
-    items: List[Dict[str, bytes | str]] = catalog.get("items", [])
-    if idx >= len(items):
+) -> Optional[sessions.CatalogItem]:
+    catalog: Optional[sessions.CatalogSession] = context.user_data.get("catalog")
+    if catalog is None or catalog.index >= len(catalog.items):
         return None
-    item = items[idx]
-    catalog["index"] = idx + 1
-    context.user_data["catalog"] = catalog
+    item = catalog.items[catalog.index]
+    catalog.index += 1
     return item
 
+
+async def send_catalog_photo(msg, item: sessions.CatalogItem, caption: str) -> None:
+    """Отправляет фото каталога, читая с диска только этот файл."""
+    if not await reply_photo_cached(
+        msg, item.path, caption=caption, reply_markup=catalog_nav_keyboard()
+    ):
+        await msg.reply_text(f"{caption} (фото недоступно)", reply_markup=catalog_nav_keyboard())
+
 # ----- Режим обучения
 
 def start_learn_session(context: ContextTypes.DEFAULT_TYPE, group_key: str) -> None:
     members = list(ALL_GROUPS[group_key])
     random.shuffle(members)  # случайный порядок
     context.user_data["mode"] = "learn_train"
-    context.user_data["learn"] = {
-        "group_key": group_key,
-        "to_learn": members,
-        "known": set(),    # уже верно названные имена (в нижнем регистре)
-        "current": None,
-    }
+    context.user_data["learn"] = sessions.LearnSession(group_key=group_key, to_learn=members)
 
 def _alpha_positions(s: str) -> List[int]:
     return [i for i, ch in enumerate(s) if ch.isalpha()]
@@ -1137,16 +1941,14 @@ def make_unique_mask_for_group_member(name: str, group_members: List[str]) -> st
     return _build_mask(name, fallback)
 
 def pick_next_to_guess(context: ContextTypes.DEFAULT_TYPE) -> Optional[str]:
-    data = context.user_data.get("learn", {})
-    to_learn: List[str] = data.get("to_learn", [])
-    known: set[str] = data.get("known", set())  # type: ignore
-    remaining = [m for m in to_learn if m.lower() not in known]
+    data: Optional[sessions.LearnSession] = context.user_data.get("learn")
+    if data is None:
+        return None
+    remaining = [m for m in data.to_learn if m.lower() not in data.known]
     if not remaining:
         return None
-    member = random.choice(remaining)
-    data["current"] = member
-    context.user_data["learn"] = data
-    return member
+    data.current = random.choice(remaining)
+    return data.current
 
 # =======================
 #  ХЕНДЛЕРЫ PTB
@@ -1154,8 +1956,9 @@ def pick_next_to_guess(context: ContextTypes.DEFAULT_TYPE) -> Optional[str]:
 
 async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     reset_state(context)
-    await update.message.reply_photo(
-        BytesIO(COVER_IMAGE_BYTES),
+    await reply_photo_cached(
+        update.message,
+        COVER_IMAGE_BYTES,
         caption="Добро пожаловать в K-pop игру!! Выбери действие:",
         reply_markup=menu_keyboard(),
     )
@@ -1172,8 +1975,9 @@ async def on_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
             await query.edit_message_reply_markup(reply_markup=None)
         except Exception:
             pass
-        await query.message.reply_photo(
-            BytesIO(COVER_IMAGE_BYTES),
+        await reply_photo_cached(
+            query.message,
+            COVER_IMAGE_BYTES,
             caption="Меню:",
             reply_markup=menu_keyboard(),
         )
@@ -1253,12 +2057,7 @@ async def on_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
             reply_markup=catalog_nav_keyboard(),
         )
         if item:
-            img: bytes = item["image"]  # type: ignore[assignment]
-            await query.message.reply_photo(
-                BytesIO(img),
-                caption=item["name"],
-                reply_markup=catalog_nav_keyboard(),
-            )
+            await send_catalog_photo(query.message, item, item.name)
         return
 
     if data == "catalog_random":
@@ -1274,14 +2073,8 @@ async def on_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
             reply_markup=catalog_nav_keyboard(),
         )
         if item:
-            cap = (
-                f"{item['name']} из группы "
-                f"{correct_grnames.get(item['group'], item['group'])}"
-            )
-            img: bytes = item["image"]  # type: ignore[assignment]
-            await query.message.reply_photo(
-                BytesIO(img), caption=cap, reply_markup=catalog_nav_keyboard()
-            )
+            cap = f"{item.name} из группы {correct_grnames.get(item.group, item.group)}"
+            await send_catalog_photo(query.message, item, cap)
         return
 
     if data == "catalog_next":
@@ -1293,16 +2086,13 @@ async def on_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
             )
             return
         await query.edit_message_reply_markup(reply_markup=None)
-        mode = context.user_data.get("catalog", {}).get("mode")
+        catalog = context.user_data.get("catalog")
         caption = (
-            item["name"]
-            if mode == "group"
-            else f"{item['name']} из группы {correct_grnames.get(item['group'], item['group'])}"
-        )
-        img: bytes = item["image"]  # type: ignore[assignment]
-        await query.message.reply_photo(
-            BytesIO(img), caption=caption, reply_markup=catalog_nav_keyboard()
+            item.name
+            if catalog is not None and catalog.mode == "group"
+            else f"{item.name} из группы {correct_grnames.get(item.group, item.group)}"
         )
+        await send_catalog_photo(query.message, item, caption)
         return
 
     # --- Загрузка пользовательских фото
@@ -1407,16 +2197,16 @@ async def on_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         members = ALL_GROUPS[group_key]
         lines = [f"{correct_grnames[group_key]}: {', '.join(members)}"]
 
-        media: List[InputMediaPhoto] = []
+        photos: List[Tuple[PhotoSource, Optional[str]]] = []
         for m in members:
-            img = fetch_dropbox_image(m)
-            if img:
-                media.append(InputMediaPhoto(BytesIO(img), caption=m))
+            photo = pick_dropbox_photo(m, group_key)
+            if photo:
+                photos.append((photo, m))
 
         # Сначала отправляем галерею, затем текст с составом
         await query.edit_message_reply_markup(reply_markup=None)
-        if media:
-            await query.message.reply_media_group(media[:10])
+        if photos:
+            await reply_media_group_cached(query.message, photos[:10])
 
         text = "Состав группы:\n\n" + "\n".join(lines)
         await query.message.reply_text(
@@ -1445,10 +2235,9 @@ async def on_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         masked = make_unique_mask_for_group_member(member, ALL_GROUPS[group_key])
 
         await query.edit_message_reply_markup(reply_markup=None)
-        imgs = fetch_dropbox_images(member)
-        if imgs:
-            media = [InputMediaPhoto(BytesIO(i)) for i in imgs[:10]]
-            await query.message.reply_media_group(media)
+        picked = pick_dropbox_photos(member, 10, group_key)
+        if picked:
+            await reply_media_group_cached(query.message, [(p, None) for p in picked])
         await query.message.reply_text(
             f"Группа: {correct_grnames[group_key]}\n"
             f"Угадайте участника: <code>{masked}</code>\n\n"
@@ -1483,28 +2272,24 @@ async def on_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 
     # --- Найти участника
     if mode == "find":
-        member = text.title()
-        for group_key, members in ALL_GROUPS.items():
-            if member in members:
-                await update.message.reply_text(
-                    f"{member} — участник группы *{correct_grnames.get(group_key, group_key)}*",
-                    reply_markup=back_keyboard(),
-                    parse_mode="Markdown"
-                )
-                break
-        else:
-            await update.message.reply_text("Такой участник не найден", reply_markup=back_keyboard())
+        result = ALL_CATALOG.search.search(text, ANSWER_TOLERANCE["find"])
+        await update.message.reply_text(
+            find_text(result), reply_markup=back_keyboard(), parse_mode="Markdown"
+        )
         return
 
     # --- Квиз на знание k-pop
     if mode == "quiz":
-        g = context.user_data.get("quiz", {})
-        current = g.get("current")
+        g = context.user_data.get("quiz")
+        if g is None:
+            reset_state(context)
+            await update.message.reply_text("Меню:", reply_markup=menu_keyboard())
+            return
+        current = g.current
         if current is None:
             q = next_quiz_question(context)
             if q is None:
-                score = g.get("score", 0)
-                total = g.get("total", 0)
+                score, total = g.score, g.total
                 await update.message.reply_text(
                     f"Квиз завершён! Ты ответил правильно на {score} из {total}.",
                     reply_markup=back_keyboard(),
@@ -1514,17 +2299,15 @@ async def on_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
                 await ask_quiz_question(update.message, q)
             return
 
-        is_correct = text.lower() == current.get("answer", "").lower()
+        is_correct = fuzzy_match.fold(text) == fuzzy_match.fold(current.get("answer", ""))
         feedback = "Верно!" if is_correct else "Неверно!"
         if is_correct:
-            g["score"] = g.get("score", 0) + 1
-        g["index"] = g.get("index", 0) + 1
-        context.user_data["quiz"] = g
+            g.score += 1
+        g.index += 1
         stats = progress_text(g)
         next_q = next_quiz_question(context)
         if next_q is None:
-            score = g.get("score", 0)
-            total = g.get("total", 0)
+            score, total = g.score, g.total
             final = f"Квиз завершён! Ты ответил правильно на {score} из {total}."
             if score < total:
                 final += (
@@ -1544,9 +2327,9 @@ async def on_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 
     # --- Игра «Угадай группу»
     if mode in ("game", "ai_game"):
-        g = context.user_data.get("game", {})
-        member = g.get("current_member")
-        if member is None:
+        g = context.user_data.get("game")
+        member = g.current_member if g is not None else None
+        if g is None or member is None:
             member = next_question(context)
             if member is None:
                 await update.message.reply_text(finish_text(context), reply_markup=back_keyboard())
@@ -1559,20 +2342,12 @@ async def on_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
             return
 
         # Допускаем 2 формы ввода: ключ ("twice") или красивое имя ("Blackpink")
-        answer_key = norm_group_key(text)
-        pretty_map = g.get("pretty_map", PRETTY_TO_KEY)
-        member_map = g.get("member_map", {})
-
-        mapped_key = pretty_map.get(answer_key)
-        is_correct = False
-        if mapped_key and mapped_key in member_map.get(member.lower(), set()):
-            is_correct = True
+        is_correct = g.catalog.is_answer(member, norm_group_key(text), ANSWER_TOLERANCE["game"])
 
         feedback = "Верно!" if is_correct else "Неверно!"
         if is_correct:
-            g["score"] = g.get("score", 0) + 1
-        g["index"] = g.get("index", 0) + 1
-        context.user_data["game"] = g
+            g.score += 1
+        g.index += 1
 
         stats = progress_text(g)
         next_m = next_question(context)
@@ -1591,9 +2366,9 @@ async def on_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 
     # --- Игра "Угадай по фото"
     if mode == "photo_game":
-        g = context.user_data.get("game", {})
-        current = g.get("current")
-        if current is None:
+        g = context.user_data.get("game")
+        current = g.current if g is not None else None
+        if g is None or current is None:
             item = next_photo(context)
             if item is None:
                 await update.message.reply_text(
@@ -1601,19 +2376,15 @@ async def on_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
                 )
                 reset_state(context)
                 return
-            img: bytes = item["image"]  # type: ignore[assignment]
-            await update.message.reply_photo(
-                BytesIO(img), caption="Кто это?", reply_markup=in_game_keyboard()
-            )
+            await send_photo_question(update.message, item)
             return
-        answer = text.lower()
-        correct = str(current["name"]).lower()
-        is_correct = answer == correct
-        feedback = "Верно!" if is_correct else f"Неверно! Это {current['name']}"
+        is_correct = fuzzy_match.accepts(
+            text, current.name, ANSWER_TOLERANCE["photo_game"], ALL_CATALOG.member_index
+        )
+        feedback = "Верно!" if is_correct else f"Неверно! Это {current.name}"
         if is_correct:
-            g["score"] = g.get("score", 0) + 1
-        g["index"] = g.get("index", 0) + 1
-        context.user_data["game"] = g
+            g.score += 1
+        g.index += 1
 
         stats = progress_text(g)
         next_item = next_photo(context)
@@ -1628,17 +2399,14 @@ async def on_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
                 f"{feedback}\n{stats}\n\nСледующий вопрос:",
                 reply_markup=in_game_keyboard(),
             )
-            img: bytes = next_item["image"]  # type: ignore[assignment]
-            await update.message.reply_photo(
-                BytesIO(img), caption="Кто это?", reply_markup=in_game_keyboard()
-            )
+            await send_photo_question(update.message, next_item)
         return
 
     # --- Режим обучения: пользователь вводит ответы
     if mode == "learn_train":
-        learn = context.user_data.get("learn", {})
-        group_key: Optional[str] = learn.get("group_key")
-        current: Optional[str] = learn.get("current")
+        learn: Optional[sessions.LearnSession] = context.user_data.get("learn")
+        group_key: Optional[str] = learn.group_key if learn is not None else None
+        current: Optional[str] = learn.current if learn is not None else None
 
         # Страховка: если текущего нет — выбираем
         if not current:
@@ -1655,15 +2423,9 @@ async def on_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
                 reset_state(context)
                 return
 
-        answer = (text or "").strip().lower()
-        correct = current.lower()
-
-        known: set[str] = learn.get("known", set())  # type: ignore
-
-        if answer == correct:
-            known.add(correct)
-            learn["known"] = known
-            context.user_data["learn"] = learn
+        others = ALL_CATALOG.group_member_indexes.get(group_key or "")
+        if fuzzy_match.accepts(text or "", current, ANSWER_TOLERANCE["learn"], others):
+            learn.known.add(current.lower())  # type: ignore[union-attr]
             feedback = "Верно! ✅"
         else:
             feedback = f"Неверно. Правильный ответ: {current}"
@@ -1685,10 +2447,9 @@ async def on_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 
         masked = make_unique_mask_for_group_member(next_member, ALL_GROUPS[group_key])  # type: ignore
         await update.message.reply_text(feedback)
-        imgs = fetch_dropbox_images(next_member)
-        if imgs:
-            media = [InputMediaPhoto(BytesIO(i)) for i in imgs[:10]]
-            await update.message.reply_media_group(media)
+        picked = pick_dropbox_photos(next_member, 10, group_key)  # type: ignore[arg-type]
+        if picked:
+            await reply_media_group_cached(update.message, [(p, None) for p in picked])
         await update.message.reply_text(
             f"Группа: {title}\n"
             f"Следующий участник: <code>{masked}</code>",
@@ -1734,17 +2495,28 @@ async def on_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         data = await file.download_as_bytearray()
         suffix = Path(file.file_path or "").suffix or ".jpg"
         try:
-            ok = save_user_photo(group_key, member, bytes(data), suffix)  # type: ignore[arg-type]
-        except FileExistsError:
-            await update.message.reply_text(
-                "Такое фото уже существует.", reply_markup=back_keyboard()
+            ok = await asyncio.to_thread(
+                save_user_photo, group_key, member, bytes(data), suffix  # type: ignore[arg-type]
             )
+        except DuplicatePhotoError as exc:
+            dup_group, dup_member = exc.owner
+            near = isinstance(exc, NearDuplicatePhotoError)
+            if (dup_group.lower(), dup_member.lower()) == (group_key.lower(), member.lower()):
+                text = "Очень похожее фото уже существует." if near else "Такое фото уже существует."
+            else:
+                title = correct_grnames.get(dup_group.lower(), dup_group)
+                what = "Очень похожее фото" if near else "Такое фото"
+                text = f"{what} уже загружено для {dup_member} ({title})."
+            await update.message.reply_text(text, reply_markup=back_keyboard())
         else:
             if ok:
                 if update.effective_user:
                     register_user_upload(update.effective_user.id)
+                notify_upload_worker()
+                depth = photo_upload_queue().depth()
                 await update.message.reply_text(
-                    "Фото успешно загружено!", reply_markup=upload_success_keyboard()
+                    f"Фото успешно загружено! В очереди на отправку в Dropbox: {depth}.",
+                    reply_markup=upload_success_keyboard(),
                 )
             else:
                 await update.message.reply_text(
@@ -1788,7 +2560,12 @@ async def lifespan(_: FastAPI):
     await application.bot.setWebhook(WEBHOOK_URL)
     async with application:
         await application.start()
+        uploader = asyncio.create_task(run_upload_worker())
+        syncer = asyncio.create_task(run_sync_worker())
         yield
+        syncer.cancel()
+        uploader.cancel()
+        await asyncio.to_thread(FILE_ID_CACHE.flush)
         await application.stop()
 
 app = FastAPI(lifespan=lifespan)
@@ -1801,9 +2578,44 @@ async def telegram_webhook(req: Request) -> Response:
     await application.process_update(update)
     return Response(status_code=HTTPStatus.OK)
 
+@app.get("/dropbox_webhook")
+async def dropbox_webhook_challenge(req: Request) -> Response:
+    """Проверка вебхука Dropbox: вернуть ``challenge`` как есть."""
+    return Response(
+        content=req.query_params.get("challenge", ""),
+        media_type="text/plain",
+        headers={"X-Content-Type-Options": "nosniff"},
+    )
+
+@app.post("/dropbox_webhook")
+async def dropbox_webhook(req: Request) -> Response:
+    body = await req.body()
+    if not verify_dropbox_signature(body, req.headers.get("x-dropbox-signature")):
+        return Response(status_code=HTTPStatus.FORBIDDEN)
+    schedule_webhook_sync()
+    return Response(status_code=HTTPStatus.OK)
+
 @app.get("/healthz")
 async def healthz():
-    return {"ok": True}
+    return {"ok": True, "photo_cache": PHOTO_CACHE.stats(), "dropbox": dropbox_client.stats()}
+
+@app.get("/upload_queue")
+async def upload_queue_status():
+    return photo_upload_queue().status()
+
+@app.post("/admin/sync")
+async def admin_sync(req: Request):
+    """Запускает синхронизацию с Dropbox (``?full=1`` — полный обход)."""
+    if not _admin_authorized(req):
+        return Response(status_code=HTTPStatus.FORBIDDEN)
+    full = req.query_params.get("full", "") in ("1", "true", "yes")
+    return {"scheduled": request_library_sync(full), "full": full, **SYNC_STATUS}
+
+@app.get("/admin/sync")
+async def admin_sync_status(req: Request):
+    if not _admin_authorized(req):
+        return Response(status_code=HTTPStatus.FORBIDDEN)
+    return SYNC_STATUS
 
 @app.get("/")
 async def root():
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Dropbox content hashing: previous helpers vs. ``content_hash``.
+
+Compares
+
+* ``old bytes`` - the former ``app._dropbox_content_hash_bytes`` (copies the
+  payload into a ``BytesIO`` and reads 4 MB blocks out of it);
+* ``new bytes`` - ``content_hash.hash_bytes`` over ``memoryview`` slices;
+* ``old files`` - the former ``_dropbox_content_hash`` applied to every file
+  in turn;
+* ``new files`` - ``content_hash.hash_files`` on a thread pool.
+
+Usage: ``python benchmarks/bench_content_hash.py [--files 64] [--size 8000000]``
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def old_hash_bytes(data: bytes) -> str:
+    hasher = hashlib.sha256()
+    bio = BytesIO(data)
+    while True:
+        chunk = bio.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        hasher.update(hashlib.sha256(chunk).digest())
+    return hasher.hexdigest()
+
+
+def old_hash_file(path: Path) -> str:
+    hasher = hashlib.sha256()
+    with path.open("rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            hasher.update(hashlib.sha256(chunk).digest())
+    return hasher.hexdigest()
+
+
+def timed(label: str, fn, total_bytes: int, rounds: int) -> None:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    elapsed = (time.perf_counter() - start) / rounds
+    print(f"{label:<12} {elapsed * 1000:9.2f} ms  {total_bytes / 1e6 / elapsed:8.0f} MB/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=64)
+    parser.add_argument("--size", type=int, default=8_000_000, help="bytes per file")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(ROOT))
+    import content_hash
+
+    workers = args.workers or content_hash.DEFAULT_WORKERS
+    data = os.urandom(args.size)
+    assert old_hash_bytes(data) == content_hash.hash_bytes(data)
+    timed("old bytes", lambda: old_hash_bytes(data), args.size, args.rounds)
+    timed("new bytes", lambda: content_hash.hash_bytes(data), args.size, args.rounds)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(args.files):
+            path = Path(tmp) / f"{i:04d}.jpg"
+            path.write_bytes(data)
+            paths.append(path)
+        total = args.size * args.files
+        print(f"{args.files} files x {args.size / 1e6:.1f} MB, {workers} worker(s)")
+        timed("old files", lambda: [old_hash_file(p) for p in paths], total, args.rounds)
+        timed(
+            "new files",
+            lambda: content_hash.hash_files(paths, max_workers=workers),
+            total,
+            args.rounds,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Typo-tolerant member lookup: trigram index vs. a linear scan.
+
+Builds ``fuzzy_match.FuzzyIndex`` over the bot's members plus synthetic
+groups (``--groups`` x ``--members``) and looks up names with one or two
+random typos, either through the index or by computing the bounded edit
+distance to every name (what a naive implementation would do).
+
+Usage: ``python benchmarks/bench_fuzzy_match.py [--groups 60] [--queries 2000]``
+"""
+
+import argparse
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def typo(name: str, rng: random.Random, edits: int) -> str:
+    chars = list(name)
+    for _ in range(edits):
+        i = rng.randrange(len(chars))
+        op = rng.choice("sdit")
+        if op == "s":
+            chars[i] = rng.choice(string.ascii_lowercase)
+        elif op == "d" and len(chars) > 4:
+            del chars[i]
+        elif op == "i":
+            chars.insert(i, rng.choice(string.ascii_lowercase))
+        elif i + 1 < len(chars):
+            chars[i], chars[i + 1] = chars[i + 1], chars[i]
+    return "".join(chars)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--groups", type=int, default=60, help="synthetic groups")
+    parser.add_argument("--members", type=int, default=10, help="members per synthetic group")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--max-edits", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(ROOT))
+    import app
+    from fuzzy_match import FuzzyIndex, allowed_edits, edit_distance, fold
+
+    rng = random.Random(args.seed)
+    names = list(dict.fromkeys(app.ALL_CATALOG.members))
+    for _ in range(args.groups * args.members):
+        names.append("".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10))))
+
+    start = time.perf_counter()
+    index = FuzzyIndex((name, name) for name in names)
+    build = time.perf_counter() - start
+
+    queries = [typo(fold(rng.choice(names)), rng, rng.randint(1, 2)) for _ in range(args.queries)]
+
+    def scan(text: str):
+        query = fold(text)
+        limit = allowed_edits(len(query), args.max_edits)
+        best, found = limit + 1, []
+        for term in index.exact:
+            distance = edit_distance(query, term, limit)
+            if distance > allowed_edits(len(term), args.max_edits):
+                continue
+            if distance < best:
+                best, found = distance, [term]
+            elif distance == best <= limit:
+                found.append(term)
+        return found
+
+    start = time.perf_counter()
+    indexed = [index.closest(q, args.max_edits) for q in queries]
+    t_index = time.perf_counter() - start
+    start = time.perf_counter()
+    scanned = [scan(q) for q in queries]
+    t_scan = time.perf_counter() - start
+
+    same = sum(sorted(a) == sorted(b) for a, b in zip(indexed, scanned))
+    print(f"{len(index)} names, index built in {build * 1e3:.1f} ms, {len(queries)} queries")
+    print(f"{'index':<6} {t_index / len(queries) * 1e6:>9.1f} us/lookup")
+    print(f"{'scan':<6} {t_scan / len(queries) * 1e6:>9.1f} us/lookup")
+    print(f"same result for {same}/{len(queries)} queries, "
+          f"{sum(bool(r) for r in indexed)} found a name")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Near-duplicate lookup latency of the multi-index Hamming table.
+
+Fills ``perceptual_hash.HammingIndex`` with random 64-bit hashes (plus a few
+planted near copies) and times ``search`` against a linear scan.
+
+Usage: ``python benchmarks/bench_perceptual_index.py [--size 100000] [--radius 6]``
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import perceptual_hash  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--radius", type=int, default=perceptual_hash.DEFAULT_THRESHOLD)
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    index = perceptual_hash.HammingIndex()
+    values = [rng.getrandbits(64) for _ in range(args.size)]
+    start = time.perf_counter()
+    for i, value in enumerate(values):
+        index.add(str(i), value)
+    build = time.perf_counter() - start
+
+    queries = []
+    for value in rng.sample(values, args.queries):
+        for bit in rng.sample(range(64), rng.randint(0, args.radius)):
+            value ^= 1 << bit
+        queries.append(value)
+
+    start = time.perf_counter()
+    hits = sum(bool(index.search(q, args.radius)) for q in queries)
+    indexed = (time.perf_counter() - start) / len(queries)
+
+    scan_queries = queries[:20]
+    start = time.perf_counter()
+    for q in scan_queries:
+        [v for v in values if perceptual_hash.hamming(q, v) <= args.radius]
+    scan = (time.perf_counter() - start) / len(scan_queries)
+
+    print(f"{args.size} hashes, radius {args.radius}: build {build:.2f} s")
+    print(f"  multi-index search {indexed * 1e6:8.1f} us/query ({hits}/{len(queries)} found)")
+    print(f"  linear scan        {scan * 1e6:8.1f} us/query")
+
+
+if __name__ == "__main__":
+    main()
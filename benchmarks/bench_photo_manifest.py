@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Startup cost of building the photo map: full walk vs. persisted manifest.
+
+Creates synthetic ``kpop_images`` trees (empty files, 50 groups) and times
+
+* ``full scan`` - the old approach, listing every member directory;
+* ``manifest`` - loading the manifest and ``stat``-ing each directory.
+
+Usage: ``python benchmarks/bench_photo_manifest.py [--sizes 10000 100000]``
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import photo_manifest  # noqa: E402
+
+GROUPS = 50
+
+
+def make_tree(images_root: Path, total_files: int) -> None:
+    members_per_group = 10
+    per_member = max(1, total_files // (GROUPS * members_per_group))
+    for g in range(GROUPS):
+        for m in range(members_per_group):
+            member_dir = images_root / f"group{g:02d}" / f"member{m:02d}"
+            member_dir.mkdir(parents=True)
+            for i in range(per_member):
+                (member_dir / f"member{m:02d}__{i:02d}.jpg").touch()
+
+
+def full_scan(images_root: Path) -> int:
+    count = 0
+    for group_dir in images_root.iterdir():
+        if not group_dir.is_dir():
+            continue
+        for member_dir in group_dir.iterdir():
+            if member_dir.is_dir():
+                count += len(sorted(member_dir.iterdir()))
+    return count
+
+
+def manifest_load(images_root: Path) -> int:
+    manifest = photo_manifest.update_manifest(images_root)
+    return sum(len(files) for _, _, files in photo_manifest.iter_member_files(manifest))
+
+
+def best_of(fn, images_root: Path, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(images_root)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            images_root = Path(tmp) / "kpop_images"
+            make_tree(images_root, size)
+            files = full_scan(images_root)
+            photo_manifest.update_manifest(images_root)  # first run writes it
+            scan = best_of(full_scan, images_root, args.repeat)
+            loaded = best_of(manifest_load, images_root, args.repeat)
+            size_kb = os.path.getsize(photo_manifest.manifest_path(images_root)) / 1024
+            print(
+                f"{files:>7} files: full scan {scan * 1000:8.1f} ms, "
+                f"manifest {loaded * 1000:8.1f} ms ({size_kb:.0f} KiB)"
+            )
+
+
+if __name__ == "__main__":
+    main()
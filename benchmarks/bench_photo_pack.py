@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Reading photos: loose files vs. the memory-mapped ``photo_pack``.
+
+Builds a synthetic library, packs it and times random reads through
+``open().read()`` and through ``PhotoPack.get`` (a ``memoryview`` slice),
+once on their own and once followed by hashing the bytes, which touches
+every page like sending the photo does.
+
+Usage: ``python benchmarks/bench_photo_pack.py [--photos 2000] [--size 150000]``
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--photos", type=int, default=2000)
+    parser.add_argument("--size", type=int, default=150_000, help="bytes per photo")
+    parser.add_argument("--reads", type=int, default=20_000)
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(ROOT))
+    import content_hash
+    import photo_manifest
+    import photo_pack
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        images_root = root / "kpop_images"
+        for i in range(args.photos):
+            member = images_root / f"group{i % 50}" / f"idol{i % 7}"
+            member.mkdir(parents=True, exist_ok=True)
+            (member / f"idol__{i:05d}.jpg").write_bytes(os.urandom(args.size))
+        paths = photo_manifest.library_paths(images_root)
+        pack = photo_pack.PhotoPack.load(photo_pack.index_path(images_root))
+        start = time.perf_counter()
+        pack.update(root, paths)
+        print(f"packed {len(paths)} photos in {time.perf_counter() - start:.2f} s")
+
+        picks = [random.choice(paths) for _ in range(args.reads)]
+
+        def loose(consume):
+            for rel in picks:
+                with open(root / rel, "rb") as f:
+                    consume(f.read())
+
+        def packed(consume):
+            for rel in picks:
+                consume(pack.get(rel))
+
+        for consume_label, consume in (("read", len), ("read+hash", content_hash.hash_bytes)):
+            for label, fn in (("loose files", loose), ("photo pack", packed)):
+                fn(consume)  # warm the page cache
+                start = time.perf_counter()
+                fn(consume)
+                elapsed = time.perf_counter() - start
+                print(f"{label:<12} {consume_label:<10} {elapsed / args.reads * 1e6:8.1f} us/read")
+
+
+if __name__ == "__main__":
+    main()
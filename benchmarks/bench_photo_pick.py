@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""I/O of picking member photos: read-everything vs. pick-then-read.
+
+Builds a synthetic member folder and compares
+
+* ``old`` - ``fetch_dropbox_images`` followed by ``random.choice`` /
+  slicing, i.e. reading every photo of the member;
+* ``new`` - ``fetch_dropbox_image`` / ``fetch_dropbox_sample``, which pick
+  paths from the index first and read only those files.
+
+The byte cache is disabled so that every read hits the filesystem.
+
+Usage: ``python benchmarks/bench_photo_pick.py [--photos 200] [--size 200000]``
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--photos", type=int, default=200, help="photos per member")
+    parser.add_argument("--size", type=int, default=200_000, help="bytes per photo")
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        member_dir = Path(tmp) / "kpop_images" / "group" / "idol"
+        member_dir.mkdir(parents=True)
+        for i in range(args.photos):
+            (member_dir / f"idol__{i:02d}.jpg").write_bytes(os.urandom(args.size))
+
+        os.environ["DROPBOX_ROOT"] = tmp
+        os.environ["PHOTO_CACHE_MAX_BYTES"] = "0"
+        sys.path.insert(0, str(ROOT))
+        import app
+
+        read_bytes = 0
+        read_files = 0
+        real_read = app.read_dropbox_photo
+
+        def counting_read(path):
+            nonlocal read_bytes, read_files
+            data = real_read(path)
+            read_files += 1
+            read_bytes += len(data or b"")
+            return data
+
+        app.read_dropbox_photo = counting_read
+
+        def run(label, fn, sent_per_round):
+            nonlocal read_bytes, read_files
+            read_bytes = read_files = 0
+            start = time.perf_counter()
+            for _ in range(args.rounds):
+                fn()
+            elapsed = (time.perf_counter() - start) / args.rounds
+            print(
+                f"{label:<28} {elapsed * 1000:8.2f} ms/round  "
+                f"{read_files / args.rounds:6.1f} files  "
+                f"{read_bytes / args.rounds / 1024:9.0f} KiB read  "
+                f"(sent {sent_per_round})"
+            )
+
+        run("old: one random photo", lambda: random.choice(app.fetch_dropbox_images("idol")), 1)
+        run("new: fetch_dropbox_image", lambda: app.fetch_dropbox_image("idol"), 1)
+        run("old: first 10 photos", lambda: app.fetch_dropbox_images("idol")[:10], 10)
+        run("new: fetch_dropbox_sample 10", lambda: app.fetch_dropbox_sample("idol", 10), 10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""Memory of many concurrent sessions: nested dicts vs. ``sessions`` classes.
+
+Starts ``--sessions`` sessions of every mode against a synthetic photo
+library and measures the heap they add with ``tracemalloc``:
+
+* ``old`` - the previous ``user_data`` layout, rebuilt here: nested dicts,
+  per-player copies of ``pretty_map`` / ``member_map`` and catalog items
+  holding the image bytes;
+* ``new`` - what ``app`` stores now (``__slots__`` dataclasses holding
+  references into the shared ``Catalog`` and photo paths).
+
+Photos read by the old catalog are distinct ``bytes`` per session (the
+byte cache is disabled), so the old catalog is measured over
+``--catalog-sessions`` sessions and scaled up.
+
+Usage: ``python benchmarks/bench_sessions.py [--sessions 10000]``
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def measure(count: int, start) -> int:
+    """Bytes allocated per session by ``count`` calls of ``start(ctx)``."""
+    contexts = [SimpleNamespace(user_data={}) for _ in range(count)]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for ctx in contexts:
+        start(ctx)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) // count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=10_000)
+    parser.add_argument("--catalog-sessions", type=int, default=50)
+    parser.add_argument("--photos", type=int, default=20, help="photos per member")
+    parser.add_argument("--size", type=int, default=20_000, help="bytes per photo")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DROPBOX_ROOT"] = tmp
+        os.environ["PHOTO_CACHE_MAX_BYTES"] = "0"
+        sys.path.insert(0, str(ROOT))
+        import app
+        import group_catalog
+
+        images_root = Path(tmp) / "kpop_images"
+        group_key = "twice"
+        for member in app.kpop_groups[group_key]:
+            member_dir = images_root / group_key / member.lower()
+            member_dir.mkdir(parents=True)
+            for i in range(args.photos):
+                (member_dir / f"{member.lower()}__{i:02d}.jpg").write_bytes(os.urandom(args.size))
+        app.reload_dropbox_photos()
+        app.PHOTO_GAME_QUESTIONS = min(app.PHOTO_GAME_QUESTIONS, args.photos)
+        if not app.QUIZ_POOL:
+            app.QUIZ_POOL = [{"question": f"Q{i}", "answer": "a"} for i in range(20)]
+
+        def old_game(ctx):
+            groups, names_map = app.kpop_groups, app.correct_grnames
+            all_members = [m for members in groups.values() for m in members]
+            ctx.user_data["mode"] = "game"
+            ctx.user_data["game"] = {
+                "members": random.sample(all_members, 10),
+                "index": 0,
+                "score": 0,
+                "current_member": None,
+                "groups": groups,
+                "pretty_map": group_catalog.build_pretty_map(groups, names_map),
+                "member_map": group_catalog.build_member_map(groups),
+                "total": 10,
+            }
+
+        def old_photo_game(ctx):
+            app.start_photo_game(ctx)
+            items = [{"name": item.name, "path": item.path} for item in ctx.user_data["game"].items]
+            ctx.user_data["game"] = {
+                "items": items, "index": 0, "score": 0, "current": None, "total": len(items)
+            }
+
+        def old_quiz(ctx):
+            questions = random.sample(app.QUIZ_POOL, min(10, len(app.QUIZ_POOL)))
+            ctx.user_data["mode"] = "quiz"
+            ctx.user_data["quiz"] = {
+                "questions": questions, "index": 0, "score": 0, "current": None,
+                "total": len(questions),
+            }
+
+        def old_learn(ctx):
+            members = list(app.ALL_GROUPS[group_key])
+            random.shuffle(members)
+            ctx.user_data["mode"] = "learn_train"
+            ctx.user_data["learn"] = {
+                "group_key": group_key, "to_learn": members, "known": set(), "current": None
+            }
+
+        def old_catalog(ctx):
+            items = []
+            for name in app.ALL_GROUPS[group_key]:
+                for img in app.fetch_dropbox_images(name, group_key):
+                    items.append({"image": img, "name": name, "group": group_key})
+            random.shuffle(items)
+            ctx.user_data["mode"] = "catalog"
+            ctx.user_data["catalog"] = {"items": items, "index": 0, "mode": "group", "group": group_key}
+
+        modes = [
+            ("game", old_game, app.start_game, args.sessions),
+            ("photo_game", old_photo_game, app.start_photo_game, args.sessions),
+            ("quiz", old_quiz, app.start_quiz, args.sessions),
+            ("learn", old_learn, lambda ctx: app.start_learn_session(ctx, group_key), args.sessions),
+            ("catalog", old_catalog, lambda ctx: app.start_group_catalog(ctx, group_key),
+             args.catalog_sessions),
+        ]
+        print(f"{'mode':<12} {'old B/session':>14} {'new B/session':>14} "
+              f"{'old MB':>9} {'new MB':>9}  (x {args.sessions} sessions)")
+        for label, old, new, count in modes:
+            old_bytes = measure(count, old)
+            new_bytes = measure(args.sessions, new)
+            print(f"{label:<12} {old_bytes:>14,} {new_bytes:>14,} "
+                  f"{old_bytes * args.sessions / 1e6:>9.1f} {new_bytes * args.sessions / 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""Throughput of ``sync_dropbox.sync_folder`` at different concurrency levels.
+
+Syncs a synthetic ``/kpop_images`` tree from the filesystem-backed
+``tests/local_dropbox.py`` stand-in into an empty folder. Every request
+sleeps ``--latency`` seconds to stand in for the network round trip, which
+is what the download pool overlaps.
+
+Usage: ``python benchmarks/bench_sync_download.py [--files 400] [--latency 0.02]``
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=400)
+    parser.add_argument("--size", type=int, default=100_000, help="bytes per photo")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per request")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(ROOT))
+    sys.path.insert(0, str(ROOT / "tests"))
+    import sync_dropbox
+    from local_dropbox import LocalDropbox
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        remote = Path(tmp) / "remote"
+        for i in range(args.files):
+            member = remote / "kpop_images" / f"group{i % 20}" / f"idol{i % 5}"
+            member.mkdir(parents=True, exist_ok=True)
+            (member / f"idol__{i:04d}.jpg").write_bytes(os.urandom(args.size))
+
+        print(f"{args.files} files x {args.size // 1000} kB, {args.latency * 1000:.0f} ms per request")
+        for concurrency in args.concurrency:
+            fake = LocalDropbox(remote, latency=args.latency)
+            local = Path(tmp) / f"local{concurrency}"
+            start = time.perf_counter()
+            progress = sync_dropbox.sync_folder(fake, "/kpop_images", local, concurrency)
+            elapsed = time.perf_counter() - start
+            print(
+                f"concurrency {concurrency:3d}: {elapsed:7.2f} s  "
+                f"{progress.downloaded / elapsed:7.1f} files/s  "
+                f"{progress.bytes / 1e6 / elapsed:7.1f} MB/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Dropbox content hashes, shared by ``app.py``, ``sync_dropbox.py`` and friends.
+
+A content hash is the SHA-256 of the concatenated SHA-256 digests of the
+data's 4 MB blocks, see
+https://www.dropbox.com/developers/reference/content-hash.
+
+Blocks are hashed over ``memoryview`` slices, so hashing bytes never copies
+them. ``hashlib`` releases the GIL while hashing, which lets
+``hash_files`` spread many files over a thread pool, and the ``*_async``
+wrappers keep hashing off the event loop.
+"""
+
+import asyncio
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Union
+
+BLOCK_SIZE = 4 * 1024 * 1024
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+
+PathLike = Union[str, Path]
+
+
+def hash_bytes(data: Union[bytes, bytearray, memoryview]) -> str:
+    """Content hash of ``data``."""
+    view = memoryview(data)
+    overall = hashlib.sha256()
+    for start in range(0, len(view), BLOCK_SIZE):
+        overall.update(hashlib.sha256(view[start:start + BLOCK_SIZE]).digest())
+    return overall.hexdigest()
+
+
+def _read_block(f, view: memoryview) -> int:
+    """Fill ``view`` from ``f``; returns the number of bytes read."""
+    filled = 0
+    while filled < len(view):
+        n = f.readinto(view[filled:])
+        if not n:
+            break
+        filled += n
+    return filled
+
+
+def hash_file(path: PathLike) -> str:
+    """Content hash of the file at ``path``. Raises ``OSError``."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < BLOCK_SIZE:
+            return hash_bytes(f.read())
+        # Large files: reuse one block-sized buffer instead of a read() per block
+        overall = hashlib.sha256()
+        view = memoryview(bytearray(BLOCK_SIZE))
+        while True:
+            n = _read_block(f, view)
+            if not n:
+                break
+            overall.update(hashlib.sha256(view[:n]).digest())
+            if n < BLOCK_SIZE:
+                break
+        return overall.hexdigest()
+
+
+def hash_files(
+    paths: Iterable[PathLike],
+    hash_func: Callable[[Path], str] = hash_file,
+    max_workers: int = DEFAULT_WORKERS,
+) -> Dict[Path, Optional[str]]:
+    """Hash many files on a thread pool; unreadable files map to ``None``."""
+    paths = [Path(p) for p in paths]
+
+    def safe_hash(path: Path) -> Optional[str]:
+        try:
+            return hash_func(path)
+        except OSError:
+            return None
+
+    if max_workers <= 1 or len(paths) <= 1:
+        return {path: safe_hash(path) for path in paths}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="content-hash") as pool:
+        return dict(zip(paths, pool.map(safe_hash, paths)))
+
+
+async def hash_bytes_async(data: Union[bytes, bytearray, memoryview]) -> str:
+    return await asyncio.to_thread(hash_bytes, data)
+
+
+async def hash_file_async(path: PathLike) -> str:
+    return await asyncio.to_thread(hash_file, path)
+
+
+class ContentHasher:
+    """Incremental content hash for data that arrives in arbitrary chunks."""
+
+    def __init__(self) -> None:
+        self._overall = hashlib.sha256()
+        self._block = hashlib.sha256()
+        self._block_len = 0
+
+    def update(self, data: Union[bytes, bytearray, memoryview]) -> None:
+        view = memoryview(data)
+        while view:
+            take = min(len(view), BLOCK_SIZE - self._block_len)
+            self._block.update(view[:take])
+            self._block_len += take
+            view = view[take:]
+            if self._block_len == BLOCK_SIZE:
+                self._overall.update(self._block.digest())
+                self._block = hashlib.sha256()
+                self._block_len = 0
+
+    def hexdigest(self) -> str:
+        overall = self._overall.copy()
+        if self._block_len:
+            overall.update(self._block.digest())
+        return overall.hexdigest()
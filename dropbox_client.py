@@ -0,0 +1,230 @@
+"""Process-wide Dropbox client shared by ``app.py`` and ``sync_dropbox.py``.
+
+Creating a ``dropbox.Dropbox`` per call means a new HTTP connection pool,
+TLS handshake and access-token refresh every time. ``get_client`` builds
+one client lazily from ``DROPBOX_APP_KEY`` / ``DROPBOX_APP_SECRET`` /
+``DROPBOX_REFRESH_TOKEN`` and reuses it (and its pooled ``requests``
+session) for the life of the process.
+
+The SDK's own retry loops are disabled; ``call_with_backoff`` retries rate
+limits (honouring ``RateLimitError.backoff``), 5xx responses and transient
+network errors with exponential backoff and jitter, and records call
+counts and latencies per API method in ``stats()``.
+
+``download_file`` streams a file into a temporary file, checks its content
+hash and only then renames it into place, so readers never see a partial
+photo and memory use does not depend on the file size.
+"""
+
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+import content_hash
+
+try:
+    import dropbox  # type: ignore
+except ImportError:  # pragma: no cover - library missing
+    dropbox = None  # type: ignore
+
+try:
+    from requests.exceptions import ConnectionError as RequestsConnectionError
+    from requests.exceptions import RetryError, Timeout
+except ImportError:  # pragma: no cover - requests comes with dropbox
+    RequestsConnectionError = RetryError = Timeout = ConnectionError  # type: ignore
+
+MAX_CONNECTIONS = int(os.environ.get("DROPBOX_MAX_CONNECTIONS", "8"))
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0  # seconds
+BACKOFF_MAX = 60.0
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+_client: Optional["dropbox.Dropbox"] = None
+_lock = threading.Lock()
+_stats: Dict[str, Dict[str, float]] = {}
+_stats_lock = threading.Lock()
+
+
+def get_client() -> Optional["dropbox.Dropbox"]:
+    """Shared client, or ``None`` if the SDK or credentials are missing."""
+    global _client
+    if _client is not None:
+        return _client
+    if dropbox is None:
+        return None
+    app_key = os.environ.get("DROPBOX_APP_KEY")
+    app_secret = os.environ.get("DROPBOX_APP_SECRET")
+    refresh_token = os.environ.get("DROPBOX_REFRESH_TOKEN")
+    if not all([app_key, app_secret, refresh_token]):
+        return None
+    with _lock:
+        if _client is None:
+            _client = dropbox.Dropbox(
+                app_key=app_key,
+                app_secret=app_secret,
+                oauth2_refresh_token=refresh_token,
+                session=dropbox.create_session(max_connections=MAX_CONNECTIONS),
+                max_retries_on_error=0,
+                max_retries_on_rate_limit=0,
+            )
+    return _client
+
+
+def reset_client() -> None:
+    """Forget the shared client (e.g. after credentials changed)."""
+    global _client
+    with _lock:
+        _client = None
+
+
+def _retry_delay(exc: Exception, attempt: int) -> Optional[float]:
+    """Seconds to wait before retrying after ``exc`` or ``None`` to give up."""
+    exponential = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)
+    jittered = exponential * (0.5 + random.random() / 2)
+    if dropbox is not None:
+        errors = dropbox.exceptions
+        if isinstance(exc, errors.RateLimitError):
+            return float(exc.backoff) if exc.backoff is not None else jittered
+        if isinstance(exc, errors.InternalServerError):
+            return jittered
+        if isinstance(exc, errors.HttpError) and getattr(exc, "status_code", 0) >= 500:
+            return jittered
+    transient = (RequestsConnectionError, RetryError, Timeout, ConnectionError, TimeoutError)
+    if isinstance(exc, transient):
+        return jittered
+    return None
+
+
+def _record(method: str, seconds: float, error: bool, retry: bool) -> None:
+    with _stats_lock:
+        entry = _stats.setdefault(
+            method, {"calls": 0, "errors": 0, "retries": 0, "seconds": 0.0}
+        )
+        entry["calls"] += 1
+        entry["seconds"] += seconds
+        if error:
+            entry["errors"] += 1
+        if retry:
+            entry["retries"] += 1
+
+
+def call_with_backoff(
+    dbx: Any, method: str, *args: Any, max_retries: Optional[int] = None, **kwargs: Any
+) -> Any:
+    """Call ``dbx.<method>(*args, **kwargs)`` retrying transient failures.
+
+    ``max_retries`` overrides ``MAX_RETRIES`` (``0`` fails on the first
+    error, for calls nothing should wait on).
+    """
+    func = getattr(dbx, method)
+    limit = MAX_RETRIES if max_retries is None else max_retries
+    attempt = 0
+    while True:
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as exc:
+            delay = _retry_delay(exc, attempt)
+            retry = delay is not None and attempt < limit
+            _record(method, time.perf_counter() - start, error=True, retry=retry)
+            if not retry:
+                raise
+            logging.warning(
+                "Dropbox %s failed (%r), retrying in %.1fs", method, exc, delay
+            )
+            time.sleep(delay)  # type: ignore[arg-type]
+            attempt += 1
+            continue
+        _record(method, time.perf_counter() - start, error=False, retry=False)
+        return result
+
+
+def call(method: str, *args: Any, **kwargs: Any) -> Any:
+    """``call_with_backoff`` on the shared client."""
+    dbx = get_client()
+    if dbx is None:
+        raise RuntimeError("Dropbox is not configured")
+    return call_with_backoff(dbx, method, *args, **kwargs)
+
+
+class ContentHashMismatch(Exception):
+    """Downloaded bytes do not match the content hash reported by Dropbox."""
+
+
+def _iter_body(res: Any) -> Iterator[bytes]:
+    """Chunks of a download response (``requests.Response`` or a stand-in)."""
+    iter_content = getattr(res, "iter_content", None)
+    if callable(iter_content):
+        yield from iter_content(DOWNLOAD_CHUNK_SIZE)
+    else:
+        yield res.content
+
+
+def download_file(
+    dbx: Any,
+    remote_path: str,
+    local_path: Path,
+    expected_hash: Optional[str] = None,
+    tmp_dir: Optional[Path] = None,
+    max_retries: Optional[int] = None,
+) -> int:
+    """Stream ``remote_path`` to ``local_path``; returns the number of bytes.
+
+    The data goes to a temporary file in ``tmp_dir`` (default: next to
+    ``local_path``, must be on the same filesystem) and replaces
+    ``local_path`` only if its hash equals ``expected_hash``; otherwise
+    ``ContentHashMismatch`` is raised and ``local_path`` is left untouched.
+    """
+    local_path = Path(local_path)
+    tmp_dir = Path(tmp_dir) if tmp_dir is not None else local_path.parent
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    _, res = call_with_backoff(dbx, "files_download", remote_path, max_retries=max_retries)
+    fd, tmp_name = tempfile.mkstemp(dir=tmp_dir, prefix=f".{local_path.name}.", suffix=".part")
+    try:
+        hasher = content_hash.ContentHasher()
+        size = 0
+        with os.fdopen(fd, "wb") as f:
+            for chunk in _iter_body(res):
+                f.write(chunk)
+                hasher.update(chunk)
+                size += len(chunk)
+        actual = hasher.hexdigest()
+        if expected_hash is not None and actual != expected_hash:
+            raise ContentHashMismatch(
+                f"{remote_path}: expected {expected_hash}, got {actual} ({size} bytes)"
+            )
+        local_path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp_name, local_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+    finally:
+        close = getattr(res, "close", None)
+        if callable(close):
+            close()
+    return size
+
+
+def stats() -> Dict[str, Dict[str, float]]:
+    """Per-method ``calls``, ``errors``, ``retries``, total and mean seconds."""
+    with _stats_lock:
+        return {
+            method: {**entry, "mean_seconds": entry["seconds"] / entry["calls"]}
+            for method, entry in _stats.items()
+        }
+
+
+def log_stats() -> None:
+    for method, entry in sorted(stats().items()):
+        logging.info(
+            "Dropbox %s: %d calls, %d errors, %d retries, %.3fs mean",
+            method, entry["calls"], entry["errors"], entry["retries"], entry["mean_seconds"],
+        )
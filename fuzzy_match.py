@@ -0,0 +1,185 @@
+"""Typo-tolerant matching of answers against group and member names.
+
+Names and user input are compared after ``fold`` (case folding, accents
+dropped, letters and digits only), so "Le-Sserafim", "le sserafim" and
+"LESSERAFIM" are equal, and so are "Rosé" and "Rose".
+Beyond that an answer may be a few edits away from a name: insertions,
+deletions, substitutions and swaps of neighbouring letters each count as
+one edit ("Blakpink" is one edit from BLACKPINK, "Le Seraphim" three from
+LE SSERAFIM).
+
+``FuzzyIndex`` looks names up in three steps:
+
+1. exact hit on the folded text (one dict lookup);
+2. candidates from a trigram index: one edit changes at most four of the
+   padded trigrams of a name, so a name within ``k`` edits of the query
+   shares all but ``4 * k`` of them and only names passing that count are
+   considered (short queries, where the bound says nothing, fall back to
+   names of similar length);
+3. ``edit_distance`` with a cut-off at ``k`` on the remaining candidates.
+
+How many edits are allowed grows with the length of both the answer and
+the name (``allowed_edits``) up to a per-mode maximum chosen by the caller.
+"""
+
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Generic, Iterable, List, Optional, Set, Tuple, TypeVar
+
+V = TypeVar("V")
+
+GRAM = 3
+
+
+def fold(text: str) -> str:
+    """``"Le Sserafim!"`` -> ``"lesserafim"``, ``"Rosé"`` -> ``"rose"``.
+
+    Accents are split off (NFKD) and dropped; the rest is recomposed (NFC)
+    so Hangul syllables stay whole.
+    """
+    bare = "".join(
+        ch for ch in unicodedata.normalize("NFKD", text) if not unicodedata.combining(ch)
+    )
+    return "".join(ch for ch in unicodedata.normalize("NFC", bare).casefold() if ch.isalnum())
+
+
+def allowed_edits(length: int, max_edits: int) -> int:
+    """Edits tolerated for a name of ``length`` characters, at most
+    ``max_edits``: none below four characters, then one more every three
+    (4-6: 1, 7-9: 2, 10-12: 3)."""
+    return max(0, min(max_edits, (length - 1) // 3))
+
+
+def _grams(term: str) -> Set[str]:
+    padded = f"^^{term}$$"
+    return {padded[i:i + GRAM] for i in range(len(padded) - GRAM + 1)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Edit distance with adjacent transpositions, or ``limit + 1`` as soon
+    as it is known to exceed ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if a == b:
+        return 0
+    over = limit + 1
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        row_min = i
+        ai = a[i - 1]
+        for j in range(1, len(b) + 1):
+            cost = 0 if ai == b[j - 1] else 1
+            value = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and ai == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, prev2[j - 2] + 1)
+            cur[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > limit:
+            return over
+        prev2, prev = prev, cur
+    return min(prev[-1], over)
+
+
+class FuzzyIndex(Generic[V]):
+    """Folded names -> values, with typo-tolerant ``lookup``."""
+
+    def __init__(self, entries: Iterable[Tuple[str, V]] = ()) -> None:
+        self.exact: Dict[str, List[V]] = {}
+        self._grams: Dict[str, List[str]] = defaultdict(list)
+        self._by_length: Dict[int, List[str]] = defaultdict(list)
+        self._gram_count: Dict[str, int] = {}
+        for name, value in entries:
+            self.add(name, value)
+
+    def __len__(self) -> int:
+        return len(self.exact)
+
+    def add(self, name: str, value: V) -> None:
+        term = fold(name)
+        if not term:
+            return
+        values = self.exact.get(term)
+        if values is None:
+            self.exact[term] = [value]
+            grams = _grams(term)
+            for gram in grams:
+                self._grams[gram].append(term)
+            self._gram_count[term] = len(grams)
+            self._by_length[len(term)].append(term)
+        elif value not in values:
+            values.append(value)
+
+    def _candidates(self, query: str, limit: int) -> Iterable[str]:
+        grams = _grams(query)
+        # An edit changes at most GRAM trigrams, a swap of neighbours GRAM + 1
+        lost = (GRAM + 1) * limit
+        if len(grams) - lost <= 0:
+            return [
+                term
+                for length in range(len(query) - limit, len(query) + limit + 1)
+                for term in self._by_length.get(length, ())
+            ]
+        counts: Dict[str, int] = defaultdict(int)
+        for gram in grams:
+            for term in self._grams.get(gram, ()):
+                counts[term] += 1
+        return [
+            term for term, shared in counts.items()
+            if shared >= max(len(grams), self._gram_count[term]) - lost
+        ]
+
+    def closest(self, text: str, max_edits: int = 0) -> List[str]:
+        """Folded names closest to ``text`` within the allowed edits; an
+        exact match always wins."""
+        query = fold(text)
+        if not query:
+            return []
+        if query in self.exact:
+            return [query]
+        limit = allowed_edits(len(query), max_edits)
+        if limit == 0:
+            return []
+        best = limit + 1
+        found: List[str] = []
+        for term in self._candidates(query, limit):
+            distance = edit_distance(query, term, min(best, limit))
+            if distance > allowed_edits(len(term), max_edits):
+                continue  # short names need exact answers whatever was typed
+            if distance < best:
+                best, found = distance, [term]
+            elif distance == best <= limit:
+                found.append(term)
+        return found
+
+    def lookup(self, text: str, max_edits: int = 0) -> List[V]:
+        """Values of the closest names (several if they are equally close)."""
+        found: List[V] = []
+        for term in self.closest(text, max_edits):
+            found.extend(v for v in self.exact[term] if v not in found)
+        return found
+
+    def match(self, text: str, max_edits: int = 0) -> Optional[V]:
+        """The single closest value, or ``None`` if there is none or the
+        closest names point to different values."""
+        found = self.lookup(text, max_edits)
+        return found[0] if len(found) == 1 else None
+
+
+def accepts(answer: str, target: str, max_edits: int, others: Optional[FuzzyIndex] = None) -> bool:
+    """Whether ``answer`` names ``target``.
+
+    ``others`` maps every name the answer could mean, aliases included, to
+    the name it stands for (e.g. all members, including ``target``): the
+    answer is accepted only if ``target`` is among the values of the names
+    closest to it, so typing another member's name is still wrong.
+    """
+    wanted = fold(target)
+    if fold(answer) == wanted:
+        return True
+    if others is not None and target in others.exact.get(wanted, ()):
+        return target in others.lookup(answer, max_edits)
+    limit = allowed_edits(len(wanted), max_edits)
+    return limit > 0 and edit_distance(fold(answer), wanted, limit) <= limit
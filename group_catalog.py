@@ -0,0 +1,115 @@
+"""Compiled, read-only view of a set of groups for the guessing games.
+
+``Catalog.compile`` builds everything a game needs to check answers once,
+when the groups are loaded: the flat member list questions are sampled
+from, ``answer -> group key`` and ``member -> group keys``. The result is
+immutable (tuples, frozensets and read-only mappings), so every session
+shares one catalog by reference and starting a game costs the same
+whatever the size of the catalog.
+
+The fuzzy indexes (see ``fuzzy_match``) and the find-mode search (see
+``member_search``) are built here too and must not be modified afterwards.
+They also hold the aliases of groups and members (see ``name_aliases``),
+so an alias is found by the same dict lookup as the name itself.
+"""
+
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, FrozenSet, List, Mapping, Optional, Set, Tuple
+
+from fuzzy_match import FuzzyIndex
+from member_search import MemberSearch
+from name_aliases import Aliases
+
+
+def build_pretty_map(
+    groups: Mapping[str, List[str]], names_map: Optional[Mapping[str, str]] = None
+) -> Dict[str, str]:
+    """Accepted spellings of a group name (lower-case, with and without
+    spaces) -> group key."""
+    mapping: Dict[str, str] = {}
+    for k in groups.keys():
+        low = k.lower()
+        mapping[low] = k
+        mapping[low.replace(" ", "")] = k
+    if names_map:
+        for key, pretty in names_map.items():
+            low = pretty.lower()
+            mapping[low] = key
+            mapping[low.replace(" ", "")] = key
+    return mapping
+
+
+def build_member_map(groups: Mapping[str, List[str]]) -> Dict[str, Set[str]]:
+    """Lower-cased member name -> keys of every group with that member, so
+    namesakes in several groups accept any of them."""
+    member_map: Dict[str, Set[str]] = {}
+    for group_key, members in groups.items():
+        for member in members:
+            member_map.setdefault(member.lower(), set()).add(group_key)
+    return member_map
+
+
+@dataclass(frozen=True, slots=True)
+class Catalog:
+    groups: Mapping[str, Tuple[str, ...]]
+    titles: Mapping[str, str]  # group key -> display name
+    members: Tuple[str, ...]  # every member of every group, in order
+    pretty_map: Mapping[str, str]
+    member_map: Mapping[str, FrozenSet[str]]
+    answer_index: FuzzyIndex[str]  # group name spellings -> group key
+    member_index: FuzzyIndex[str]  # member name -> member name as written
+    group_member_indexes: Mapping[str, FuzzyIndex[str]]
+    search: MemberSearch
+
+    @classmethod
+    def compile(
+        cls,
+        groups: Mapping[str, List[str]],
+        names_map: Optional[Mapping[str, str]] = None,
+        aliases: Optional[Aliases] = None,
+    ) -> "Catalog":
+        frozen = {key: tuple(members) for key, members in groups.items()}
+        pretty_map = build_pretty_map(frozen, names_map)
+        aliases = aliases or Aliases()
+        group_aliases = [
+            (alias, key)
+            for key, names in aliases.groups.items() if key in frozen
+            for alias in names
+        ]
+        member_aliases: Dict[str, List[Tuple[str, str]]] = {}
+        for (key, member), names in aliases.members.items():
+            if member in frozen.get(key, ()):
+                member_aliases.setdefault(key, []).extend((alias, member) for alias in names)
+
+        def member_entries(key: str) -> List[Tuple[str, str]]:
+            return [(m, m) for m in frozen[key]] + member_aliases.get(key, [])
+
+        member_index = FuzzyIndex(entry for key in frozen for entry in member_entries(key))
+        return cls(
+            groups=MappingProxyType(frozen),
+            titles=MappingProxyType({key: (names_map or {}).get(key, key) for key in frozen}),
+            members=tuple(m for members in frozen.values() for m in members),
+            pretty_map=MappingProxyType(pretty_map),
+            member_map=MappingProxyType(
+                {name: frozenset(keys) for name, keys in build_member_map(frozen).items()}
+            ),
+            answer_index=FuzzyIndex([*pretty_map.items(), *group_aliases]),
+            member_index=member_index,
+            group_member_indexes=MappingProxyType({
+                key: FuzzyIndex(member_entries(key)) for key in frozen
+            }),
+            search=MemberSearch(frozen, member_index, member_aliases),
+        )
+
+    def groups_of(self, member: str) -> FrozenSet[str]:
+        return self.member_map.get(member.lower(), frozenset())
+
+    def is_answer(self, member: str, answer: str, max_edits: int = 0) -> bool:
+        """Whether ``answer`` (already passed through ``norm_group_key``)
+        names a group of ``member``, allowing up to ``max_edits`` typos."""
+        groups = self.groups_of(member)
+        key = self.pretty_map.get(answer)
+        if key is not None:
+            return key in groups
+        return any(key in groups for key in self.answer_index.lookup(answer, max_edits))
@@ -0,0 +1,105 @@
+"""On-disk cache of file content hashes keyed by ``(path, size, mtime_ns)``.
+
+Checking whether a local photo matches Dropbox means hashing the whole
+file. ``HashCache`` remembers the hash together with the file's size and
+modification time, so unchanged files are only ``stat``-ed. Files written
+by the sync or the bot are added with ``put`` using the hash that is
+already known (from ``FileMetadata.content_hash`` or the uploaded bytes).
+
+Entries are keyed by paths relative to ``DROPBOX_ROOT`` and stored in
+``<state>/file_hashes.json``; ``sync_dropbox.py`` and ``app.py`` share it.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+import photo_manifest
+
+CACHE_VERSION = 1
+CACHE_FILE = "file_hashes.json"
+
+Entry = List[Union[int, str]]  # [size, mtime_ns, hash]
+
+
+def cache_path(images_root: Path) -> Path:
+    return photo_manifest.state_dir(images_root) / CACHE_FILE
+
+
+class HashCache:
+    """``relative path -> [size, mtime_ns, hash]``, safe to use from threads."""
+
+    def __init__(self, path: Optional[Path], hash_file: Callable[[Path], str]) -> None:
+        self.path = path
+        self.hash_file = hash_file
+        self.entries: Dict[str, Entry] = {}
+        self.dirty = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: Path, hash_file: Callable[[Path], str]) -> "HashCache":
+        cache = cls(path, hash_file)
+        try:
+            with Path(path).open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cache
+        if isinstance(data, dict) and data.get("version") == CACHE_VERSION:
+            cache.entries = dict(data.get("paths", {}))
+        return cache
+
+    def hash_of(self, file_path: Path, rel_path: str) -> str:
+        """Hash of ``file_path``, computed only if it changed since last time.
+
+        Raises ``OSError`` if the file cannot be read.
+        """
+        st = os.stat(file_path)
+        with self._lock:
+            known = self.entries.get(rel_path)
+        if known and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+            return str(known[2])
+        content_hash = self.hash_file(Path(file_path))
+        self._store(rel_path, st, content_hash)
+        return content_hash
+
+    def put(self, file_path: Path, rel_path: str, content_hash: str) -> None:
+        """Record ``content_hash`` for a file that was just written."""
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            self.discard(rel_path)
+            return
+        self._store(rel_path, st, content_hash)
+
+    def _store(self, rel_path: str, st: os.stat_result, content_hash: str) -> None:
+        with self._lock:
+            self.entries[rel_path] = [st.st_size, st.st_mtime_ns, content_hash]
+            self.dirty = True
+
+    def discard(self, rel_path: str) -> None:
+        with self._lock:
+            if self.entries.pop(rel_path, None) is not None:
+                self.dirty = True
+
+    def retain(self, keep: Iterable[str], prefix: str = "") -> None:
+        """Drop entries under ``prefix`` that are not in ``keep``."""
+        keep_set = set(keep)
+        with self._lock:
+            stale = [
+                rel for rel in self.entries
+                if rel.startswith(prefix) and rel not in keep_set
+            ]
+            for rel in stale:
+                del self.entries[rel]
+            if stale:
+                self.dirty = True
+
+    def save(self) -> None:
+        with self._lock:
+            if not self.dirty or self.path is None:
+                return
+            data = {"version": CACHE_VERSION, "paths": dict(self.entries)}
+            self.dirty = False
+        photo_manifest.write_json_atomic(self.path, data)
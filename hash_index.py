@@ -0,0 +1,106 @@
+"""Persisted index of Dropbox content hashes of the local photos.
+
+Maps every photo (path relative to ``DROPBOX_ROOT``, e.g.
+``kpop_images/twice/momo/momo__01.jpg``) to its Dropbox content hash and
+keeps the reverse ``hash -> paths`` map in memory, so checking whether an
+uploaded photo already exists anywhere in the library is a single dict
+lookup instead of rehashing a folder.
+
+``sync_dropbox.py`` fills the index from ``FileMetadata.content_hash`` (no
+local hashing needed); ``app.save_user_photo`` adds every upload.
+"""
+
+import json
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+import photo_manifest
+from content_hash import hash_files
+
+INDEX_VERSION = 1
+INDEX_FILE = "photo_hashes.json"
+
+
+def index_path(images_root: Path) -> Path:
+    return photo_manifest.state_dir(images_root) / INDEX_FILE
+
+
+class ContentHashIndex:
+    """``path -> content hash`` with a reverse ``content hash -> paths`` map."""
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.path = path
+        self.hashes: Dict[str, str] = {}
+        self.by_hash: Dict[str, List[str]] = {}
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path: Path) -> "ContentHashIndex":
+        index = cls(path)
+        try:
+            with Path(path).open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return index
+        if isinstance(data, dict) and data.get("version") == INDEX_VERSION:
+            for rel, content_hash in data.get("paths", {}).items():
+                index._set(rel, content_hash)
+        return index
+
+    def _set(self, rel: str, content_hash: str) -> None:
+        self.hashes[rel] = content_hash
+        self.by_hash.setdefault(content_hash, []).append(rel)
+
+    def add(self, rel: str, content_hash: str) -> None:
+        if self.hashes.get(rel) == content_hash:
+            return
+        self.remove(rel)
+        self._set(rel, content_hash)
+        self.dirty = True
+
+    def remove(self, rel: str) -> None:
+        content_hash = self.hashes.pop(rel, None)
+        if content_hash is None:
+            return
+        paths = self.by_hash.get(content_hash, [])
+        if rel in paths:
+            paths.remove(rel)
+        if not paths:
+            self.by_hash.pop(content_hash, None)
+        self.dirty = True
+
+    def retain(self, keep: Iterable[str]) -> None:
+        """Drop every path that is not in ``keep``."""
+        keep_set = set(keep)
+        for rel in [r for r in self.hashes if r not in keep_set]:
+            self.remove(rel)
+
+    def lookup(self, content_hash: str) -> List[str]:
+        """All indexed paths with ``content_hash`` (empty list if none)."""
+        return list(self.by_hash.get(content_hash, []))
+
+    def hash_of(self, rel: str) -> Optional[str]:
+        return self.hashes.get(rel)
+
+    def reconcile(
+        self, root: Path, paths: Iterable[str], hash_file: Callable[[Path], str]
+    ) -> None:
+        """Make the index cover exactly ``paths`` (relative to ``root``).
+
+        Paths missing from the index are hashed with ``hash_file`` on a
+        thread pool; entries for files that no longer exist are dropped.
+        """
+        paths = list(paths)
+        missing = {Path(root) / rel: rel for rel in paths if rel not in self.hashes}
+        for file_path, value in hash_files(missing, hash_file).items():
+            if value is not None:
+                self.add(missing[file_path], value)
+        self.retain(paths)
+
+    def save(self) -> None:
+        if not self.dirty or self.path is None:
+            return
+        photo_manifest.write_json_atomic(
+            self.path, {"version": INDEX_VERSION, "paths": self.hashes}
+        )
+        self.dirty = False
@@ -0,0 +1,116 @@
+"""Find-mode search: the groups a member, or the start of a name, belongs to.
+
+``MemberSearch`` is built once per ``Catalog`` and answers in three steps:
+
+1. exact: folded name (see ``fuzzy_match.fold``) -> every ``(group,
+   member)`` using it, so namesakes in several groups are all returned;
+   each word of a multi-word name and each alias (see ``name_aliases``)
+   is a key too;
+2. prefix: a trie over the folded names completes partial input ("jen" ->
+   Jennie), at most ``limit`` names in alphabetical order;
+3. fuzzy: names closest to a misspelt query, offered as "did you mean".
+
+Every step is a dict lookup or a walk bounded by the query length plus
+the names returned; nothing scans the whole catalog.
+"""
+
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+from fuzzy_match import FuzzyIndex, fold
+
+MIN_PREFIX = 2
+
+
+class Hit(NamedTuple):
+    group: str
+    member: str
+
+
+class SearchResult(NamedTuple):
+    kind: str  # "exact" | "prefix" | "fuzzy" | "none"
+    hits: Tuple[Hit, ...]
+
+
+class _Node:
+    __slots__ = ("children", "term")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "_Node"] = {}
+        self.term: Optional[str] = None
+
+
+class MemberSearch:
+    def __init__(
+        self,
+        groups: Mapping[str, Iterable[str]],
+        names: Optional[FuzzyIndex[str]] = None,
+        aliases: Optional[Mapping[str, Iterable[Tuple[str, str]]]] = None,
+    ) -> None:
+        """``aliases``: group key -> ``(alias, member)`` pairs."""
+        found: Dict[str, List[Hit]] = {}
+
+        def add(key: str, hit: Hit) -> None:
+            if key and hit not in found.setdefault(key, []):
+                found[key].append(hit)
+
+        for group, members in groups.items():
+            for member in members:
+                hit = Hit(group, member)
+                for key in {fold(member)} | {fold(word) for word in member.split()}:
+                    add(key, hit)
+        for group, pairs in (aliases or {}).items():
+            for alias, member in pairs:
+                add(fold(alias), Hit(group, member))
+        self.hits: Dict[str, Tuple[Hit, ...]] = {key: tuple(v) for key, v in found.items()}
+        self._root = _Node()
+        for key in self.hits:
+            self._insert(key)
+        if names is None:
+            names = FuzzyIndex(
+                (member, member) for members in groups.values() for member in members
+            )
+        self.names = names
+
+    def _insert(self, key: str) -> None:
+        node = self._root
+        for ch in key:
+            node = node.children.setdefault(ch, _Node())
+        node.term = key
+
+    def complete(self, prefix: str, limit: int) -> List[str]:
+        """Keys starting with the folded ``prefix``, alphabetically."""
+        node: Optional[_Node] = self._root
+        for ch in fold(prefix):
+            node = node.children.get(ch)
+            if node is None:
+                return []
+        terms: List[str] = []
+        stack = [node]
+        while stack and len(terms) < limit:
+            node = stack.pop()
+            if node.term is not None:
+                terms.append(node.term)
+            stack.extend(node.children[ch] for ch in sorted(node.children, reverse=True))
+        return terms
+
+    def _collect(self, keys: Iterable[str]) -> Tuple[Hit, ...]:
+        hits: Dict[Hit, None] = {}
+        for key in keys:
+            hits.update(dict.fromkeys(self.hits.get(key, ())))
+        return tuple(hits)
+
+    def search(self, text: str, max_edits: int = 0, limit: int = 10) -> SearchResult:
+        query = fold(text)
+        if not query:
+            return SearchResult("none", ())
+        exact = self.hits.get(query)
+        if exact:
+            return SearchResult("exact", exact)
+        if len(query) >= MIN_PREFIX:
+            keys = self.complete(query, limit)
+            if keys:
+                return SearchResult("prefix", self._collect(keys))
+        close = self.names.closest(query, max_edits)
+        if close:
+            return SearchResult("fuzzy", self._collect(close))
+        return SearchResult("none", ())
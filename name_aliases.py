@@ -0,0 +1,89 @@
+"""Other spellings of group and member names, loaded from ``aliases.json``.
+
+Group and member lists carry one spelling per name ("Rose", "JHope",
+"SCoups"). The alias file adds the others people type: Hangul, stage vs.
+birth names, stylised forms::
+
+    {
+      "groups": {"bts": ["방탄소년단", "Bangtan Boys"]},
+      "members": {"blackpink": {"Rose": ["로제", "Roseanne Park"]}}
+    }
+
+Keys are group keys as in ``ALL_GROUPS`` and member names as written
+there. Case, spaces, punctuation and diacritics never need an alias:
+every name is compared through ``fuzzy_match.fold`` ("Rosé", "J-Hope" and
+"S.Coups" already match).
+
+``load_aliases`` compiles the file once into folded-alias -> name dicts, so
+resolving a name is a single lookup however many aliases there are. The
+game indexes (``group_catalog``) and the photo index (``photo_index``) take
+the same ``Aliases``.
+"""
+
+import json
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Mapping, Optional, Tuple
+
+from fuzzy_match import fold
+
+logger = logging.getLogger(__name__)
+
+MemberKey = Tuple[str, str]  # (group key, member)
+
+
+@dataclass(frozen=True, slots=True)
+class Aliases:
+    groups: Mapping[str, Tuple[str, ...]] = field(default_factory=dict)
+    members: Mapping[MemberKey, Tuple[str, ...]] = field(default_factory=dict)
+    # folded alias -> group key
+    group_names: Mapping[str, str] = field(default_factory=dict)
+    # (folded group key, folded alias) -> member
+    member_names: Mapping[MemberKey, str] = field(default_factory=dict)
+
+    @classmethod
+    def compile(
+        cls,
+        groups: Mapping[str, Tuple[str, ...]],
+        members: Mapping[MemberKey, Tuple[str, ...]],
+    ) -> "Aliases":
+        group_names: Dict[str, str] = {}
+        for key, names in groups.items():
+            for name in names:
+                group_names.setdefault(fold(name), key)
+        member_names: Dict[MemberKey, str] = {}
+        for (group, member), names in members.items():
+            for name in names:
+                member_names.setdefault((fold(group), fold(name)), member)
+        return cls(groups, members, group_names, member_names)
+
+    def group(self, name: str) -> Optional[str]:
+        """Group key an alias stands for, if any."""
+        return self.group_names.get(fold(name))
+
+    def member(self, group: str, name: str) -> Optional[str]:
+        """Member of ``group`` an alias stands for; ``group`` may be an
+        alias too."""
+        key = self.group(group) or group
+        return self.member_names.get((fold(key), fold(name)))
+
+
+def load_aliases(path: str) -> Aliases:
+    """Read the alias file; a missing or broken file means no aliases."""
+    file = Path(path)
+    if not file.exists():
+        return Aliases()
+    try:
+        with file.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        groups = {key: tuple(names) for key, names in data.get("groups", {}).items()}
+        members = {
+            (group, member): tuple(names)
+            for group, entries in data.get("members", {}).items()
+            for member, names in entries.items()
+        }
+    except (OSError, ValueError, AttributeError, TypeError) as exc:
+        logger.warning("Cannot load aliases from %s: %s", path, exc)
+        return Aliases()
+    return Aliases.compile(groups, members)
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""Perceptual fingerprints of photos for near-duplicate detection.
+
+Byte-identical uploads are caught by ``hash_index``; recompressed or resized
+copies (e.g. a picture forwarded through Telegram) are not. For those every
+photo gets a 64-bit difference hash (dHash): the image is shrunk to 9x8
+grey pixels and each bit says whether a pixel is brighter than its right
+neighbour. Copies of the same picture differ in only a few bits.
+
+Hashes are searched with multi-index hashing: the 64 bits are split into
+four 16-bit chunks, each with its own table. If two hashes are within
+Hamming distance ``r``, at least one chunk differs by at most ``r // 4``
+bits, so a query only probes a handful of buckets per chunk instead of
+scanning the whole library.
+
+Decoding images requires Pillow; without it ``dhash_bytes`` returns
+``None`` and near-duplicate checks are skipped.
+
+Run ``python perceptual_hash.py`` to print near-duplicates already in the
+library.
+"""
+
+import argparse
+import json
+import os
+from functools import lru_cache
+from io import BytesIO
+from itertools import combinations
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import photo_manifest
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - Pillow is optional
+    Image = None  # type: ignore
+
+INDEX_VERSION = 1
+INDEX_FILE = "photo_phashes.json"
+HASH_BITS = 64
+CHUNKS = 4
+CHUNK_BITS = HASH_BITS // CHUNKS
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+DEFAULT_THRESHOLD = 6
+
+
+def index_path(images_root: Path) -> Path:
+    return photo_manifest.state_dir(images_root) / INDEX_FILE
+
+
+def dhash_bytes(data: bytes) -> Optional[int]:
+    """64-bit dHash of an encoded image or ``None`` if it cannot be decoded."""
+    if Image is None:
+        return None
+    try:
+        with Image.open(BytesIO(data)) as img:
+            small = img.convert("L").resize((9, 8), Image.LANCZOS)
+            pixels = small.tobytes()
+    except Exception:
+        return None
+    value = 0
+    for row in range(8):
+        offset = row * 9
+        for col in range(8):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def dhash_file(path: Path) -> Optional[int]:
+    try:
+        data = Path(path).read_bytes()
+    except OSError:
+        return None
+    return dhash_bytes(data)
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+@lru_cache(maxsize=None)
+def _flip_masks(radius: int) -> Tuple[int, ...]:
+    """All ``CHUNK_BITS``-bit masks with at most ``radius`` bits set."""
+    masks = [0]
+    for k in range(1, radius + 1):
+        for bits in combinations(range(CHUNK_BITS), k):
+            mask = 0
+            for bit in bits:
+                mask |= 1 << bit
+            masks.append(mask)
+    return tuple(masks)
+
+
+class HammingIndex:
+    """Multi-index hash table over 64-bit hashes keyed by arbitrary strings."""
+
+    def __init__(self) -> None:
+        self.hashes: Dict[str, int] = {}
+        self._tables: List[Dict[int, List[str]]] = [{} for _ in range(CHUNKS)]
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    @staticmethod
+    def _chunks(value: int) -> List[int]:
+        return [(value >> (i * CHUNK_BITS)) & CHUNK_MASK for i in range(CHUNKS)]
+
+    def add(self, key: str, value: int) -> None:
+        self.remove(key)
+        self.hashes[key] = value
+        for table, chunk in zip(self._tables, self._chunks(value)):
+            table.setdefault(chunk, []).append(key)
+
+    def remove(self, key: str) -> None:
+        value = self.hashes.pop(key, None)
+        if value is None:
+            return
+        for table, chunk in zip(self._tables, self._chunks(value)):
+            bucket = table.get(chunk)
+            if bucket and key in bucket:
+                bucket.remove(key)
+                if not bucket:
+                    del table[chunk]
+
+    def search(self, value: int, radius: int) -> List[Tuple[int, str]]:
+        """``(distance, key)`` for every hash within ``radius``, nearest first."""
+        masks = _flip_masks(radius // CHUNKS)
+        found: Dict[str, int] = {}
+        for table, chunk in zip(self._tables, self._chunks(value)):
+            for mask in masks:
+                for key in table.get(chunk ^ mask, ()):
+                    if key in found:
+                        continue
+                    dist = hamming(value, self.hashes[key])
+                    if dist <= radius:
+                        found[key] = dist
+        return sorted((dist, key) for key, dist in found.items())
+
+
+class PerceptualIndex(HammingIndex):
+    """``HammingIndex`` of photo paths persisted as JSON in the state folder."""
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        super().__init__()
+        self.path = path
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path: Path) -> "PerceptualIndex":
+        index = cls(path)
+        try:
+            with Path(path).open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return index
+        if isinstance(data, dict) and data.get("version") == INDEX_VERSION:
+            for rel, hex_hash in data.get("paths", {}).items():
+                HammingIndex.add(index, rel, int(hex_hash, 16))
+        return index
+
+    def add(self, key: str, value: int) -> None:
+        if self.hashes.get(key) == value:
+            return
+        super().add(key, value)
+        self.dirty = True
+
+    def remove(self, key: str) -> None:
+        if key in self.hashes:
+            super().remove(key)
+            self.dirty = True
+
+    def retain(self, keep: Iterable[str]) -> None:
+        keep_set = set(keep)
+        for key in [k for k in self.hashes if k not in keep_set]:
+            self.remove(key)
+
+    def reconcile(
+        self,
+        root: Path,
+        paths: Iterable[str],
+        hash_file: Callable[[Path], Optional[int]] = dhash_file,
+    ) -> None:
+        """Hash files from ``paths`` missing in the index, drop vanished ones."""
+        paths = list(paths)
+        if Image is not None:
+            for rel in paths:
+                if rel not in self.hashes:
+                    value = hash_file(Path(root) / rel)
+                    if value is not None:
+                        self.add(rel, value)
+        self.retain(paths)
+
+    def near_duplicate_pairs(self, radius: int) -> List[Tuple[int, str, str]]:
+        """Every pair of indexed photos within ``radius`` bits."""
+        pairs: List[Tuple[int, str, str]] = []
+        for key, value in self.hashes.items():
+            for dist, other in self.search(value, radius):
+                if other > key:
+                    pairs.append((dist, key, other))
+        return sorted(pairs)
+
+    def save(self) -> None:
+        if not self.dirty or self.path is None:
+            return
+        photo_manifest.write_json_atomic(
+            self.path,
+            {
+                "version": INDEX_VERSION,
+                "paths": {k: f"{v:016x}" for k, v in self.hashes.items()},
+            },
+        )
+        self.dirty = False
+
+
+def load_library_index(root: Path) -> PerceptualIndex:
+    """Load the index for ``root/kpop_images`` and bring it up to date."""
+    images_root = Path(root) / "kpop_images"
+    index = PerceptualIndex.load(index_path(images_root))
+    manifest = photo_manifest.update_manifest(images_root)
+    index.reconcile(
+        Path(root),
+        (
+            f"kpop_images/{group}/{member}/{name}"
+            for group, member, files in photo_manifest.iter_member_files(manifest)
+            for name in files
+        ),
+    )
+    return index
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Report near-duplicate photos.")
+    parser.add_argument("--root", default=os.environ.get("DROPBOX_ROOT", "./dropbox_sync"))
+    parser.add_argument("--threshold", type=int, default=DEFAULT_THRESHOLD,
+                        help="maximum Hamming distance between dHashes")
+    args = parser.parse_args()
+
+    if Image is None:
+        raise SystemExit("Pillow is required: pip install pillow")
+    index = load_library_index(Path(args.root))
+    index.save()
+    pairs = index.near_duplicate_pairs(args.threshold)
+    for dist, a, b in pairs:
+        print(f"{dist:2d}  {a}  ~  {b}")
+    print(f"{len(pairs)} near-duplicate pair(s) among {len(index)} photo(s)")
+
+
+if __name__ == "__main__":
+    main()
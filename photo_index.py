@@ -0,0 +1,154 @@
+"""Photo paths of every group member, built from the library manifest.
+
+``PhotoIndex`` maps ``(group, member)``, both passed through ``normalize``,
+to a tuple of paths. Looking up a member of a known group is a single dict
+lookup, and two idols with the same name in different groups never share
+photos.
+
+Member folders may carry longer names than the bot uses ("Kim Minji" for
+"Minji"), so each whitespace-separated token of a folder name is also an
+alias of that member inside its group, unless another member of the group
+has the same token. ``lookup`` serves callers that do not know the group
+(quiz illustrations): a name or token maps to the photos of every member
+using it, like the old flat map did.
+
+Folders named with an alias of a group or member ("로제", "Roseanne Park",
+"(G)I-DLE", see ``name_aliases``) are filed under the name the bot uses,
+and so are lookups by alias: ``paths`` resolves both names, ``lookup``
+returns the photos of every member the alias stands for. The alias tables
+are re-keyed by ``normalize`` once, so resolving a key costs two cached
+``normalize`` calls and two dict lookups.
+
+Keys are interned and path lists are tuples. ``add`` and ``rename`` swap in
+new tuples instead of mutating them, so readers on other threads always see
+a complete list.
+"""
+
+import sys
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+from fuzzy_match import fold
+from name_aliases import Aliases
+
+Key = Tuple[str, str]  # (normalized group, normalized member)
+Paths = Tuple[str, ...]
+
+
+@lru_cache(maxsize=8192)
+def normalize(name: str) -> str:
+    """``"Le Sserafim"`` -> ``"lesserafim"`` (see ``fuzzy_match.fold``); the
+    result is interned."""
+    return sys.intern(fold(name))
+
+
+def _aliases(member: str) -> Tuple[str, ...]:
+    """Normalized full name first, then the tokens that differ from it."""
+    full = normalize(member)
+    tokens = (normalize(token) for token in member.split())
+    return (full, *dict.fromkeys(t for t in tokens if t and t != full))
+
+
+class PhotoIndex:
+    """``(group, member) -> paths`` plus alias tables for loose lookups."""
+
+    def __init__(self, aliases: Optional[Aliases] = None) -> None:
+        self.name_aliases = aliases or Aliases()
+        # ``Aliases`` keys are folded already; values become normalized keys
+        self._group_alias: Dict[str, str] = {
+            sys.intern(alias): normalize(group)
+            for alias, group in self.name_aliases.group_names.items()
+        }
+        self._member_alias: Dict[Key, str] = {}
+        by_alias: Dict[str, Dict[Key, None]] = {}
+        for (group, alias), member in self.name_aliases.member_names.items():
+            key = (normalize(group), normalize(member))
+            self._member_alias[(key[0], sys.intern(alias))] = key[1]
+            by_alias.setdefault(sys.intern(alias), {})[key] = None
+        # alias -> member keys it stands for, for lookups without a group
+        self._alias_keys: Dict[str, Tuple[Key, ...]] = {
+            alias: tuple(keys) for alias, keys in by_alias.items()
+        }
+        self.members: Dict[Key, Paths] = {}
+        # (group, token) -> member key; ``None`` when the token is ambiguous
+        self.scoped: Dict[Key, Optional[Key]] = {}
+        self.aliases: Dict[str, Paths] = {}  # name or token -> paths, any group
+        self._member_aliases: Dict[Key, Tuple[str, ...]] = {}
+
+    @classmethod
+    def build(
+        cls, entries: Iterable[Tuple[str, str, Iterable[str]]], aliases: Optional[Aliases] = None
+    ) -> "PhotoIndex":
+        """Index from ``(group folder, member folder, paths)`` triples."""
+        index = cls(aliases)
+        for group, member, paths in entries:
+            index._extend(group, member, tuple(paths))
+        return index
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def _key(self, group: str, member: str) -> Key:
+        """Normalized key, with aliases replaced by the names they stand for."""
+        group_key = normalize(group)
+        group_key = self._group_alias.get(group_key, group_key)
+        member_key = normalize(member)
+        return group_key, self._member_alias.get((group_key, member_key), member_key)
+
+    def _register(self, group: str, member: str) -> Key:
+        key = self._key(group, member)
+        if key not in self._member_aliases:
+            aliases = tuple(dict.fromkeys((key[1], *_aliases(member))))
+            self._member_aliases[key] = aliases
+            for token in aliases[1:]:
+                scoped = (key[0], token)
+                self.scoped[scoped] = key if self.scoped.get(scoped, key) == key else None
+        return key
+
+    def _extend(self, group: str, member: str, paths: Paths) -> None:
+        key = self._register(group, member)
+        self.members[key] = self.members.get(key, ()) + paths
+        for alias in self._member_aliases[key]:
+            self.aliases[alias] = self.aliases.get(alias, ()) + paths
+
+    def paths(self, group: str, name: str) -> Paths:
+        """Photos of ``name`` in ``group``; empty if there are none."""
+        key = self._key(group, name)
+        paths = self.members.get(key)
+        if paths is not None:
+            return paths
+        target = self.scoped.get(key)
+        return self.members.get(target, ()) if target is not None else ()
+
+    def lookup(self, name: str) -> Paths:
+        """Photos of every member called ``name`` (or with it in their name);
+        otherwise of every member ``name`` is an alias of."""
+        alias = normalize(name)
+        paths = self.aliases.get(alias)
+        if paths is not None:
+            return paths
+        return tuple(
+            path for key in self._alias_keys.get(alias, ()) for path in self.members.get(key, ())
+        )
+
+    def has_photos(self, group: str, name: str) -> bool:
+        return bool(self.paths(group, name))
+
+    def add(self, group: str, member: str, path: str) -> None:
+        self._extend(group, member, (path,))
+
+    def rename(self, old_path: str, new_path: str) -> None:
+        """Replace ``old_path`` (``/<root>/<group>/<member>/<file>``)."""
+        parts = old_path.rsplit("/", 3)
+        if len(parts) != 4:
+            return
+        key = self._key(parts[1], parts[2])
+        if key not in self.members:
+            return
+
+        def swap(paths: Paths) -> Paths:
+            return tuple(new_path if p == old_path else p for p in paths)
+
+        self.members[key] = swap(self.members[key])
+        for alias in self._member_aliases[key]:
+            self.aliases[alias] = swap(self.aliases[alias])
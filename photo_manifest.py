@@ -0,0 +1,160 @@
+"""Persisted listing of the local photo library.
+
+The bot used to walk every ``group/member`` directory under
+``DROPBOX_ROOT/kpop_images`` on each start. The manifest keeps the result of
+that walk on disk together with the ``mtime_ns`` of every directory, so a
+cold start only needs one JSON read plus a ``stat`` per directory. Only
+directories whose mtime changed (a file or subfolder was added, removed or
+renamed) are listed again.
+
+The manifest is written by ``sync_dropbox.py`` after each sync and by
+``app.save_user_photo`` after each upload. It lives in a hidden state folder
+next to the images so that the Dropbox sync never treats it as a photo.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+MANIFEST_VERSION = 1
+STATE_DIR_NAME = ".kpop_state"
+MANIFEST_FILE = "photo_manifest.json"
+
+# root (depth 0) -> group (1) -> member (2); files are only listed for members
+MEMBER_DEPTH = 2
+
+Manifest = Dict[str, object]
+
+
+def state_dir(images_root: Path) -> Path:
+    """Folder with the bot's bookkeeping files for ``images_root``."""
+    return Path(images_root).parent / STATE_DIR_NAME
+
+
+def manifest_path(images_root: Path) -> Path:
+    return state_dir(images_root) / MANIFEST_FILE
+
+
+def write_json_atomic(path: Path, data: object) -> None:
+    """Write ``data`` as JSON so that readers never see a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def empty_manifest() -> Manifest:
+    return {"version": MANIFEST_VERSION, "dirs": {}}
+
+
+def load_manifest(path: Path) -> Manifest:
+    """Read the manifest from ``path``; unreadable files yield an empty one."""
+    try:
+        with Path(path).open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return empty_manifest()
+    if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+        return empty_manifest()
+    if not isinstance(data.get("dirs"), dict):
+        return empty_manifest()
+    return data
+
+
+def save_manifest(path: Path, manifest: Manifest) -> None:
+    write_json_atomic(Path(path), manifest)
+
+
+def _list_dir(path: Path, depth: int, mtime_ns: int) -> Dict[str, object]:
+    dirs: List[str] = []
+    files: List[str] = []
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.name == STATE_DIR_NAME:
+                continue
+            try:
+                if entry.is_dir():
+                    if depth < MEMBER_DEPTH:
+                        dirs.append(entry.name)
+                elif depth == MEMBER_DEPTH and entry.is_file():
+                    files.append(entry.name)
+            except OSError:
+                continue
+    dirs.sort()
+    files.sort()
+    return {"mtime_ns": mtime_ns, "dirs": dirs, "files": files}
+
+
+def refresh_manifest(images_root: Path, manifest: Manifest) -> Tuple[Manifest, bool]:
+    """Bring ``manifest`` in line with ``images_root``.
+
+    Every known directory is ``stat``-ed; only those with a different mtime
+    (or not seen before) are listed again. Returns the refreshed manifest and
+    whether anything changed.
+    """
+    images_root = Path(images_root)
+    old: Dict[str, Dict[str, object]] = manifest.get("dirs", {})  # type: ignore[assignment]
+    new: Dict[str, Dict[str, object]] = {}
+    changed = False
+
+    stack: List[Tuple[str, int]] = [("", 0)]
+    while stack:
+        rel, depth = stack.pop()
+        path = images_root / rel if rel else images_root
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            changed = True
+            continue
+        record = old.get(rel)
+        if record is None or record.get("mtime_ns") != mtime_ns:
+            try:
+                record = _list_dir(path, depth, mtime_ns)
+            except OSError:
+                changed = True
+                continue
+            changed = True
+        new[rel] = record
+        for name in record.get("dirs", []):  # type: ignore[union-attr]
+            stack.append((f"{rel}/{name}" if rel else name, depth + 1))
+
+    if set(new) != set(old):
+        changed = True
+    return {"version": MANIFEST_VERSION, "dirs": new}, changed
+
+
+def update_manifest(images_root: Path) -> Manifest:
+    """Load the manifest for ``images_root``, refresh it and persist changes."""
+    path = manifest_path(images_root)
+    manifest, changed = refresh_manifest(images_root, load_manifest(path))
+    if changed:
+        try:
+            save_manifest(path, manifest)
+        except OSError:
+            pass
+    return manifest
+
+
+def iter_member_files(manifest: Manifest) -> Iterator[Tuple[str, str, List[str]]]:
+    """Yield ``(group_dir, member_dir, files)`` for every non-empty member folder."""
+    dirs: Dict[str, Dict[str, object]] = manifest.get("dirs", {})  # type: ignore[assignment]
+    for rel in sorted(dirs):
+        parts = rel.split("/")
+        if len(parts) != MEMBER_DEPTH:
+            continue
+        files: List[str] = dirs[rel].get("files", [])  # type: ignore[assignment]
+        if files:
+            yield parts[0], parts[1], files
+
+
+def library_paths(images_root: Path) -> List[str]:
+    """Every photo of the library, relative to ``images_root.parent``."""
+    manifest = update_manifest(images_root)
+    prefix = Path(images_root).name
+    return [
+        f"{prefix}/{group}/{member}/{name}"
+        for group, member, files in iter_member_files(manifest)
+        for name in files
+    ]
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""Optional pack file with every photo of the library, read through ``mmap``.
+
+Serving a photo from ``kpop_images/<group>/<member>/<file>`` costs an
+open/read/close and a fresh ``bytes`` object per send. The pack stores all
+photos back to back in one data file (``.kpop_state/photos.<n>.pack``) with
+an index ``path -> [offset, length, mtime_ns]`` in
+``.kpop_state/photos.pack.json``. ``PhotoPack.get`` returns a
+``memoryview`` slice of the memory-mapped data file, so reads copy nothing
+and hit the page cache.
+
+The loose files stay the source of truth. ``update`` appends photos whose
+size or mtime changed and forgets removed ones; ``append`` adds a single
+new upload. Given the loose file's ``stat``, ``get`` only returns a photo
+whose packed size and mtime still match it. Replaced and removed photos
+leave dead space behind that ``compact`` reclaims by rewriting the live
+photos, grouped by member, into a new data file.
+
+The bot and this script may hold the same pack. Before every change the
+index file is checked and reloaded if another process rewrote it (e.g.
+``compact`` switched to a new data file), so the change is never written
+to a deleted data file or saved over the newer index.
+
+Usage: ``python photo_pack.py [--root DIR] {build,compact,stats}``
+"""
+
+import argparse
+import json
+import mmap
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import photo_manifest
+
+PACK_VERSION = 1
+INDEX_FILE = "photos.pack.json"
+
+Entry = List[int]  # [offset, length, mtime_ns]
+
+
+def index_path(images_root: Path) -> Path:
+    return photo_manifest.state_dir(images_root) / INDEX_FILE
+
+
+class PhotoPack:
+    """Append-only data file plus JSON index; safe to use from threads."""
+
+    def __init__(self, index_file: Path) -> None:
+        self.index_file = Path(index_file)
+        self.data_name = "photos.0.pack"
+        self.entries: Dict[str, Entry] = {}
+        self.end = 0
+        self.dirty = False
+        self._map: Optional[mmap.mmap] = None
+        self._lock = threading.RLock()
+        self._generation: Optional[tuple] = None  # index file as last read/written
+
+    @classmethod
+    def load(cls, index_file: Path) -> "PhotoPack":
+        pack = cls(index_file)
+        # Taken before reading: a concurrent rewrite only causes a reload
+        pack._generation = pack._stamp()
+        try:
+            with pack.index_file.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return pack
+        if isinstance(data, dict) and data.get("version") == PACK_VERSION:
+            pack.data_name = str(data.get("data", pack.data_name))
+            pack.entries = dict(data.get("entries", {}))
+            pack.end = int(data.get("end", 0))
+        return pack
+
+    @property
+    def data_path(self) -> Path:
+        return self.index_file.parent / self.data_name
+
+    def _stamp(self) -> Optional[tuple]:
+        try:
+            st = self.index_file.stat()
+        except OSError:
+            return None
+        # Saves replace the file, so the inode changes on every rewrite
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _refresh(self) -> None:
+        """Reload the index if another process has rewritten it."""
+        if self._stamp() == self._generation:
+            return
+        fresh = PhotoPack.load(self.index_file)
+        self.data_name, self.entries, self.end = fresh.data_name, fresh.entries, fresh.end
+        self._generation = fresh._generation
+        self._map = None  # slices handed out earlier keep the old map alive
+        self.dirty = False
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, rel_path: str) -> bool:
+        return rel_path in self.entries
+
+    def live_bytes(self) -> int:
+        return sum(entry[1] for entry in self.entries.values())
+
+    def _mapped(self) -> Optional[mmap.mmap]:
+        if self._map is not None and len(self._map) >= self.end:
+            return self._map
+        if self.end == 0:
+            return None
+        try:
+            with self.data_path.open("rb") as f:
+                # The previous map is left to the garbage collector: slices
+                # handed out earlier may still point into it.
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            self._map = None
+        return self._map
+
+    def get(self, rel_path: str, stat: Optional[os.stat_result] = None) -> Optional[memoryview]:
+        """Zero-copy view of the photo or ``None`` if it is not packed.
+
+        With ``stat`` of the loose file, a packed copy whose size or mtime
+        differs from it is stale and ``None`` is returned as well.
+        """
+        with self._lock:
+            entry = self.entries.get(rel_path)
+            if entry is None:
+                return None
+            if stat is not None and (entry[1], entry[2]) != (stat.st_size, stat.st_mtime_ns):
+                return None
+            data = self._mapped()
+            offset, length = entry[0], entry[1]
+            if data is None or offset + length > len(data):
+                return None
+            return memoryview(data)[offset:offset + length]
+
+    def _write(self, rel_path: str, data: bytes, mtime_ns: int) -> None:
+        path = self.data_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write at ``end`` rather than appending: bytes past it were never
+        # indexed (e.g. a crash before the index was saved). A data file
+        # that vanished (compacted away) is not recreated.
+        with path.open("r+b" if self.end else "wb") as f:
+            f.seek(self.end)
+            f.write(data)
+        self.entries[rel_path] = [self.end, len(data), mtime_ns]
+        self.end += len(data)
+        self.dirty = True
+
+    def append(self, rel_path: str, data: bytes, mtime_ns: int = 0) -> None:
+        """Add (or replace) one photo and save the index."""
+        with self._lock:
+            self._refresh()
+            self._write(rel_path, data, mtime_ns)
+            self.save()
+
+    def rename(self, old_path: str, new_path: str) -> None:
+        with self._lock:
+            self._refresh()
+            entry = self.entries.pop(old_path, None)
+            if entry is not None:
+                self.entries[new_path] = entry
+                self.dirty = True
+                self.save()
+
+    def update(self, root: Path, paths: Iterable[str]) -> int:
+        """Make the pack hold exactly ``paths`` (relative to ``root``).
+
+        Only files whose size or mtime differ from the index are read, and
+        without holding the lock: readers are only blocked while a photo
+        is written to the data file. Returns the number of photos written.
+        """
+        written = 0
+        keep = set()
+        with self._lock:
+            self._refresh()
+        for rel in paths:
+            file_path = Path(root) / rel
+            try:
+                st = file_path.stat()
+                with self._lock:
+                    entry = self.entries.get(rel)
+                if entry is None or entry[1] != st.st_size or entry[2] != st.st_mtime_ns:
+                    data = file_path.read_bytes()
+                    with self._lock:
+                        self._write(rel, data, st.st_mtime_ns)
+                    written += 1
+            except OSError:
+                continue
+            keep.add(rel)
+        with self._lock:
+            self._refresh()
+            for rel in [r for r in self.entries if r not in keep]:
+                del self.entries[rel]
+                self.dirty = True
+            self.save()
+        return written
+
+    def compact(self) -> int:
+        """Rewrite live photos into a new data file; returns bytes reclaimed."""
+        with self._lock:
+            self._refresh()
+            before = self.end
+            old_path = self.data_path
+            source = self._mapped()
+            new_name = f"photos.{time.time_ns()}.pack"
+            new_path = self.index_file.parent / new_name
+            entries: Dict[str, Entry] = {}
+            end = 0
+            with new_path.open("wb") as f:
+                for rel in sorted(self.entries):  # neighbours on disk per member
+                    offset, length, mtime_ns = self.entries[rel]
+                    if source is None or offset + length > len(source):
+                        continue
+                    f.write(source[offset:offset + length])
+                    entries[rel] = [end, length, mtime_ns]
+                    end += length
+            self.data_name, self.entries, self.end = new_name, entries, end
+            self._map = None
+            self.dirty = True
+            self.save()
+            if old_path != new_path:
+                try:
+                    old_path.unlink()  # open maps keep the old data readable
+                except FileNotFoundError:
+                    pass
+            return before - end
+
+    def save(self) -> None:
+        with self._lock:
+            if not self.dirty:
+                return
+            photo_manifest.write_json_atomic(
+                self.index_file,
+                {
+                    "version": PACK_VERSION,
+                    "data": self.data_name,
+                    "end": self.end,
+                    "entries": self.entries,
+                },
+            )
+            self._generation = self._stamp()
+            self.dirty = False
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build or compact the photo pack.")
+    parser.add_argument("--root", default=os.environ.get("DROPBOX_ROOT", "./dropbox_sync"))
+    parser.add_argument("command", choices=["build", "compact", "stats"])
+    args = parser.parse_args()
+
+    images_root = Path(args.root) / "kpop_images"
+    pack = PhotoPack.load(index_path(images_root))
+    if args.command == "build":
+        written = pack.update(Path(args.root), photo_manifest.library_paths(images_root))
+        print(f"Packed {written} new or changed photo(s)")
+    elif args.command == "compact":
+        print(f"Reclaimed {pack.compact() / 1e6:.1f} MB")
+    live = pack.live_bytes()
+    print(
+        f"{len(pack)} photo(s), {live / 1e6:.1f} MB live, "
+        f"{(pack.end - live) / 1e6:.1f} MB dead in {pack.data_path}"
+    )
+
+
+if __name__ == "__main__":
+    main()
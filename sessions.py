@@ -0,0 +1,77 @@
+"""Per-user state of the bot's modes, stored in ``context.user_data``.
+
+Each mode keeps one small ``__slots__`` dataclass instead of a nested dict:
+no per-instance ``__dict__``, fixed fields, attribute access. Sessions only
+hold counters and references into structures shared by every user (member
+names and the compiled ``Catalog`` of a game, quiz questions from
+``QUIZ_POOL``, photo paths from the photo index), never copies of them and
+never image bytes.
+
+``benchmarks/bench_sessions.py`` measures the footprint of 10k sessions.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, NamedTuple, Optional, Set
+
+from group_catalog import Catalog
+
+
+class PhotoItem(NamedTuple):
+    """One question of the photo game."""
+
+    name: str
+    path: str
+
+
+class CatalogItem(NamedTuple):
+    """One photo of the catalog; the file is read only when it is sent."""
+
+    path: str
+    name: str
+    group: str
+
+
+@dataclass(slots=True)
+class GameSession:
+    """"Guess the group": members to ask about and the shared catalog."""
+
+    members: List[str]
+    catalog: Catalog
+    total: int
+    index: int = 0
+    score: int = 0
+    current_member: Optional[str] = None
+
+
+@dataclass(slots=True)
+class PhotoGameSession:
+    items: List[PhotoItem]
+    total: int
+    index: int = 0
+    score: int = 0
+    current: Optional[PhotoItem] = None
+
+
+@dataclass(slots=True)
+class QuizSession:
+    questions: List[Dict[str, str]]  # items of QUIZ_POOL, not copies
+    total: int
+    index: int = 0
+    score: int = 0
+    current: Optional[Dict[str, str]] = None
+
+
+@dataclass(slots=True)
+class LearnSession:
+    group_key: str
+    to_learn: List[str]
+    known: Set[str] = field(default_factory=set)  # lower-cased names guessed right
+    current: Optional[str] = None
+
+
+@dataclass(slots=True)
+class CatalogSession:
+    items: List[CatalogItem]
+    mode: str  # "group" | "random"
+    group: Optional[str] = None
+    index: int = 0
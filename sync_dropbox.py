@@ -10,112 +10,393 @@ Only new or modified files are downloaded and any files removed from
 Dropbox are also deleted locally. This avoids re-downloading unchanged
 content on subsequent runs while keeping the local folder in sync with
 Dropbox.
+
+Downloads run on a pool of `SYNC_CONCURRENCY` threads (defaults to
+`DROPBOX_MAX_CONNECTIONS`) while the listing is still being paged in.
+
+After a successful run the Dropbox list cursor is stored in the state
+folder; the next run only asks `files_list_folder_continue` for what has
+changed since then. A full listing (`--full`) is done on the first run,
+when the cursor is reset by Dropbox or after downloads failed.
+
+Local hashes are looked up in the shared `hash_cache` (keyed by size and
+mtime), so unchanged files are not re-read. Deletions only touch the local
+copy of the remote folder.
 """
 
+import argparse
+import contextlib
+import json
 import logging
 import os
+import shutil
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from pathlib import Path
-import hashlib
 
 import dropbox
 
+import content_hash
+import dropbox_client
+import hash_cache
+import hash_index
+import perceptual_hash
+import photo_manifest
+import photo_pack
+import upload_queue
+
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 
-APP_KEY = os.environ.get("DROPBOX_APP_KEY")
-APP_SECRET = os.environ.get("DROPBOX_APP_SECRET")
-REFRESH_TOKEN = os.environ.get("DROPBOX_REFRESH_TOKEN")
 DROPBOX_ROOT = Path(os.environ.get("DROPBOX_ROOT", "./dropbox_sync"))
 REMOTE_FOLDER = os.environ.get("DROPBOX_REMOTE_PATH", "/kpop_images")
+SYNC_CONCURRENCY = int(
+    os.environ.get("SYNC_CONCURRENCY", str(dropbox_client.MAX_CONNECTIONS))
+)
+DOWNLOAD_ATTEMPTS = 3
+CURSOR_VERSION = 1
+CURSOR_FILE = "sync_cursor.json"
+DOWNLOAD_DIR = "downloads"
+PROGRESS_INTERVAL = 5.0  # seconds between progress log lines
+PHOTO_PACK = os.environ.get("PHOTO_PACK", "") == "1"
+
 
+def cursor_path(images_root: Path) -> Path:
+    return photo_manifest.state_dir(images_root) / CURSOR_FILE
 
-CHUNK_SIZE = 4 * 1024 * 1024  # 4MB used by Dropbox for content hashes
 
+def load_cursor(images_root: Path, remote_folder: str) -> str | None:
+    """Stored list cursor for ``remote_folder`` or ``None``."""
+    try:
+        with cursor_path(images_root).open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (
+        isinstance(data, dict)
+        and data.get("version") == CURSOR_VERSION
+        and data.get("remote_folder") == remote_folder
+    ):
+        return data.get("cursor")
+    return None
 
-def _dropbox_content_hash(path: Path) -> str:
-    """Compute the Dropbox content hash for ``path``.
 
-    See https://www.dropbox.com/developers/reference/content-hash
+def save_cursor(images_root: Path, remote_folder: str, cursor: str | None) -> None:
+    """Store ``cursor`` (``None`` forgets it and forces a full listing)."""
+    path = cursor_path(images_root)
+    if cursor is None:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        return
+    photo_manifest.write_json_atomic(
+        path,
+        {"version": CURSOR_VERSION, "remote_folder": remote_folder, "cursor": cursor},
+    )
+
+
+def _record_entries(entries: list[dropbox.files.Metadata],
+                    seen_files: set[str],
+                    deleted: set[str],
+                    hashes: hash_index.ContentHashIndex | None = None
+                    ) -> list[dropbox.files.FileMetadata]:
+    """Apply listed entries to ``seen_files`` / ``deleted``.
+
+    ``seen_files`` ends up as the set of remote files; paths in ``deleted``
+    (files or folders) are removed locally once the downloads finished.
+    Returns the files to hand to the download pool.
     """
-    hasher = hashlib.sha256()
-    with path.open("rb") as f:
-        while True:
-            chunk = f.read(CHUNK_SIZE)
-            if not chunk:
-                break
-            hasher.update(hashlib.sha256(chunk).digest())
-    return hasher.hexdigest()
-
-
-def _download_entries(dbx: dropbox.Dropbox,
-                      entries: list[dropbox.files.Metadata],
-                      local_root: Path,
-                      seen_files: set[str]) -> None:
+    files = []
     for entry in entries:
+        rel_path = entry.path_lower.lstrip("/")
         if isinstance(entry, dropbox.files.FileMetadata):
-            rel_path = entry.path_lower.lstrip("/")
             seen_files.add(rel_path)
-            local_path = local_root / rel_path
-            local_path.parent.mkdir(parents=True, exist_ok=True)
+            deleted.discard(rel_path)
+            if hashes is not None:
+                hashes.add(rel_path, entry.content_hash)
+            files.append(entry)
+        elif isinstance(entry, dropbox.files.DeletedMetadata):
+            prefix = rel_path + "/"
+            gone = {p for p in seen_files if p == rel_path or p.startswith(prefix)}
+            seen_files.difference_update(gone)
+            deleted.add(rel_path)
+            if hashes is not None:
+                for path in gone:
+                    hashes.remove(path)
+    return files
+
+
+def _prune(directory: Path, prefix: str, keep: set[str], removed: list[str]) -> bool:
+    """Delete files under ``directory`` that are not in ``keep``.
+
+    One ``os.scandir`` pass over the tree; folders left empty are removed
+    on the way back up. ``prefix`` is ``directory`` relative to the local
+    root (with a trailing slash). Deleted paths are appended to
+    ``removed``. Returns ``True`` if ``directory`` was removed.
+    """
+    empty = True
+    try:
+        it = os.scandir(directory)
+    except FileNotFoundError:
+        return True
+    with it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name == photo_manifest.STATE_DIR_NAME or not _prune(
+                    Path(entry.path), f"{prefix}{entry.name}/", keep, removed
+                ):
+                    empty = False
+                continue
+            rel = prefix + entry.name
+            if rel in keep:
+                empty = False
+                continue
+            os.unlink(entry.path)
+            removed.append(rel)
+            logging.info("Removed %s", entry.path)
+    if empty:
+        os.rmdir(directory)
+    return empty
+
+
+def _delete_local(local_root: Path, rel_path: str, keep: set[str], removed: list[str]) -> None:
+    """Remove the file or folder ``rel_path`` except for paths in ``keep``."""
+    target = local_root / rel_path
+    if target.is_dir():
+        _prune(target, rel_path + "/", keep, removed)
+    elif target.is_file() and rel_path not in keep:
+        target.unlink()
+        removed.append(rel_path)
+        logging.info("Removed %s", target)
+    parent = target.parent
+    while parent != local_root and parent.is_dir() and not any(parent.iterdir()):
+        parent.rmdir()
+        parent = parent.parent
+
+
+def _sync_file(dbx: dropbox.Dropbox,
+               entry: dropbox.files.FileMetadata,
+               local_root: Path,
+               cache: hash_cache.HashCache,
+               tmp_dir: Path) -> int:
+    """Download ``entry`` unless the local copy matches.
+
+    The file is streamed into ``tmp_dir`` and moved into place only if it
+    matches ``entry.content_hash``. Returns the number of bytes written (0
+    for an unchanged file). Errors not already retried by
+    ``call_with_backoff`` (a broken stream, a hash mismatch, a failed
+    write) get ``DOWNLOAD_ATTEMPTS`` tries in total.
+    """
+    rel_path = entry.path_lower.lstrip("/")
+    local_path = local_root / rel_path
+    try:
+        if cache.hash_of(local_path, rel_path) == entry.content_hash:
+            return 0  # skip unchanged file
+    except OSError:
+        pass  # missing or unreadable
 
-            if local_path.exists():
-                try:
-                    if _dropbox_content_hash(local_path) == entry.content_hash:
-                        continue  # skip unchanged file
-                except OSError:
-                    pass
+    for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+        try:
+            size = dropbox_client.download_file(
+                dbx, entry.path_lower, local_path, entry.content_hash, tmp_dir
+            )
+        except dropbox.exceptions.ApiError:
+            raise  # e.g. deleted since the listing; retrying will not help
+        except Exception as exc:
+            if attempt == DOWNLOAD_ATTEMPTS:
+                raise
+            logging.warning("Download of %s failed (%r), attempt %d/%d",
+                            entry.path_lower, exc, attempt, DOWNLOAD_ATTEMPTS)
+            continue
+        cache.put(local_path, rel_path, entry.content_hash)
+        logging.debug("Saved %s", local_path)
+        return size
+    return 0  # not reached
 
-            _, res = dbx.files_download(entry.path_lower)
-            with local_path.open("wb") as f:
-                f.write(res.content)
-            logging.info("Saved %s", local_path)
+
+class _Progress:
+    """Counts finished downloads and logs a summary every ``interval`` seconds."""
+
+    def __init__(self, interval: float = PROGRESS_INTERVAL) -> None:
+        self.interval = interval
+        self.total = 0
+        self.done = 0
+        self.downloaded = 0
+        self.failed = 0
+        self.removed = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+        self._last_log = self.started
+        self._lock = threading.Lock()
+
+    def add(self, count: int) -> None:
+        with self._lock:
+            self.total += count
+
+    def finish(self, size: int | None) -> None:
+        with self._lock:
+            self.done += 1
+            if size is None:
+                self.failed += 1
+            elif size:
+                self.downloaded += 1
+                self.bytes += size
+            now = time.monotonic()
+            if now - self._last_log >= self.interval:
+                self._last_log = now
+                self.log()
+
+    def log(self) -> None:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        logging.info(
+            "Synced %d/%d files: %d downloaded (%.1f MB, %.1f MB/s), %d failed",
+            self.done, self.total, self.downloaded, self.bytes / 1e6,
+            self.bytes / 1e6 / elapsed, self.failed,
+        )
+
+
+def _list_changes(dbx: dropbox.Dropbox, cursor: str):
+    """First page of changes since ``cursor`` or ``None`` if it is unusable."""
+    try:
+        return dropbox_client.call_with_backoff(dbx, "files_list_folder_continue", cursor)
+    except dropbox.exceptions.ApiError as exc:
+        if not isinstance(exc.error, dropbox.files.ListFolderContinueError):
+            raise
+        reason = "reset" if exc.error.is_reset() else exc.error
+        logging.info("Stored cursor is no longer valid (%s), doing a full listing", reason)
+        return None
 
 
 def sync_folder(dbx: dropbox.Dropbox,
                 remote_folder: str,
-                local_root: Path) -> None:
+                local_root: Path,
+                concurrency: int | None = None,
+                full: bool = False,
+                lock: contextlib.AbstractContextManager | None = None) -> _Progress:
     """Download ``remote_folder`` into ``local_root``.
 
-    Only new or modified files are fetched. Files that were removed from
-    Dropbox are deleted locally.
+    Only new or modified files are fetched, ``concurrency`` (default
+    ``SYNC_CONCURRENCY``) at a time. Files that were removed from Dropbox
+    are deleted locally. With a stored cursor only the changes since the
+    previous run are listed unless ``full`` is set. ``lock`` is held while
+    local files are deleted and the indexes are rewritten. Returns the
+    download counters.
     """
     local_root.mkdir(parents=True, exist_ok=True)
 
-    seen_files: set[str] = set()
+    images_root = local_root / remote_folder.strip("/").lower()
+    hashes = hash_index.ContentHashIndex.load(hash_index.index_path(images_root))
+    phashes = perceptual_hash.PerceptualIndex.load(perceptual_hash.index_path(images_root))
+    cache = hash_cache.HashCache.load(hash_cache.cache_path(images_root), content_hash.hash_file)
+    progress = _Progress()
+    futures: dict[Future, str] = {}
+    # Partial downloads live in the state folder, never next to the photos
+    tmp_dir = photo_manifest.state_dir(images_root) / DOWNLOAD_DIR
+    shutil.rmtree(tmp_dir, ignore_errors=True)  # left over from a crash
+    deleted: set[str] = set()
+
+    # The hash index holds the remote listing as of the previous run
+    cursor = None if full or not hashes.hashes else load_cursor(images_root, remote_folder)
+    result = _list_changes(dbx, cursor) if cursor else None
+    incremental = result is not None
+    seen_files: set[str] = set(hashes.hashes) if incremental else set()
 
-    result = dbx.files_list_folder(remote_folder, recursive=True)
-    _download_entries(dbx, result.entries, local_root, seen_files)
+    with ThreadPoolExecutor(max_workers=max(1, concurrency or SYNC_CONCURRENCY),
+                            thread_name_prefix="dropbox-sync") as pool:
 
-    while result.has_more:
-        result = dbx.files_list_folder_continue(result.cursor)
-        _download_entries(dbx, result.entries, local_root, seen_files)
+        def submit(entries: list[dropbox.files.Metadata]) -> None:
+            files = _record_entries(entries, seen_files, deleted, hashes)
+            progress.add(len(files))
+            for entry in files:
+                future = pool.submit(_sync_file, dbx, entry, local_root, cache, tmp_dir)
+                future.add_done_callback(
+                    lambda f: progress.finish(None if f.exception() else f.result())
+                )
+                futures[future] = entry.path_lower.lstrip("/")
 
-    # Remove local files not present in Dropbox
-    for path in local_root.rglob("*"):
-        if path.is_file():
-            rel = str(path.relative_to(local_root)).replace("\\", "/")
-            if rel not in seen_files:
-                path.unlink()
-                logging.info("Removed %s", path)
+        if result is None:
+            result = dropbox_client.call_with_backoff(
+                dbx, "files_list_folder", remote_folder, recursive=True
+            )
+        submit(result.entries)
+        while result.has_more:
+            result = dropbox_client.call_with_backoff(
+                dbx, "files_list_folder_continue", result.cursor
+            )
+            submit(result.entries)
 
-    # Clean up empty directories
-    for path in sorted(local_root.rglob("*"), reverse=True):
-        if path.is_dir() and not any(path.iterdir()):
-            path.rmdir()
+        for future in as_completed(futures):
+            rel_path = futures[future]
+            try:
+                size = future.result()
+            except Exception as exc:
+                logging.error("Failed to download %s: %r", rel_path, exc)
+                hashes.remove(rel_path)  # the local copy is stale or missing
+                phashes.remove(rel_path)
+                continue
+            if size:
+                phashes.remove(rel_path)  # rehashed after the listing
+    progress.log()
+
+    # The bot may be saving photos right now when the sync runs in-process
+    with lock if lock is not None else contextlib.nullcontext():
+        # Photos uploaded through the bot that have not reached Dropbox:
+        # still queued or failed for good
+        queued = upload_queue.UploadQueue(upload_queue.queue_dir(images_root)).held_paths()
+        keep = seen_files | queued
+        removed: list[str] = []
+        images_prefix = images_root.relative_to(local_root).as_posix() + "/"
+
+        if incremental:
+            # Only what Dropbox reported as deleted since the previous run
+            for rel_path in sorted(deleted):
+                _delete_local(local_root, rel_path, keep, removed)
+        else:
+            # Remove local files not present in Dropbox and empty folders
+            _prune(images_root, images_prefix, keep, removed)
+            cache.retain(keep, prefix=images_prefix)
+        for rel_path in removed:
+            cache.discard(rel_path)
+        cache.save()
+
+        # Refresh the photo manifest so the bot starts without a full rescan
+        if images_root.is_dir():
+            photo_manifest.update_manifest(images_root)
+
+        # Content hashes come straight from Dropbox metadata
+        hashes.retain(keep)
+        hashes.save()
+        progress.removed = len(removed)
+
+    # Perceptual hashes for new/changed photos (skipped without Pillow)
+    phashes.reconcile(local_root, keep)
+    phashes.save()
+
+    # Failed files are only picked up again by a full listing
+    save_cursor(images_root, remote_folder, None if progress.failed else result.cursor)
+    return progress
 
 
 def main() -> None:
-    if not all([APP_KEY, APP_SECRET, REFRESH_TOKEN]):
+    parser = argparse.ArgumentParser(description="Sync photos from Dropbox.")
+    parser.add_argument("--full", action="store_true",
+                        help="ignore the stored cursor and list the whole folder")
+    args = parser.parse_args()
+
+    dbx = dropbox_client.get_client()
+    if dbx is None:
         raise SystemExit(
             "Environment variables DROPBOX_APP_KEY, DROPBOX_APP_SECRET, "
             "and DROPBOX_REFRESH_TOKEN are required"
         )
-
-    dbx = dropbox.Dropbox(
-        app_key=APP_KEY,
-        app_secret=APP_SECRET,
-        oauth2_refresh_token=REFRESH_TOKEN,
-    )
-    sync_folder(dbx, REMOTE_FOLDER, DROPBOX_ROOT)
+    sync_folder(dbx, REMOTE_FOLDER, DROPBOX_ROOT, full=args.full)
+    if PHOTO_PACK:
+        images_root = DROPBOX_ROOT / REMOTE_FOLDER.strip("/").lower()
+        pack = photo_pack.PhotoPack.load(photo_pack.index_path(images_root))
+        written = pack.update(DROPBOX_ROOT, photo_manifest.library_paths(images_root))
+        logging.info("Photo pack: %d photo(s) added or replaced", written)
+    dropbox_client.log_stats()
 
 
 if __name__ == "__main__":
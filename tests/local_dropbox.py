@@ -0,0 +1,147 @@
+"""Filesystem-backed stand-in for ``dropbox.Dropbox`` used by tests and benchmarks.
+
+Serves the files under ``root`` as if ``root`` were the Dropbox account:
+``/kpop_images/a/b.jpg`` maps to ``root/kpop_images/a/b.jpg``. Only the
+calls ``sync_dropbox.py`` makes are implemented. ``latency`` adds a fixed
+delay to every request to mimic a network round trip.
+
+Downloads are streamed through ``iter_content``; ``truncate[path] = n``
+makes the next ``n`` downloads of ``path`` stop after half of the data.
+
+Cursors remember the tree they listed; continuing a cursor whose listing
+is exhausted returns the files added/changed and ``DeletedMetadata`` for
+those removed since. ``reset_cursors()`` invalidates every cursor.
+
+``webhook_notification`` builds the signed body and headers Dropbox POSTs
+to an app's webhook when files change.
+"""
+
+import datetime
+import hashlib
+import hmac
+import json
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import dropbox
+
+from content_hash import hash_file as _content_hash
+
+PAGE_SIZE = 500
+
+
+class LocalDropbox:
+    def __init__(self, root: Path, latency: float = 0.0, page_size: int = PAGE_SIZE) -> None:
+        self.root = Path(root)
+        self.latency = latency
+        self.page_size = page_size
+        self.downloads = 0
+        self.listed = 0
+        self.failures: dict[str, int] = {}
+        self.truncate: dict[str, int] = {}
+        self._pages: dict[str, tuple] = {}
+        self._next_key = 0
+        self._lock = threading.Lock()
+
+    def _wait(self) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _metadata(self, path: Path) -> dropbox.files.FileMetadata:
+        rel = "/" + path.relative_to(self.root).as_posix()
+        stamp = datetime.datetime(2020, 1, 1)
+        return dropbox.files.FileMetadata(
+            name=path.name,
+            id="id:" + rel,
+            client_modified=stamp,
+            server_modified=stamp,
+            rev="0123456789abcdef",
+            size=path.stat().st_size,
+            path_lower=rel.lower(),
+            path_display=rel,
+            content_hash=_content_hash(path),
+        )
+
+    def _snapshot(self, path: str) -> dict:
+        base = self.root / path.strip("/")
+        return {
+            p: self._metadata(p) for p in sorted(base.rglob("*")) if p.is_file()
+        }
+
+    def _new_page(self, path: str, entries: list, snapshot: dict) -> dropbox.files.ListFolderResult:
+        with self._lock:
+            key = str(self._next_key)
+            self._next_key += 1
+            self._pages[key] = (path, entries, snapshot)
+        return self._page(key, 0)
+
+    def _page(self, key: str, offset: int) -> dropbox.files.ListFolderResult:
+        _, entries, _ = self._pages[key]
+        end = offset + self.page_size
+        self.listed += len(entries[offset:end])
+        return dropbox.files.ListFolderResult(
+            entries=entries[offset:end],
+            cursor=f"{key}:{min(end, len(entries))}",
+            has_more=end < len(entries),
+        )
+
+    def webhook_notification(self, app_secret: str, account: str = "dbid:local"):
+        body = json.dumps(
+            {"list_folder": {"accounts": [account]}, "delta": {"users": [1]}}
+        ).encode()
+        signature = hmac.new(app_secret.encode(), body, hashlib.sha256).hexdigest()
+        return body, {"x-dropbox-signature": signature}
+
+    def reset_cursors(self) -> None:
+        self._pages.clear()
+
+    def files_list_folder(self, path: str, recursive: bool = False, **kwargs):
+        self._wait()
+        assert recursive, "only recursive listings are supported"
+        snapshot = self._snapshot(path)
+        return self._new_page(path, list(snapshot.values()), snapshot)
+
+    def files_list_folder_continue(self, cursor: str):
+        self._wait()
+        key, offset = cursor.rsplit(":", 1)
+        if key not in self._pages:
+            raise dropbox.exceptions.ApiError(
+                "local", dropbox.files.ListFolderContinueError.reset, None, None
+            )
+        path, entries, old = self._pages[key]
+        if int(offset) < len(entries):
+            return self._page(key, int(offset))
+        new = self._snapshot(path)
+        changes = [
+            dropbox.files.DeletedMetadata(name=p.name, path_lower=meta.path_lower)
+            for p, meta in old.items() if p not in new
+        ]
+        changes += [
+            meta for p, meta in new.items()
+            if p not in old or old[p].content_hash != meta.content_hash
+        ]
+        return self._new_page(path, changes, new)
+
+    def files_download(self, path: str):
+        self._wait()
+        with self._lock:
+            remaining = self.failures.get(path, 0)
+            if remaining:
+                self.failures[path] = remaining - 1
+                raise ConnectionError(f"simulated failure for {path}")
+            truncated = self.truncate.get(path, 0)
+            if truncated:
+                self.truncate[path] = truncated - 1
+            self.downloads += 1
+        local = self.root / path.strip("/")
+        data = local.read_bytes()
+        if truncated:
+            data = data[: len(data) // 2]
+
+        def iter_content(chunk_size: int):
+            for start in range(0, len(data), chunk_size):
+                yield data[start:start + chunk_size]
+
+        return self._metadata(local), SimpleNamespace(iter_content=iter_content, close=lambda: None)
@@ -32,4 +32,4 @@ def test_start_ai_game(monkeypatch):
     monkeypatch.setattr(app, "ai_correct_grnames", {k: k for k in DUMMY_DATA})
     assert app.start_ai_game(ctx)
     assert ctx.user_data["mode"] == "ai_game"
-    assert len(ctx.user_data["game"]["members"]) == 10
+    assert len(ctx.user_data["game"].members) == 10
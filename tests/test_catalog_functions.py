@@ -1,18 +1,27 @@
 import app
+import sessions
+
+
+def _no_reads(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("the catalog must not read photos up front")
+
+    monkeypatch.setattr(app, "read_dropbox_photo", fail)
 
 
 def test_build_catalog_for_group(monkeypatch):
     groups = {"g1": ["a", "b"], "g2": ["c"]}
     monkeypatch.setattr(app, "ALL_GROUPS", groups)
 
-    def fake_fetch(name):
+    def fake_paths(name, group=None):
         if name == "a":
-            return [b"img1", b"img2"]
+            return ["/a/1.jpg", "/a/2.jpg"]
         if name == "c":
-            return [b"img3"]
+            return ["/c/1.jpg"]
         return []
 
-    monkeypatch.setattr(app, "fetch_dropbox_images", fake_fetch)
+    monkeypatch.setattr(app, "member_photo_paths", fake_paths)
+    _no_reads(monkeypatch)
 
     # Ensure items are shuffled by reversing the list
     def fake_shuffle(lst):
@@ -22,8 +31,8 @@ def test_build_catalog_for_group(monkeypatch):
 
     items = app.build_catalog_for_group("g1", app.ALL_GROUPS)
     assert items == [
-        {"image": b"img2", "name": "a", "group": "g1"},
-        {"image": b"img1", "name": "a", "group": "g1"},
+        sessions.CatalogItem("/a/2.jpg", "a", "g1"),
+        sessions.CatalogItem("/a/1.jpg", "a", "g1"),
     ]
 
 
@@ -31,16 +40,17 @@ def test_build_catalog_random(monkeypatch):
     groups = {"g1": ["a"], "g2": ["c", "d"]}
     monkeypatch.setattr(app, "ALL_GROUPS", groups)
 
-    def fake_fetch(name):
+    def fake_paths(name, group=None):
         if name == "a":
-            return [b"img1", b"img2"]
+            return ["/a/1.jpg", "/a/2.jpg"]
         if name == "c":
-            return [b"img3"]
+            return ["/c/1.jpg"]
         return []
 
-    monkeypatch.setattr(app, "fetch_dropbox_images", fake_fetch)
+    monkeypatch.setattr(app, "member_photo_paths", fake_paths)
+    _no_reads(monkeypatch)
 
     items = app.build_catalog_random(app.ALL_GROUPS)
-    names = [(i["name"], i["group"]) for i in items]
+    names = [(i.name, i.group) for i in items]
     assert names.count(("a", "g1")) == 2
     assert names.count(("c", "g2")) == 1
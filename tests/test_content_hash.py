@@ -0,0 +1,50 @@
+import asyncio
+import hashlib
+
+import content_hash
+
+
+def _reference_hash(data: bytes, block: int) -> str:
+    digests = b"".join(
+        hashlib.sha256(data[i:i + block]).digest() for i in range(0, len(data), block)
+    )
+    return hashlib.sha256(digests).hexdigest()
+
+
+def test_bytes_file_and_incremental_hashes_agree(tmp_path, monkeypatch):
+    monkeypatch.setattr(content_hash, "BLOCK_SIZE", 8)
+    for size in (0, 5, 8, 16, 30):
+        data = bytes(range(size))
+        expected = _reference_hash(data, 8)
+        path = tmp_path / f"{size}.bin"
+        path.write_bytes(data)
+        assert content_hash.hash_bytes(data) == expected
+        assert content_hash.hash_bytes(memoryview(data)) == expected
+        assert content_hash.hash_file(path) == expected
+        for step in (1, 3, 8):
+            hasher = content_hash.ContentHasher()
+            for i in range(0, len(data), step):
+                hasher.update(data[i:i + step])
+            assert hasher.hexdigest() == expected
+
+
+def test_hash_files_in_parallel(tmp_path):
+    paths = []
+    for i in range(5):
+        path = tmp_path / f"{i}.jpg"
+        path.write_bytes(b"photo %d" % i)
+        paths.append(path)
+    missing = tmp_path / "missing.jpg"
+
+    hashes = content_hash.hash_files(paths + [missing], max_workers=3)
+
+    assert hashes[missing] is None
+    for path in paths:
+        assert hashes[path] == content_hash.hash_bytes(path.read_bytes())
+
+
+def test_async_wrappers(tmp_path):
+    path = tmp_path / "a.jpg"
+    path.write_bytes(b"data")
+    assert asyncio.run(content_hash.hash_file_async(path)) == content_hash.hash_bytes(b"data")
+    assert asyncio.run(content_hash.hash_bytes_async(b"data")) == content_hash.hash_bytes(b"data")
@@ -45,3 +45,24 @@ def test_cover_image_download_once(tmp_path, monkeypatch):
     path = app._ensure_cover_image(fake)
     assert fake.downloads == 1
     assert path.read_bytes() == remote_content
+
+
+def test_cover_image_does_not_wait_for_retries_when_offline(tmp_path, monkeypatch):
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    import app
+
+    monkeypatch.setattr(app, "COVER_IMAGE_PATH", tmp_path / "cover_image" / "cover1.png")
+
+    sleeps = []
+    monkeypatch.setattr(app.dropbox_client.time, "sleep", sleeps.append)
+    calls = []
+
+    class OfflineDropbox:
+        def files_get_metadata(self, path):
+            calls.append(path)
+            raise ConnectionError("network is unreachable")
+
+    path = app._ensure_cover_image(OfflineDropbox())
+    assert path == tmp_path / "cover_image" / "cover1.png"
+    assert len(calls) == 1
+    assert sleeps == []  # no backoff while the module is being imported
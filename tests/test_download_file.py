@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+
+import pytest
+
+import content_hash
+import dropbox_client
+
+
+class FakeDropbox:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.closed = 0
+
+    def files_download(self, path):
+        def iter_content(chunk_size):
+            for i in range(0, len(self.data), chunk_size):
+                yield self.data[i:i + chunk_size]
+
+        def close():
+            self.closed += 1
+
+        return None, SimpleNamespace(iter_content=iter_content, close=close)
+
+
+def test_download_file_streams_and_verifies(tmp_path, monkeypatch):
+    monkeypatch.setattr(dropbox_client, "DOWNLOAD_CHUNK_SIZE", 4)
+    data = b"0123456789" * 3
+    target = tmp_path / "member" / "photo.jpg"
+    fake = FakeDropbox(data)
+    size = dropbox_client.download_file(fake, "/photo.jpg", target, content_hash.hash_bytes(data))
+    assert size == len(data)
+    assert target.read_bytes() == data
+    assert fake.closed == 1
+
+    fake.data = b"corrupted"
+    with pytest.raises(dropbox_client.ContentHashMismatch):
+        dropbox_client.download_file(fake, "/photo.jpg", target, content_hash.hash_bytes(data))
+    assert target.read_bytes() == data
+    assert [p.name for p in target.parent.iterdir()] == ["photo.jpg"]
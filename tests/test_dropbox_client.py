@@ -0,0 +1,63 @@
+import pytest
+
+import dropbox_client
+
+
+class FlakyClient:
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def files_get_metadata(self, path):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return f"meta:{path}"
+
+
+def test_call_with_backoff_retries_transient_errors(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(dropbox_client.time, "sleep", sleeps.append)
+    client = FlakyClient([ConnectionError("reset"), TimeoutError("slow")])
+    assert dropbox_client.call_with_backoff(client, "files_get_metadata", "/x") == "meta:/x"
+    assert client.calls == 3
+    assert len(sleeps) == 2
+    assert all(0 < s <= dropbox_client.BACKOFF_MAX for s in sleeps)
+    entry = dropbox_client.stats()["files_get_metadata"]
+    assert entry["retries"] >= 2
+
+
+def test_call_with_backoff_gives_up_on_other_errors(monkeypatch):
+    monkeypatch.setattr(dropbox_client.time, "sleep", lambda s: None)
+    client = FlakyClient([ValueError("bad path")])
+    with pytest.raises(ValueError):
+        dropbox_client.call_with_backoff(client, "files_get_metadata", "/x")
+    assert client.calls == 1
+
+
+def test_rate_limit_uses_server_backoff(monkeypatch):
+    dropbox = pytest.importorskip("dropbox")
+    sleeps = []
+    monkeypatch.setattr(dropbox_client.time, "sleep", sleeps.append)
+    client = FlakyClient([dropbox.exceptions.RateLimitError("req", backoff=7)])
+    dropbox_client.call_with_backoff(client, "files_get_metadata", "/x")
+    assert sleeps == [7.0]
+
+
+def test_client_created_once(monkeypatch):
+    dropbox = pytest.importorskip("dropbox")
+    created = []
+
+    class FakeDropbox:
+        def __init__(self, **kwargs):
+            created.append(kwargs)
+
+    monkeypatch.setattr(dropbox, "Dropbox", FakeDropbox)
+    monkeypatch.setattr(dropbox_client, "_client", None)
+    for name in ("DROPBOX_APP_KEY", "DROPBOX_APP_SECRET", "DROPBOX_REFRESH_TOKEN"):
+        monkeypatch.setenv(name, "x")
+    first = dropbox_client.get_client()
+    assert dropbox_client.get_client() is first
+    assert len(created) == 1
+    assert created[0]["max_retries_on_rate_limit"] == 0
+    monkeypatch.setattr(dropbox_client, "_client", None)
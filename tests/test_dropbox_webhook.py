@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+import app
+
+pytest.importorskip("dropbox")
+from local_dropbox import LocalDropbox  # noqa: E402
+
+
+class FakeRequest:
+    def __init__(self, body: bytes, headers: dict):
+        self._body = body
+        self.headers = headers
+
+    async def body(self) -> bytes:
+        return self._body
+
+
+def test_signature_verification(tmp_path, monkeypatch):
+    body, headers = LocalDropbox(tmp_path).webhook_notification("app-secret")
+    signature = headers["x-dropbox-signature"]
+
+    monkeypatch.setattr(app, "DROPBOX_APP_SECRET", "")
+    assert not app.verify_dropbox_signature(body, signature)
+    monkeypatch.setattr(app, "DROPBOX_APP_SECRET", "app-secret")
+    assert app.verify_dropbox_signature(body, signature)
+    assert not app.verify_dropbox_signature(body + b" ", signature)
+    assert not app.verify_dropbox_signature(body, None)
+
+
+def test_signed_notifications_trigger_one_debounced_sync(tmp_path, monkeypatch):
+    fake = LocalDropbox(tmp_path)
+    calls = []
+    monkeypatch.setattr(app, "DROPBOX_APP_SECRET", "app-secret")
+    monkeypatch.setattr(app, "DROPBOX_WEBHOOK_DEBOUNCE", 0.05)
+    monkeypatch.setattr(app, "request_library_sync", lambda full=False: calls.append(full) or True)
+
+    async def scenario():
+        forged = fake.webhook_notification("wrong-secret")
+        await app.dropbox_webhook(FakeRequest(*forged))
+        await asyncio.sleep(0.1)
+        assert calls == []
+
+        for _ in range(3):
+            await app.dropbox_webhook(FakeRequest(*fake.webhook_notification("app-secret")))
+            await asyncio.sleep(0.01)
+        assert calls == []
+        await asyncio.sleep(0.1)
+
+    asyncio.run(scenario())
+    assert calls == [False]
@@ -16,14 +16,13 @@ import app
 def test_duplicate_member_accepts_any_group():
     groups = {"a": ["Sam"], "b": ["Sam"]}
     ctx = SimpleNamespace(user_data={})
-    app._init_game(ctx, groups)
+    app._init_game(ctx, app.group_catalog.Catalog.compile(groups))
     ctx.user_data["mode"] = "game"
     g = ctx.user_data["game"]
-    g["members"] = ["Sam"]
-    g["total"] = 1
-    g["index"] = 0
-    g["current_member"] = "Sam"
-    ctx.user_data["game"] = g
+    g.members = ["Sam"]
+    g.total = 1
+    g.index = 0
+    g.current_member = "Sam"
 
     captured = {}
 
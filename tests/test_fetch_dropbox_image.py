@@ -0,0 +1,65 @@
+import app
+
+
+def _setup(tmp_path, monkeypatch, count=30):
+    monkeypatch.setattr(app, "DROPBOX_ROOT", str(tmp_path))
+    monkeypatch.setattr(app, "PHOTO_CACHE", app.PhotoByteCache(0))
+    paths = []
+    for i in range(count):
+        (tmp_path / f"{i}.jpg").write_bytes(bytes([i]))
+        paths.append(f"/{i}.jpg")
+    monkeypatch.setattr(app, "PHOTO_INDEX", app.photo_index.PhotoIndex.build([("g", "idol", paths)]))
+    reads = []
+    real_read = app.read_dropbox_photo
+
+    def counting_read(path):
+        reads.append(path)
+        return real_read(path)
+
+    monkeypatch.setattr(app, "read_dropbox_photo", counting_read)
+    return reads
+
+
+def test_fetch_dropbox_image_reads_one_file(tmp_path, monkeypatch):
+    reads = _setup(tmp_path, monkeypatch)
+    img = app.fetch_dropbox_image("idol")
+    assert img is not None
+    assert len(reads) == 1
+    assert app.fetch_dropbox_image("nobody") is None
+
+
+def test_fetch_dropbox_image_samples_only_what_it_needs(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    lookups, sizes = [], []
+    real_paths, real_sample = app.member_photo_paths, app.random.sample
+
+    def counting_paths(name, group=None):
+        lookups.append(name)
+        return real_paths(name, group)
+
+    def counting_sample(population, k):
+        sizes.append(k)
+        return real_sample(population, k)
+
+    monkeypatch.setattr(app, "member_photo_paths", counting_paths)
+    monkeypatch.setattr(app.random, "sample", counting_sample)
+    assert app.fetch_dropbox_image("idol") is not None
+    assert lookups == ["idol"]
+    assert sizes == [1]  # the member's 30 paths are not shuffled
+
+
+def test_fetch_dropbox_sample_distinct(tmp_path, monkeypatch):
+    reads = _setup(tmp_path, monkeypatch)
+    imgs = app.fetch_dropbox_sample("idol", 5)
+    assert len(imgs) == 5
+    assert len(set(imgs)) == 5
+    assert len(reads) == 5
+    assert len(app.pick_dropbox_photos("idol", 100)) == 30
+
+
+def test_fetch_dropbox_sample_skips_missing(tmp_path, monkeypatch):
+    reads = _setup(tmp_path, monkeypatch, count=3)
+    (tmp_path / "0.jpg").unlink()
+    (tmp_path / "1.jpg").unlink()
+    assert app.fetch_dropbox_sample("idol", 2) == [bytes([2])]
+    assert len(reads) == 3
@@ -0,0 +1,154 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import app
+
+
+class DummyMsg:
+    def __init__(self):
+        self.sent = []
+        self.counter = 0
+
+    def _reply(self, media):
+        self.counter += 1
+        return SimpleNamespace(photo=[SimpleNamespace(file_id=f"small{self.counter}"),
+                                     SimpleNamespace(file_id=f"id{self.counter}")])
+
+    async def reply_photo(self, photo, **kwargs):
+        self.sent.append(photo if isinstance(photo, str) else photo.getvalue())
+        return self._reply(photo)
+
+    async def reply_media_group(self, media):
+        self.sent.append([m.media if isinstance(m.media, str) else m.media.getvalue() for m in media])
+        return [self._reply(m) for m in media]
+
+
+def _setup(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "DROPBOX_ROOT", str(tmp_path))
+    monkeypatch.setattr(app, "FILE_ID_CACHE", app.TelegramFileIdCache())
+    monkeypatch.setattr(app, "PHOTO_CACHE", app.PhotoByteCache(1024))
+    photo = tmp_path / "kpop_images" / "g" / "a" / "a__01.jpg"
+    photo.parent.mkdir(parents=True)
+    photo.write_bytes(b"first")
+    return photo
+
+
+def test_reply_photo_reuses_file_id(tmp_path, monkeypatch):
+    photo = _setup(tmp_path, monkeypatch)
+    rel = "/kpop_images/g/a/a__01.jpg"
+    msg = DummyMsg()
+    assert asyncio.run(app.reply_photo_cached(msg, rel, caption="x"))
+    assert msg.sent == [b"first"]
+
+    # a fresh process loads the persisted cache and does not read the file
+    app.FILE_ID_CACHE.flush()  # normally done by the deferred flush or on shutdown
+    real_read = app.read_dropbox_photo
+
+    def fail_read(path):
+        raise AssertionError("unchanged file must not be read")
+
+    monkeypatch.setattr(app, "FILE_ID_CACHE", app.TelegramFileIdCache())
+    monkeypatch.setattr(app, "read_dropbox_photo", fail_read)
+    assert asyncio.run(app.reply_photo_cached(msg, rel, caption="x"))
+    assert msg.sent[-1] == "id1"
+
+    # changing the file invalidates the cached id
+    monkeypatch.setattr(app, "read_dropbox_photo", real_read)
+    photo.write_bytes(b"second!")
+    st = os.stat(photo)
+    os.utime(photo, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert asyncio.run(app.reply_photo_cached(msg, rel, caption="x"))
+    assert msg.sent[-1] == b"second!"
+
+
+def test_media_group_caches_each_photo(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    msg = DummyMsg()
+    photos = [(b"one", "A"), (b"two", "B")]
+    asyncio.run(app.reply_media_group_cached(msg, photos))
+    asyncio.run(app.reply_media_group_cached(msg, photos))
+    assert msg.sent == [[b"one", b"two"], ["id1", "id2"]]
+
+
+def test_stale_file_id_falls_back_to_upload(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    app.FILE_ID_CACHE.remember(app._dropbox_content_hash_bytes(b"cover"), "expired")
+
+    class RejectingMsg(DummyMsg):
+        async def reply_photo(self, photo, **kwargs):
+            if photo == "expired":
+                raise app.BadRequest("wrong file identifier")
+            return await super().reply_photo(photo, **kwargs)
+
+    msg = RejectingMsg()
+    assert asyncio.run(app.reply_photo_cached(msg, b"cover"))
+    assert msg.sent == [b"cover"]
+    assert app.FILE_ID_CACHE.get(app._dropbox_content_hash_bytes(b"cover")) == "id1"
+
+
+def test_network_error_keeps_cached_file_id(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    digest = app._dropbox_content_hash_bytes(b"cover")
+    app.FILE_ID_CACHE.remember(digest, "valid")
+
+    class FlakyMsg(DummyMsg):
+        async def reply_photo(self, photo, **kwargs):
+            raise TimeoutError("timed out")
+
+        async def reply_media_group(self, media):
+            raise TimeoutError("timed out")
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(app.reply_photo_cached(FlakyMsg(), b"cover"))
+    with pytest.raises(TimeoutError):
+        asyncio.run(app.reply_media_group_cached(FlakyMsg(), [(b"cover", "A"), (b"other", "B")]))
+    assert app.FILE_ID_CACHE.get(digest) == "valid"
+
+
+def test_media_group_skips_missing_files(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    msg = DummyMsg()
+    photos = [("/kpop_images/g/a/a__01.jpg", "A"), ("/kpop_images/g/a/gone.jpg", "B")]
+    monkeypatch.setattr(app.FILE_ID_CACHE, "hash_for_path", lambda source: ("h-" + source, None))
+    asyncio.run(app.reply_media_group_cached(msg, photos))
+    assert msg.sent == [[b"first"]]
+    assert app.FILE_ID_CACHE.get("h-/kpop_images/g/a/a__01.jpg") == "id1"
+    assert app.FILE_ID_CACHE.get("h-/kpop_images/g/a/gone.jpg") is None
+
+
+def test_sends_are_flushed_once_after_a_delay(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    writes = []
+    real_write = app.photo_manifest.write_json_atomic
+
+    def counting_write(path, data):
+        writes.append(path)
+        real_write(path, data)
+
+    monkeypatch.setattr(app.photo_manifest, "write_json_atomic", counting_write)
+    monkeypatch.setattr(app, "FILE_ID_FLUSH_DELAY", 0.05)
+    msg = DummyMsg()
+
+    async def scenario():
+        for data in (b"one", b"two", b"three"):
+            await app.reply_photo_cached(msg, data)
+        assert writes == []  # nothing written on the event loop per send
+        await asyncio.sleep(0.2)
+
+    asyncio.run(scenario())
+    assert len(writes) == 1
+    fresh = app.TelegramFileIdCache()
+    assert fresh.get(app._dropbox_content_hash_bytes(b"three")) == "id3"
+
+
+def test_prune_drops_paths_of_deleted_files(tmp_path, monkeypatch):
+    photo = _setup(tmp_path, monkeypatch)
+    rel = "/kpop_images/g/a/a__01.jpg"
+    assert app.FILE_ID_CACHE.hash_for_path(rel)[0] is not None
+    assert app.FILE_ID_CACHE.prune() == 0
+    photo.unlink()
+    assert app.FILE_ID_CACHE.prune() == 1
+    assert rel not in app.FILE_ID_CACHE.paths
@@ -0,0 +1,125 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import app
+
+
+def test_allocator_is_safe_under_concurrent_uploads(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "DROPBOX_ROOT", tmp_path)
+    monkeypatch.setattr(app, "FILENAME_ALLOCATOR", app.MemberFilenameAllocator())
+
+    def no_remote():
+        raise AssertionError("allocation must not contact Dropbox")
+
+    monkeypatch.setattr(app.dropbox_client, "get_client", no_remote)
+    names = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(10):
+            name = app._next_member_filename("g", "idol", ".jpg")
+            with lock:
+                names.append(name)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(set(names)) == 80
+    assert "idol__80.jpg" in names
+
+
+def test_upload_conflict_renames_local_file(tmp_path, monkeypatch):
+    dropbox = pytest.importorskip("dropbox")
+    files = dropbox.files
+    monkeypatch.setattr(app, "DROPBOX_ROOT", tmp_path)
+    monkeypatch.setattr(app, "PHOTO_INDEX", app.photo_index.PhotoIndex())
+    monkeypatch.setattr(app, "FILENAME_ALLOCATOR", app.MemberFilenameAllocator())
+    assert app.save_user_photo("g", "idol", b"mine", ".jpg")
+
+    conflict = dropbox.exceptions.ApiError(
+        "req",
+        files.UploadError.path(
+            files.UploadWriteFailed(reason=files.WriteError.conflict(files.WriteConflictError.file))
+        ),
+        None,
+        None,
+    )
+
+    class FakeDropbox:
+        def __init__(self):
+            self.remote = {"/kpop_images/g/idol/idol__01.jpg": b"theirs",
+                           "/kpop_images/g/idol/idol__02.jpg": b"theirs too"}
+
+        def files_upload(self, data, path, mode=None, autorename=False):
+            if path in self.remote:
+                raise conflict
+            self.remote[path] = data
+
+        def files_get_metadata(self, path):
+            return SimpleNamespace(content_hash=app._dropbox_content_hash_bytes(self.remote[path]))
+
+        def files_list_folder(self, path):
+            entries = [files.FileMetadata(name=p.rsplit("/", 1)[1]) for p in self.remote]
+            return SimpleNamespace(entries=entries, has_more=False, cursor=None)
+
+    fake = FakeDropbox()
+    monkeypatch.setattr(app.dropbox_client, "get_client", lambda: fake)
+    final = app.upload_photo_to_dropbox("kpop_images/g/idol/idol__01.jpg")
+    assert final == "kpop_images/g/idol/idol__03.jpg"
+    assert fake.remote["/kpop_images/g/idol/idol__03.jpg"] == b"mine"
+    assert (tmp_path / final).read_bytes() == b"mine"
+    assert not (tmp_path / "kpop_images/g/idol/idol__01.jpg").exists()
+    assert app.member_photo_paths("idol", "g") == ("/kpop_images/g/idol/idol__03.jpg",)
+    assert app.photo_hash_index().lookup(app._dropbox_content_hash_bytes(b"mine")) == [final]
+    assert app.photo_upload_queue().pending_paths() == {final}
+
+
+def test_failure_after_conflict_keeps_job_on_renamed_file(tmp_path, monkeypatch):
+    import asyncio
+
+    dropbox = pytest.importorskip("dropbox")
+    files = dropbox.files
+    monkeypatch.setattr(app, "DROPBOX_ROOT", tmp_path)
+    monkeypatch.setattr(app, "PHOTO_INDEX", app.photo_index.PhotoIndex())
+    monkeypatch.setattr(app, "FILENAME_ALLOCATOR", app.MemberFilenameAllocator())
+    monkeypatch.setattr(app.dropbox_client, "MAX_RETRIES", 0)
+    assert app.save_user_photo("g", "idol", b"mine", ".jpg")
+
+    conflict = dropbox.exceptions.ApiError(
+        "req",
+        files.UploadError.path(
+            files.UploadWriteFailed(reason=files.WriteError.conflict(files.WriteConflictError.file))
+        ),
+        None,
+        None,
+    )
+
+    class FlakyDropbox:
+        remote = {"/kpop_images/g/idol/idol__01.jpg": b"theirs"}
+
+        def files_upload(self, data, path, mode=None, autorename=False):
+            if path in self.remote:
+                raise conflict
+            raise ConnectionResetError("connection reset")
+
+        def files_get_metadata(self, path):
+            return SimpleNamespace(content_hash=app._dropbox_content_hash_bytes(self.remote[path]))
+
+        def files_list_folder(self, path):
+            entries = [files.FileMetadata(name=p.rsplit("/", 1)[1]) for p in self.remote]
+            return SimpleNamespace(entries=entries, has_more=False, cursor=None)
+
+    monkeypatch.setattr(app.dropbox_client, "get_client", lambda: FlakyDropbox())
+    assert asyncio.run(app.process_upload_queue()) == 0
+
+    renamed = "kpop_images/g/idol/idol__02.jpg"
+    assert (tmp_path / renamed).read_bytes() == b"mine"
+    queue = app.photo_upload_queue()
+    [job] = queue.pending()
+    assert job["path"] == renamed
+    assert job["attempts"] == 1
+    assert queue.held_paths() == {renamed}
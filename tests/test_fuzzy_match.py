@@ -0,0 +1,97 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "dummy")
+os.environ.setdefault("PUBLIC_URL", "https://example.com")
+
+import app
+import fuzzy_match
+from group_catalog import Catalog
+from fuzzy_match import FuzzyIndex
+
+
+GROUPS = {
+    "blackpink": ["Jisoo", "Jennie", "Rose", "Lisa"],
+    "twice": ["Nayeon", "Jeongyeon", "Momo", "Sana", "Jihyo", "Mina", "Dahyun", "Chaeyoung", "Tzuyu"],
+    "le sserafim": ["Chaewon", "Sakura", "Yunjin", "Kazuha", "Eunchae"],
+}
+
+
+def test_edit_distance_counts_swaps_and_stops_early():
+    assert fuzzy_match.edit_distance("twcie", "twice", 2) == 1
+    assert fuzzy_match.edit_distance("blakpink", "blackpink", 2) == 1
+    assert fuzzy_match.edit_distance("abcdef", "uvwxyz", 2) == 3
+
+
+def test_index_lookup_tolerates_typos():
+    index = FuzzyIndex((key, key) for key in GROUPS)
+    assert index.lookup("Blakpink", 2) == ["blackpink"]
+    assert index.lookup("Le Serafim", 2) == ["le sserafim"]
+    # three edits: accepted with the group game's default tolerance
+    assert index.lookup("Le Seraphim", 3) == ["le sserafim"]
+    assert index.lookup("Le Seraphim", 2) == []
+    assert index.lookup("TWCIE", 2) == ["twice"]
+    assert index.lookup("Blakpink", 0) == []
+    assert index.lookup("aespa", 2) == []
+
+
+def test_short_names_need_exact_answers():
+    index = FuzzyIndex([("IVE", "ive"), ("BTS", "bts")])
+    assert index.lookup("ive", 2) == ["ive"]
+    assert index.lookup("ivy", 2) == []
+    assert index.lookup("ivye", 2) == []  # the query is long enough, the name is not
+
+
+def test_equally_close_names_are_ambiguous():
+    index = FuzzyIndex([("Mina", "mina"), ("Mira", "mira")])
+    assert index.lookup("Mia", 1) == []  # under four letters -> no edits allowed
+    assert sorted(index.lookup("Mixa", 1)) == ["mina", "mira"]
+    assert index.match("Mixa", 1) is None
+    assert index.match("Minaa", 1) == "mina"
+
+
+def test_accepts_rejects_another_members_name():
+    members = FuzzyIndex((m, m) for m in GROUPS["twice"] + GROUPS["blackpink"])
+    assert fuzzy_match.accepts("Dahyn", "Dahyun", 2, members)
+    assert fuzzy_match.accepts("jeongyoen", "Jeongyeon", 2, members)
+    assert not fuzzy_match.accepts("Sana", "Mina", 2, members)
+    assert not fuzzy_match.accepts("Jennie", "Jisoo", 2, members)
+    # without the other names only the distance is checked
+    assert fuzzy_match.accepts("Dahyn", "Dahyun", 2)
+    assert not fuzzy_match.accepts("Dahyn", "Dahyun", 0)
+
+
+def test_catalog_accepts_group_typos_only_for_members_group():
+    catalog = Catalog.compile(GROUPS, {"le sserafim": "LE SSERAFIM"})
+    assert catalog.is_answer("Sakura", "leserafim", 2)
+    assert catalog.is_answer("Kazuha", "le seraphim", 3)
+    assert catalog.is_answer("Mina", "twcie", 2)
+    assert not catalog.is_answer("Mina", "blakpink", 2)
+    assert not catalog.is_answer("Mina", "twcie", 0)
+    assert catalog.member_index.lookup("Chaewn", 2) == ["Chaewon"]
+
+
+def test_game_accepts_requested_typo():
+    assert app.ANSWER_TOLERANCE["game"] == 3
+    assert app.ALL_CATALOG.is_answer("Kazuha", "le seraphim", app.ANSWER_TOLERANCE["game"])
+
+
+def test_photo_game_accepts_typo(monkeypatch):
+    monkeypatch.setattr(app, "ALL_CATALOG", Catalog.compile(GROUPS))
+    messages = []
+
+    async def fake_reply_text(text, **kwargs):
+        messages.append(text)
+
+    item = app.sessions.PhotoItem("Chaeyoung", "/twice/chaeyoung/1.jpg")
+    game = app.sessions.PhotoGameSession(items=[item], total=1, current=item, index=1)
+    ctx = SimpleNamespace(user_data={"mode": "photo_game", "game": game})
+    update = SimpleNamespace(message=SimpleNamespace(text="Cheyoung", reply_text=fake_reply_text))
+    asyncio.run(app.on_text(update, ctx))
+    assert game.score == 1
+    assert messages[0].startswith("Верно!")
@@ -0,0 +1,47 @@
+import os
+
+import hash_cache
+
+
+def test_hash_computed_once_until_file_changes(tmp_path):
+    calls = []
+
+    def fake_hash(path):
+        calls.append(path)
+        return path.read_bytes().decode()
+
+    photo = tmp_path / "a.jpg"
+    photo.write_bytes(b"one")
+    cache_file = hash_cache.cache_path(tmp_path / "kpop_images")
+    cache = hash_cache.HashCache.load(cache_file, fake_hash)
+
+    assert cache.hash_of(photo, "a.jpg") == "one"
+    assert cache.hash_of(photo, "a.jpg") == "one"
+    assert len(calls) == 1
+
+    cache.save()
+    reloaded = hash_cache.HashCache.load(cache_file, fake_hash)
+    assert reloaded.hash_of(photo, "a.jpg") == "one"
+    assert len(calls) == 1
+
+    photo.write_bytes(b"two!")
+    assert reloaded.hash_of(photo, "a.jpg") == "two!"
+    assert len(calls) == 2
+
+
+def test_put_retain_and_discard(tmp_path):
+    cache = hash_cache.HashCache(None, lambda path: "computed")
+    for name in ("a", "b"):
+        (tmp_path / name).write_bytes(b"x")
+        cache.put(tmp_path / name, f"kpop_images/{name}", "known")
+    (tmp_path / "c").write_bytes(b"x")
+    cache.put(tmp_path / "c", "cover_image/c", "known")
+
+    assert cache.hash_of(tmp_path / "a", "kpop_images/a") == "known"
+    cache.retain({"kpop_images/a"}, prefix="kpop_images/")
+    assert set(cache.entries) == {"kpop_images/a", "cover_image/c"}
+    cache.discard("kpop_images/a")
+    assert set(cache.entries) == {"cover_image/c"}
+
+    os.utime(tmp_path / "c", ns=(1, 1))
+    assert cache.hash_of(tmp_path / "c", "cover_image/c") == "computed"
@@ -0,0 +1,42 @@
+import pytest
+
+import app
+import hash_index
+
+
+def test_index_lookup_and_persistence(tmp_path):
+    path = tmp_path / "hashes.json"
+    index = hash_index.ContentHashIndex(path)
+    index.add("kpop_images/g/a/a__01.jpg", "h1")
+    index.add("kpop_images/g/b/b__01.jpg", "h1")
+    index.add("kpop_images/g/b/b__02.jpg", "h2")
+    index.save()
+
+    loaded = hash_index.ContentHashIndex.load(path)
+    assert sorted(loaded.lookup("h1")) == ["kpop_images/g/a/a__01.jpg", "kpop_images/g/b/b__01.jpg"]
+    loaded.retain(["kpop_images/g/b/b__02.jpg"])
+    assert loaded.lookup("h1") == []
+    assert loaded.hash_of("kpop_images/g/b/b__02.jpg") == "h2"
+
+
+def test_duplicate_under_other_member_detected(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "DROPBOX_ROOT", tmp_path)
+    monkeypatch.setattr(app, "PHOTO_INDEX", app.photo_index.PhotoIndex())
+    monkeypatch.setattr(app, "_HASH_INDEX", None)
+    existing = tmp_path / "kpop_images" / "twice" / "momo" / "momo__01.jpg"
+    existing.parent.mkdir(parents=True)
+    existing.write_bytes(b"same-photo")
+
+    with pytest.raises(app.DuplicatePhotoError) as exc:
+        app.save_user_photo("itzy", "Yeji", b"same-photo", ".jpg")
+    assert exc.value.owner == ("twice", "momo")
+
+    # existing files are hashed once; later checks are index lookups
+    def fail_hash(path):
+        raise AssertionError("library must not be rehashed")
+
+    monkeypatch.setattr(app, "_dropbox_content_hash", fail_hash)
+    assert app.save_user_photo("itzy", "Yeji", b"new-photo", ".jpg")
+    with pytest.raises(app.DuplicatePhotoError) as exc:
+        app.save_user_photo("twice", "momo", b"new-photo", ".jpg")
+    assert exc.value.path == "kpop_images/itzy/yeji/yeji__01.jpg"
@@ -34,8 +34,8 @@ def test_start_quiz_picks_ten(monkeypatch):
     ctx = DummyContext()
     assert app.start_quiz(ctx)
     qdata = ctx.user_data["quiz"]
-    assert len(qdata["questions"]) == 10
-    texts = [q["question"] for q in qdata["questions"]]
+    assert len(qdata.questions) == 10
+    texts = [q["question"] for q in qdata.questions]
     assert len(set(texts)) == len(texts)
 
 
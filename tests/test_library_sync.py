@@ -0,0 +1,65 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import app
+import dropbox_client
+
+
+def test_sync_library_swaps_in_new_photos(tmp_path, monkeypatch):
+    pytest.importorskip("dropbox")
+    from local_dropbox import LocalDropbox
+
+    member = tmp_path / "remote" / "kpop_images" / "twice" / "momo"
+    member.mkdir(parents=True)
+    (member / "momo__01.jpg").write_bytes(b"first")
+    fake = LocalDropbox(tmp_path / "remote")
+    monkeypatch.setattr(dropbox_client, "get_client", lambda: fake)
+    monkeypatch.setattr(app, "DROPBOX_ROOT", str(tmp_path / "local"))
+    for name in ("PHOTO_INDEX", "_HASH_INDEX", "_PHASH_INDEX", "_HASH_CACHE"):
+        monkeypatch.setattr(app, name, getattr(app, name))
+    monkeypatch.setattr(app, "PHOTO_CACHE", app.PhotoByteCache(1024))
+
+    assert app.sync_library() == {"files": 1, "downloaded": 1, "removed": 0, "failed": 0}
+    assert app.member_photo_paths("Momo", "twice") == ("/kpop_images/twice/momo/momo__01.jpg",)
+
+    (member / "momo__02.jpg").write_bytes(b"second")
+    (member / "momo__01.jpg").unlink()
+    result = app.sync_library()
+    assert (result["downloaded"], result["removed"]) == (1, 1)
+    assert app.member_photo_paths("Momo", "twice") == ("/kpop_images/twice/momo/momo__02.jpg",)
+
+
+def test_sync_requests_are_coalesced(monkeypatch):
+    calls = []
+    monkeypatch.setattr(app, "sync_library", lambda full=False: calls.append(full) or {})
+
+    async def scenario():
+        assert not app.request_library_sync()
+        worker = asyncio.create_task(app.run_sync_worker(interval=0))
+        await asyncio.sleep(0)
+        assert app.request_library_sync()
+        assert app.request_library_sync(full=True)
+        while not calls:
+            await asyncio.sleep(0.01)
+        worker.cancel()
+
+    monkeypatch.setattr(app, "_SYNC_WAKEUP", None)
+    monkeypatch.setattr(app, "SYNC_STATUS", dict(app.SYNC_STATUS))
+    asyncio.run(scenario())
+    assert calls == [True]
+    assert app.SYNC_STATUS["last_result"] == {}
+
+
+def test_admin_token_check(monkeypatch):
+    def request(**headers):
+        return SimpleNamespace(headers=headers)
+
+    monkeypatch.setattr(app, "ADMIN_TOKEN", "")
+    assert not app._admin_authorized(request(**{"x-admin-token": ""}))
+    monkeypatch.setattr(app, "ADMIN_TOKEN", "secret")
+    assert app._admin_authorized(request(**{"x-admin-token": "secret"}))
+    assert app._admin_authorized(request(authorization="Bearer secret"))
+    assert not app._admin_authorized(request(authorization="Basic secret"))
+    assert not app._admin_authorized(request(**{"x-admin-token": "wrong"}))
@@ -0,0 +1,72 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "dummy")
+os.environ.setdefault("PUBLIC_URL", "https://example.com")
+
+import app
+from group_catalog import Catalog
+from member_search import Hit, MemberSearch
+from photo_index import PhotoIndex
+
+
+GROUPS = {
+    "blackpink": ["Jisoo", "Jennie", "Rose", "Lisa"],
+    "twice": ["Jihyo", "Mina", "Sana"],
+    "gfriend": ["Sowon", "Yerin", "Eunha", "Yuju", "SinB", "Umji"],
+    "viviz": ["Eunha", "SinB", "Umji"],
+    "newjeans": ["Kim Minji", "Hanni"],
+}
+
+
+def test_namesakes_in_every_group_are_returned():
+    result = MemberSearch(GROUPS).search("eunha")
+    assert result.kind == "exact"
+    assert result.hits == (Hit("gfriend", "Eunha"), Hit("viviz", "Eunha"))
+
+
+def test_words_of_a_long_name_are_keys():
+    assert MemberSearch(GROUPS).search("Minji").hits == (Hit("newjeans", "Kim Minji"),)
+
+
+def test_prefix_completes_partial_names_alphabetically():
+    search = MemberSearch(GROUPS)
+    result = search.search("ji")
+    assert result.kind == "prefix"
+    assert [hit.member for hit in result.hits] == ["Jihyo", "Jisoo"]
+    assert search.complete("j", limit=2) == ["jennie", "jihyo"]
+    # a single letter is not enough for a prefix search
+    assert search.search("j").kind == "none"
+
+
+def test_misspelt_name_is_suggested():
+    search = MemberSearch(GROUPS)
+    result = search.search("Jenine", max_edits=2)
+    assert result.kind == "fuzzy"
+    assert result.hits == (Hit("blackpink", "Jennie"),)
+    assert search.search("Jenine").kind == "none"
+    assert search.search("  ").kind == "none"
+
+
+def test_find_mode_lists_all_groups_with_photos(monkeypatch):
+    monkeypatch.setattr(app, "ALL_CATALOG", Catalog.compile(GROUPS, {"gfriend": "GFRIEND"}))
+    monkeypatch.setattr(
+        app, "PHOTO_INDEX", PhotoIndex.build([("viviz", "Eunha", ["/viviz/eunha/1.jpg"])])
+    )
+    messages = []
+
+    async def fake_reply_text(text, **kwargs):
+        messages.append(text)
+
+    update = SimpleNamespace(message=SimpleNamespace(text="Eunha", reply_text=fake_reply_text))
+    ctx = SimpleNamespace(user_data={"mode": "find"})
+    asyncio.run(app.on_text(update, ctx))
+    assert messages == [
+        "Eunha — участник группы *GFRIEND* (фото пока нет)\n"
+        "Eunha — участник группы *viviz* (есть фото)"
+    ]
@@ -0,0 +1,124 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "dummy")
+os.environ.setdefault("PUBLIC_URL", "https://example.com")
+
+import app
+import fuzzy_match
+from group_catalog import Catalog
+from member_search import Hit
+from name_aliases import Aliases, load_aliases
+from photo_index import PhotoIndex
+
+
+GROUPS = {
+    "blackpink": ["Jisoo", "Jennie", "Rose", "Lisa"],
+    "bts": ["Jin", "Suga", "JHope", "RM"],
+    "i-dle": ["Minnie", "Soyeon"],
+    "twice": ["Mina", "Chaeyoung"],
+}
+
+ALIASES = {
+    "groups": {"bts": ["방탄소년단"], "i-dle": ["(G)I-DLE"]},
+    "members": {
+        "blackpink": {"Rose": ["로제", "Park Chaeyoung"]},
+        "bts": {"RM": ["Kim Namjoon"]},
+    },
+}
+
+
+def _aliases(tmp_path) -> Aliases:
+    path = tmp_path / "aliases.json"
+    path.write_text(json.dumps(ALIASES, ensure_ascii=False), encoding="utf-8")
+    return load_aliases(str(path))
+
+
+def test_fold_ignores_accents_and_punctuation():
+    assert fuzzy_match.fold("Rosé") == "rose"
+    assert fuzzy_match.fold("J-Hope") == fuzzy_match.fold("JHope")
+    assert fuzzy_match.fold("S.Coups") == "scoups"
+    assert fuzzy_match.fold("로제") == "로제"  # Hangul syllables stay composed
+
+
+def test_load_aliases_compiles_lookups(tmp_path):
+    aliases = _aliases(tmp_path)
+    assert aliases.group("(g)i-dle") == "i-dle"
+    assert aliases.member("blackpink", "로제") == "Rose"
+    assert aliases.member("blackpink", "park chae-young") == "Rose"
+    assert aliases.member("twice", "로제") is None
+
+
+def test_missing_or_broken_file_means_no_aliases(tmp_path):
+    assert load_aliases(str(tmp_path / "nope.json")).group_names == {}
+    broken = tmp_path / "broken.json"
+    broken.write_text("{", encoding="utf-8")
+    assert load_aliases(str(broken)).member_names == {}
+
+
+def test_answer_checks_accept_aliases(tmp_path):
+    catalog = Catalog.compile(GROUPS, aliases=_aliases(tmp_path))
+    assert catalog.is_answer("Suga", "방탄소년단")
+    assert catalog.is_answer("Minnie", "(g)i-dle")
+    assert not catalog.is_answer("Jisoo", "방탄소년단")
+    others = catalog.group_member_indexes["blackpink"]
+    assert fuzzy_match.accepts("로제", "Rose", 1, others)
+    assert fuzzy_match.accepts("Rosé", "Rose", 0, others)
+    assert not fuzzy_match.accepts("로제", "Lisa", 1, others)
+    # the birth name belongs to Rose, not to Twice's Chaeyoung
+    assert fuzzy_match.accepts("Park Chaeyoung", "Rose", 2, catalog.member_index)
+    assert not fuzzy_match.accepts("Park Chaeyoung", "Chaeyoung", 2, catalog.member_index)
+    assert catalog.search.search("kim namjoon").hits == (Hit("bts", "RM"),)
+
+
+def test_photo_folders_named_by_alias(tmp_path):
+    index = PhotoIndex.build(
+        [
+            ("blackpink", "로제", ["/kpop_images/blackpink/로제/1.jpg"]),
+            ("blackpink", "Rosé", ["/kpop_images/blackpink/Rosé/2.jpg"]),
+            ("(G)I-DLE", "Minnie", ["/kpop_images/(G)I-DLE/Minnie/1.jpg"]),
+            ("bts", "J-Hope", ["/kpop_images/bts/J-Hope/1.jpg"]),
+        ],
+        _aliases(tmp_path),
+    )
+    assert index.paths("blackpink", "Rose") == (
+        "/kpop_images/blackpink/로제/1.jpg",
+        "/kpop_images/blackpink/Rosé/2.jpg",
+    )
+    assert index.paths("i-dle", "Minnie") == ("/kpop_images/(G)I-DLE/Minnie/1.jpg",)
+    assert index.has_photos("bts", "JHope")
+    index.rename("/kpop_images/blackpink/로제/1.jpg", "/kpop_images/blackpink/로제/3.jpg")
+    assert "/kpop_images/blackpink/로제/3.jpg" in index.paths("blackpink", "Park Chaeyoung")
+    # without a group, an alias finds the member it stands for only
+    assert index.lookup("Park Chaeyoung") == index.paths("blackpink", "Rose")
+    assert index.lookup("Kim Namjoon") == ()
+    assert index.lookup("Rose") == index.paths("blackpink", "Rose")
+
+
+def test_photo_index_resolves_aliases_without_refolding(tmp_path, monkeypatch):
+    import name_aliases
+
+    index = PhotoIndex.build(
+        [("blackpink", "로제", ["/kpop_images/blackpink/로제/1.jpg"])], _aliases(tmp_path)
+    )
+
+    def no_fold(name):
+        raise AssertionError("alias tables must be folded once, when the index is built")
+
+    monkeypatch.setattr(name_aliases, "fold", no_fold)
+    assert index.paths("blackpink", "Park Chaeyoung") == ("/kpop_images/blackpink/로제/1.jpg",)
+    index.add("blackpink", "Rose", "/kpop_images/blackpink/rose/2.jpg")
+    assert len(index.lookup("로제")) == 2
+
+
+def test_shipped_alias_file_matches_groups():
+    aliases = load_aliases(str(ROOT / "aliases.json"))
+    for key in aliases.groups:
+        assert key in app.ALL_GROUPS, key
+    for key, member in aliases.members:
+        assert member in app.ALL_GROUPS[key], (key, member)
+    assert app.ALL_CATALOG.is_answer("Jimin", "방탄소년단")
@@ -0,0 +1,70 @@
+import random
+from io import BytesIO
+
+import pytest
+
+import app
+import perceptual_hash
+
+
+def test_hamming_index_matches_brute_force():
+    rng = random.Random(7)
+    index = perceptual_hash.HammingIndex()
+    values = {}
+    for i in range(2000):
+        value = rng.getrandbits(64)
+        values[f"p{i}"] = value
+        index.add(f"p{i}", value)
+    # near copies of a few photos
+    base = values["p0"]
+    for bits, key in [(1, "near1"), (5, "near5"), (9, "near9")]:
+        value = base
+        for bit in rng.sample(range(64), bits):
+            value ^= 1 << bit
+        values[key] = value
+        index.add(key, value)
+
+    for radius in (0, 3, 6, 10):
+        expected = sorted(
+            (perceptual_hash.hamming(base, v), k)
+            for k, v in values.items()
+            if perceptual_hash.hamming(base, v) <= radius
+        )
+        assert index.search(base, radius) == expected
+
+    index.remove("near1")
+    assert "near1" not in [k for _, k in index.search(base, 6)]
+
+
+def _gradient_jpeg(size, quality):
+    Image = pytest.importorskip("PIL.Image")
+    img = Image.new("RGB", (64, 64))
+    img.putdata([(x * 4, y * 4, (x * y) % 256) for y in range(64) for x in range(64)])
+    img = img.resize(size)
+    buf = BytesIO()
+    img.save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def test_dhash_tolerates_recompression():
+    original = perceptual_hash.dhash_bytes(_gradient_jpeg((256, 256), 95))
+    copy = perceptual_hash.dhash_bytes(_gradient_jpeg((120, 120), 40))
+    assert perceptual_hash.hamming(original, copy) <= perceptual_hash.DEFAULT_THRESHOLD
+    assert perceptual_hash.dhash_bytes(b"not an image") is None
+
+
+def test_save_user_photo_rejects_recompressed_copy(tmp_path, monkeypatch):
+    original = _gradient_jpeg((256, 256), 95)
+    monkeypatch.setattr(app, "DROPBOX_ROOT", tmp_path)
+    monkeypatch.setattr(app, "PHOTO_INDEX", app.photo_index.PhotoIndex())
+    monkeypatch.setattr(app, "_HASH_INDEX", None)
+    monkeypatch.setattr(app, "_PHASH_INDEX", None)
+    assert app.save_user_photo("twice", "Momo", original, ".jpg")
+
+    with pytest.raises(app.NearDuplicatePhotoError) as exc:
+        app.save_user_photo("itzy", "Yeji", _gradient_jpeg((120, 120), 40), ".jpg")
+    assert exc.value.owner == ("twice", "momo")
+
+    # the index is persisted and used by the report
+    index = perceptual_hash.load_library_index(tmp_path)
+    assert list(index.hashes) == ["kpop_images/twice/momo/momo__01.jpg"]
@@ -0,0 +1,53 @@
+import app
+
+
+def _isolate_library(monkeypatch):
+    """Let ``reload_dropbox_photos`` and uploads replace the module globals
+    without leaking indexes built from ``tmp_path`` into other tests."""
+    for name in (
+        "PHOTO_INDEX", "_HASH_INDEX", "_PHASH_INDEX", "_HASH_CACHE", "_PHOTO_PACK"
+    ):
+        monkeypatch.setattr(app, name, getattr(app, name))
+    monkeypatch.setattr(app, "FILENAME_ALLOCATOR", app.MemberFilenameAllocator())
+
+
+def test_lru_evicts_by_byte_budget():
+    cache = app.PhotoByteCache(max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    assert cache.get("a") == b"1234"  # "a" becomes most recently used
+    cache.put("c", b"1234")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1234"
+    assert cache.get("c") == b"1234"
+    cache.put("huge", b"x" * 11)
+    assert cache.get("huge") is None
+    stats = cache.stats()
+    assert stats["bytes"] == 8
+    assert stats["evictions"] == 1
+    assert (stats["hits"], stats["misses"]) == (3, 2)
+
+
+def test_read_dropbox_photo_served_from_cache(tmp_path, monkeypatch):
+    _isolate_library(monkeypatch)
+    monkeypatch.setattr(app, "DROPBOX_ROOT", str(tmp_path))
+    monkeypatch.setattr(app, "PHOTO_CACHE", app.PhotoByteCache(1024))
+    (tmp_path / "p.jpg").write_bytes(b"img")
+    assert app.read_dropbox_photo("/p.jpg") == b"img"
+    (tmp_path / "p.jpg").unlink()
+    assert app.read_dropbox_photo("/p.jpg") == b"img"
+    assert app.PHOTO_CACHE.stats()["hits"] == 1
+
+    app.reload_dropbox_photos()
+    assert app.read_dropbox_photo("/p.jpg") is None
+
+
+def test_save_user_photo_invalidates_cache(tmp_path, monkeypatch):
+    _isolate_library(monkeypatch)
+    monkeypatch.setattr(app, "DROPBOX_ROOT", str(tmp_path))
+    monkeypatch.setattr(app, "PHOTO_INDEX", app.photo_index.PhotoIndex())
+    monkeypatch.setattr(app, "PHOTO_CACHE", app.PhotoByteCache(1024))
+    rel = "/kpop_images/g/idol/idol__01.jpg"
+    app.PHOTO_CACHE.put(rel, b"stale")
+    assert app.save_user_photo("g", "idol", b"fresh", ".jpg")
+    assert app.read_dropbox_photo(rel) == b"fresh"
@@ -1,3 +1,5 @@
+import asyncio
+
 import app
 
 
@@ -6,28 +8,38 @@ class DummyContext:
         self.user_data = {}
 
 
+def _no_reads(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("photos must not be read when the game starts")
+
+    monkeypatch.setattr(app, "fetch_dropbox_images", fail)
+    monkeypatch.setattr(app, "read_dropbox_photo", fail)
+
+
 def test_start_photo_game_dropbox(monkeypatch):
     # Подготовим тестовые данные: у двух айдолов есть изображения, у одного нет
     groups = {"g": ["idol one", "idol two", "idol three"]}
     monkeypatch.setattr(app, "ALL_GROUPS", groups)
     monkeypatch.setattr(app, "PHOTO_GAME_QUESTIONS", 3)
 
-    def fake_fetch(name):
+    def fake_paths(name, group=None):
         if name == "idol one":
-            return [b"img1", b"img2"]
+            return ["/one/1.jpg", "/one/2.jpg"]
         if name == "idol two":
-            return [b"img3"]
+            return ["/two/1.jpg"]
         return []
 
-    monkeypatch.setattr(app, "fetch_dropbox_images", fake_fetch)
+    monkeypatch.setattr(app, "member_photo_paths", fake_paths)
+    _no_reads(monkeypatch)
 
     ctx = DummyContext()
     assert app.start_photo_game(ctx)
-    items = ctx.user_data["game"]["items"]
+    items = ctx.user_data["game"].items
     assert len(items) == 3
-    names = [item["name"] for item in items]
+    names = [item.name for item in items]
     assert names.count("idol one") == 2
     assert names.count("idol two") == 1
+    assert sorted(item.path for item in items) == ["/one/1.jpg", "/one/2.jpg", "/two/1.jpg"]
 
 
 def test_photo_game_picks_unique_images(monkeypatch):
@@ -35,17 +47,39 @@ def test_photo_game_picks_unique_images(monkeypatch):
     groups = {"g": [f"idol {i}" for i in range(30)]}
     monkeypatch.setattr(app, "ALL_GROUPS", groups)
     monkeypatch.setattr(app, "PHOTO_GAME_QUESTIONS", 20)
-
-    def fake_fetch(name):
-        idx = int(name.split()[1])
-        # каждая участница имеет одно уникальное изображение
-        return [bytes([idx])]
-
-    monkeypatch.setattr(app, "fetch_dropbox_images", fake_fetch)
+    # каждая участница имеет одно уникальное изображение
+    monkeypatch.setattr(app, "member_photo_paths", lambda name, group=None: [f"/{name}.jpg"])
+    _no_reads(monkeypatch)
 
     ctx = DummyContext()
     assert app.start_photo_game(ctx)
-    items = ctx.user_data["game"]["items"]
+    items = ctx.user_data["game"].items
     assert len(items) == 20
-    images = [item["image"] for item in items]
-    assert len(set(images)) == 20
+    paths = [item.path for item in items]
+    assert len(set(paths)) == 20
+    for item in items:
+        assert item.path == f"/{item.name}.jpg"
+
+
+def test_photo_question_reads_only_sent_image(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "DROPBOX_ROOT", str(tmp_path))
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "1.jpg").write_bytes(b"img")
+    (tmp_path / "a" / "2.jpg").write_bytes(b"other")
+    reads = []
+    real_read = app.read_dropbox_photo
+
+    def counting_read(path):
+        reads.append(path)
+        return real_read(path)
+
+    sent = []
+
+    class DummyMsg:
+        async def reply_photo(self, photo, caption="", **kwargs):
+            sent.append((photo.getvalue(), caption))
+
+    monkeypatch.setattr(app, "read_dropbox_photo", counting_read)
+    asyncio.run(app.send_photo_question(DummyMsg(), app.sessions.PhotoItem("a", "/a/1.jpg")))
+    assert reads == ["/a/1.jpg"]
+    assert sent == [(b"img", "Кто это?")]
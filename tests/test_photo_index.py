@@ -0,0 +1,42 @@
+import photo_index
+
+
+def _index():
+    return photo_index.PhotoIndex.build([
+        ("newjeans", "Minji", ["/kpop_images/newjeans/Minji/1.jpg"]),
+        ("other", "Kim Minji", ["/kpop_images/other/Kim Minji/1.jpg"]),
+        ("other", "Kim Yuna", ["/kpop_images/other/Kim Yuna/1.jpg"]),
+        ("le sserafim", "Kazuha", ["/kpop_images/le sserafim/Kazuha/1.jpg"]),
+    ])
+
+
+def test_namesakes_in_different_groups_stay_apart():
+    index = _index()
+    assert index.paths("newjeans", "minji") == ("/kpop_images/newjeans/Minji/1.jpg",)
+    # A token of the folder name is an alias inside its group
+    assert index.paths("other", "Minji") == ("/kpop_images/other/Kim Minji/1.jpg",)
+    assert index.paths("Le-Sserafim", "KAZUHA") == ("/kpop_images/le sserafim/Kazuha/1.jpg",)
+    # ... unless two members of the group share it
+    assert index.paths("other", "Kim") == ()
+    assert index.paths("newjeans", "Kazuha") == ()
+    # Without a group every member using the name matches
+    assert sorted(index.lookup("minji")) == [
+        "/kpop_images/newjeans/Minji/1.jpg",
+        "/kpop_images/other/Kim Minji/1.jpg",
+    ]
+    assert len(index.lookup("kim")) == 2
+
+
+def test_add_and_rename_replace_tuples():
+    index = _index()
+    before = index.paths("other", "Kim Minji")
+    index.add("other", "Kim Minji", "/kpop_images/other/Kim Minji/2.jpg")
+    assert before == ("/kpop_images/other/Kim Minji/1.jpg",)  # readers keep their copy
+    index.rename("/kpop_images/other/Kim Minji/2.jpg", "/kpop_images/other/Kim Minji/3.jpg")
+    assert index.paths("other", "minji") == (
+        "/kpop_images/other/Kim Minji/1.jpg",
+        "/kpop_images/other/Kim Minji/3.jpg",
+    )
+    assert "/kpop_images/other/Kim Minji/3.jpg" in index.lookup("kim")
+    index.add("newjeans", "Hanni", "/kpop_images/newjeans/Hanni/1.jpg")
+    assert index.has_photos("newjeans", "hanni") and len(index) == 5
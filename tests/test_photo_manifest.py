@@ -0,0 +1,67 @@
+import os
+
+import app
+import photo_manifest
+
+
+def _make_tree(root):
+    for group, member, files in [
+        ("g1", "Idol One", ["a.jpg", "b.jpg"]),
+        ("g2", "idol two", ["c.jpg"]),
+    ]:
+        member_dir = root / group / member
+        member_dir.mkdir(parents=True)
+        for name in files:
+            (member_dir / name).write_bytes(name.encode())
+
+
+def test_manifest_persisted_and_reused(tmp_path, monkeypatch):
+    images = tmp_path / "kpop_images"
+    _make_tree(images)
+    manifest = photo_manifest.update_manifest(images)
+    assert photo_manifest.manifest_path(images).exists()
+    assert list(photo_manifest.iter_member_files(manifest)) == [
+        ("g1", "Idol One", ["a.jpg", "b.jpg"]),
+        ("g2", "idol two", ["c.jpg"]),
+    ]
+
+    # unchanged tree: no directory is listed again
+    def fail_scandir(*args, **kwargs):
+        raise AssertionError("unexpected rescan")
+
+    monkeypatch.setattr(photo_manifest.os, "scandir", fail_scandir)
+    loaded = photo_manifest.load_manifest(photo_manifest.manifest_path(images))
+    _, changed = photo_manifest.refresh_manifest(images, loaded)
+    assert not changed
+
+
+def test_manifest_detects_new_files(tmp_path):
+    images = tmp_path / "kpop_images"
+    _make_tree(images)
+    photo_manifest.update_manifest(images)
+
+    member_dir = images / "g2" / "idol two"
+    (member_dir / "d.jpg").write_bytes(b"d")
+    # make sure the directory mtime differs even on coarse filesystems
+    st = os.stat(member_dir)
+    os.utime(member_dir, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    (images / "g3" / "new").mkdir(parents=True)
+    (images / "g3" / "new" / "e.jpg").write_bytes(b"e")
+
+    manifest = photo_manifest.update_manifest(images)
+    files = {(g, m): f for g, m, f in photo_manifest.iter_member_files(manifest)}
+    assert files[("g2", "idol two")] == ["c.jpg", "d.jpg"]
+    assert files[("g3", "new")] == ["e.jpg"]
+
+
+def test_scan_dropbox_photos_uses_manifest(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "DROPBOX_ROOT", str(tmp_path))
+    images = tmp_path / "kpop_images"
+    _make_tree(images)
+    index = app._scan_dropbox_photos(images)
+    assert index.paths("g1", "Idol One") == (
+        "/kpop_images/g1/Idol One/a.jpg",
+        "/kpop_images/g1/Idol One/b.jpg",
+    )
+    assert index.lookup("two") == ("/kpop_images/g2/idol two/c.jpg",)
+    assert photo_manifest.manifest_path(images).exists()
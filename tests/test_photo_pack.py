@@ -0,0 +1,131 @@
+import os
+import threading
+
+import app
+import photo_manifest
+import photo_pack
+
+
+def _library(tmp_path):
+    member = tmp_path / "kpop_images" / "twice" / "momo"
+    member.mkdir(parents=True)
+    for i in range(3):
+        (member / f"momo__{i:02d}.jpg").write_bytes(b"photo-%d" % i)
+    return member
+
+
+def test_update_append_and_compact(tmp_path):
+    member = _library(tmp_path)
+    images_root = tmp_path / "kpop_images"
+    pack = photo_pack.PhotoPack.load(photo_pack.index_path(images_root))
+    paths = photo_manifest.library_paths(images_root)
+
+    assert pack.update(tmp_path, paths) == 3
+    assert pack.update(tmp_path, paths) == 0  # nothing changed
+    view = pack.get("kpop_images/twice/momo/momo__01.jpg")
+    assert isinstance(view, memoryview) and bytes(view) == b"photo-1"
+
+    # Replaced and removed photos leave dead space behind
+    (member / "momo__00.jpg").write_bytes(b"replaced")
+    os.utime(member / "momo__00.jpg", ns=(1, 1))
+    (member / "momo__02.jpg").unlink()
+    assert pack.update(tmp_path, photo_manifest.library_paths(images_root)) == 1
+    pack.append("kpop_images/twice/momo/momo__03.jpg", b"upload")
+    pack.rename("kpop_images/twice/momo/momo__03.jpg", "kpop_images/twice/momo/momo__04.jpg")
+    assert pack.end > pack.live_bytes()
+
+    reloaded = photo_pack.PhotoPack.load(pack.index_file)
+    assert bytes(reloaded.get("kpop_images/twice/momo/momo__00.jpg")) == b"replaced"
+    assert reloaded.get("kpop_images/twice/momo/momo__02.jpg") is None
+
+    old_data = reloaded.data_path
+    assert reloaded.compact() == len(b"photo-0") + len(b"photo-2")
+    assert reloaded.end == reloaded.live_bytes()
+    assert not old_data.exists()
+    assert bytes(reloaded.get("kpop_images/twice/momo/momo__04.jpg")) == b"upload"
+    assert bytes(photo_pack.PhotoPack.load(pack.index_file).get(
+        "kpop_images/twice/momo/momo__01.jpg")) == b"photo-1"
+
+
+def test_read_dropbox_photo_uses_pack(tmp_path, monkeypatch):
+    _library(tmp_path)
+    images_root = tmp_path / "kpop_images"
+    photo_pack.PhotoPack.load(photo_pack.index_path(images_root)).update(
+        tmp_path, photo_manifest.library_paths(images_root)
+    )
+    monkeypatch.setattr(app, "DROPBOX_ROOT", str(tmp_path))
+    monkeypatch.setattr(app, "PHOTO_PACK_ENABLED", True)
+    monkeypatch.setattr(app, "_PHOTO_PACK", None)
+
+    data = app.read_dropbox_photo("/kpop_images/twice/momo/momo__02.jpg")
+    assert isinstance(data, memoryview) and bytes(data) == b"photo-2"
+    # Files missing from the pack are still read from disk
+    (images_root / "twice" / "momo" / "extra.jpg").write_bytes(b"loose")
+    assert app.read_dropbox_photo("/kpop_images/twice/momo/extra.jpg") == b"loose"
+
+
+def test_stale_pack_entry_falls_back_to_loose_file(tmp_path, monkeypatch):
+    member = _library(tmp_path)
+    images_root = tmp_path / "kpop_images"
+    photo_pack.PhotoPack.load(photo_pack.index_path(images_root)).update(
+        tmp_path, photo_manifest.library_paths(images_root)
+    )
+    monkeypatch.setattr(app, "DROPBOX_ROOT", str(tmp_path))
+    monkeypatch.setattr(app, "PHOTO_PACK_ENABLED", True)
+    monkeypatch.setattr(app, "_PHOTO_PACK", None)
+    monkeypatch.setattr(app, "PHOTO_CACHE", app.PhotoByteCache(1 << 20))
+    monkeypatch.setattr(app, "FILE_ID_CACHE", app.TelegramFileIdCache())
+
+    # Replaced by a sync, the pack is not rebuilt yet
+    (member / "momo__01.jpg").write_bytes(b"replaced")
+    os.utime(member / "momo__01.jpg", ns=(1, 1))
+    assert app.read_dropbox_photo("/kpop_images/twice/momo/momo__01.jpg") == b"replaced"
+    digest, _ = app.FILE_ID_CACHE.hash_for_path("/kpop_images/twice/momo/momo__01.jpg")
+    assert digest == app._dropbox_content_hash_bytes(b"replaced")
+
+
+def test_update_reads_files_without_holding_the_lock(tmp_path, monkeypatch):
+    _library(tmp_path)
+    images_root = tmp_path / "kpop_images"
+    pack = photo_pack.PhotoPack.load(photo_pack.index_path(images_root))
+    real_read = photo_pack.Path.read_bytes
+    blocked = []
+
+    def try_lock(name):
+        if pack._lock.acquire(blocking=False):
+            pack._lock.release()
+        else:
+            blocked.append(name)
+
+    def read_bytes(path):
+        thread = threading.Thread(target=try_lock, args=(path.name,))
+        thread.start()
+        thread.join()
+        return real_read(path)
+
+    monkeypatch.setattr(photo_pack.Path, "read_bytes", read_bytes)
+    assert pack.update(tmp_path, photo_manifest.library_paths(images_root)) == 3
+    assert blocked == []
+
+
+def test_compact_in_another_process_is_picked_up(tmp_path):
+    _library(tmp_path)
+    images_root = tmp_path / "kpop_images"
+    index_file = photo_pack.index_path(images_root)
+    bot = photo_pack.PhotoPack.load(index_file)
+    bot.update(tmp_path, photo_manifest.library_paths(images_root))
+    bot.append("kpop_images/twice/momo/momo__00.jpg", b"replaced")
+    assert bytes(bot.get("kpop_images/twice/momo/momo__01.jpg")) == b"photo-1"
+
+    # ``python photo_pack.py compact`` while the bot is running
+    cli = photo_pack.PhotoPack.load(index_file)
+    cli.compact()
+
+    bot.append("kpop_images/twice/momo/momo__03.jpg", b"upload")
+    assert bot.data_name == cli.data_name
+    on_disk = photo_pack.PhotoPack.load(index_file)
+    assert on_disk.data_name == cli.data_name
+    for name, data in [("momo__00", b"replaced"), ("momo__01", b"photo-1"),
+                       ("momo__03", b"upload")]:
+        assert bytes(on_disk.get(f"kpop_images/twice/momo/{name}.jpg")) == data
+        assert bytes(bot.get(f"kpop_images/twice/momo/{name}.jpg")) == data
@@ -7,11 +7,25 @@ sys.path.append(str(ROOT))
 os.environ.setdefault("TELEGRAM_BOT_TOKEN", "dummy")
 os.environ.setdefault("PUBLIC_URL", "https://example.com")
 
-import app
+import pytest
+
+import group_catalog
 
 
 def test_pretty_map_accepts_spaceless_names():
     groups = {"red velvet": ["A", "B"]}
     names_map = {"red velvet": "Red Velvet"}
-    mapping = app.build_pretty_map(groups, names_map)
+    mapping = group_catalog.build_pretty_map(groups, names_map)
     assert mapping["redvelvet"] == "red velvet"
+
+
+def test_compiled_catalog_is_shared_and_read_only():
+    groups = {"a": ["Sam", "Kim"], "b": ["Sam"]}
+    catalog = group_catalog.Catalog.compile(groups, {"a": "Group A"})
+    assert catalog.members == ("Sam", "Kim", "Sam")
+    assert catalog.is_answer("sam", "groupa") and catalog.is_answer("Sam", "b")
+    assert not catalog.is_answer("Kim", "b")
+    groups["a"].append("Lee")  # later edits of the source do not leak in
+    assert catalog.groups["a"] == ("Sam", "Kim")
+    with pytest.raises(TypeError):
+        catalog.pretty_map["c"] = "c"
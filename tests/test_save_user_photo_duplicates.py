@@ -1,3 +1,5 @@
+import threading
+import time
 import app
 import pytest
 from pathlib import Path
@@ -5,7 +7,7 @@ from pathlib import Path
 
 def test_save_user_photo_prevents_duplicates(tmp_path, monkeypatch):
     monkeypatch.setattr(app, "DROPBOX_ROOT", tmp_path)
-    monkeypatch.setattr(app, "DROPBOX_PHOTOS", {})
+    monkeypatch.setattr(app, "PHOTO_INDEX", app.photo_index.PhotoIndex())
     data = b"imgdata"
     assert app.save_user_photo("g", "idol", data, ".jpg")
     member_dir = Path(tmp_path) / "kpop_images" / "g" / "idol"
@@ -14,4 +16,38 @@ def test_save_user_photo_prevents_duplicates(tmp_path, monkeypatch):
         app.save_user_photo("g", "idol", data, ".jpg")
     # Ensure file not duplicated
     assert len(list(member_dir.glob("*"))) == 1
-    assert len(app.DROPBOX_PHOTOS.get("idol", [])) == 1
+    assert len(app.member_photo_paths("idol", "g")) == 1
+
+
+def test_concurrent_identical_uploads_save_one_photo(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "DROPBOX_ROOT", tmp_path)
+    monkeypatch.setattr(app, "PHOTO_INDEX", app.photo_index.PhotoIndex())
+    monkeypatch.setattr(app, "_HASH_INDEX", None)
+    monkeypatch.setattr(app, "_PHASH_INDEX", None)
+    monkeypatch.setattr(app, "_HASH_CACHE", None)
+    real_index = app.photo_hash_index
+
+    def slow_index():
+        index = real_index()
+        time.sleep(0.05)  # widen the window between the check and the write
+        return index
+
+    monkeypatch.setattr(app, "photo_hash_index", slow_index)
+    results = []
+    start = threading.Barrier(2)
+
+    def upload():
+        start.wait()
+        try:
+            results.append(app.save_user_photo("g", "idol", b"same", ".jpg"))
+        except FileExistsError:
+            results.append("duplicate")
+
+    threads = [threading.Thread(target=upload) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results, key=str) == [True, "duplicate"]
+    assert len(list((Path(tmp_path) / "kpop_images" / "g" / "idol").glob("*"))) == 1
@@ -0,0 +1,168 @@
+import pytest
+
+pytest.importorskip("dropbox")
+
+import content_hash
+import dropbox_client
+import sync_dropbox
+import upload_queue
+from local_dropbox import LocalDropbox
+
+
+def _remote_tree(root, count):
+    member = root / "remote" / "kpop_images" / "twice" / "momo"
+    member.mkdir(parents=True)
+    for i in range(count):
+        (member / f"momo__{i:02d}.jpg").write_bytes(b"photo-%d" % i)
+    return root / "remote"
+
+
+def test_parallel_sync_downloads_every_page(tmp_path):
+    remote = _remote_tree(tmp_path, 12)
+    fake = LocalDropbox(remote, page_size=5)
+    local = tmp_path / "local"
+
+    progress = sync_dropbox.sync_folder(fake, "/kpop_images", local, concurrency=4)
+
+    synced = sorted(p.name for p in (local / "kpop_images/twice/momo").iterdir())
+    assert synced == [f"momo__{i:02d}.jpg" for i in range(12)]
+    assert (local / "kpop_images/twice/momo/momo__03.jpg").read_bytes() == b"photo-3"
+    assert (progress.total, progress.downloaded, progress.failed) == (12, 12, 0)
+
+    # Unchanged files are not downloaded again, even by a full listing
+    progress = sync_dropbox.sync_folder(fake, "/kpop_images", local, concurrency=4, full=True)
+    assert fake.downloads == 12
+    assert (progress.total, progress.downloaded) == (12, 0)
+
+
+def test_sync_retries_and_reports_failed_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(dropbox_client, "MAX_RETRIES", 0)
+    remote = _remote_tree(tmp_path, 3)
+    fake = LocalDropbox(remote)
+    fake.failures["/kpop_images/twice/momo/momo__00.jpg"] = 2
+    fake.failures["/kpop_images/twice/momo/momo__01.jpg"] = sync_dropbox.DOWNLOAD_ATTEMPTS
+    local = tmp_path / "local"
+
+    progress = sync_dropbox.sync_folder(fake, "/kpop_images", local, concurrency=2)
+
+    member = local / "kpop_images/twice/momo"
+    assert (member / "momo__00.jpg").read_bytes() == b"photo-0"
+    assert not (member / "momo__01.jpg").exists()
+    assert (progress.downloaded, progress.failed) == (2, 1)
+    # The next run lists everything again to pick up the failed file
+    assert sync_dropbox.load_cursor(local / "kpop_images", "/kpop_images") is None
+
+
+def test_second_sync_lists_only_changes(tmp_path):
+    remote = _remote_tree(tmp_path, 6)
+    fake = LocalDropbox(remote, page_size=4)
+    local = tmp_path / "local"
+    sync_dropbox.sync_folder(fake, "/kpop_images", local)
+    images_root = local / "kpop_images"
+    assert sync_dropbox.load_cursor(images_root, "/kpop_images")
+
+    member = remote / "kpop_images/twice/momo"
+    (member / "momo__00.jpg").write_bytes(b"changed")
+    (member / "momo__01.jpg").unlink()
+    (remote / "kpop_images/twice/sana").mkdir()
+    (remote / "kpop_images/twice/sana/sana__01.jpg").write_bytes(b"new")
+    fake.listed = 0
+
+    progress = sync_dropbox.sync_folder(fake, "/kpop_images", local)
+
+    assert fake.listed == 3  # one change, one deletion, one new file
+    assert progress.downloaded == 2
+    assert (images_root / "twice/momo/momo__00.jpg").read_bytes() == b"changed"
+    assert not (images_root / "twice/momo/momo__01.jpg").exists()
+    assert (images_root / "twice/sana/sana__01.jpg").read_bytes() == b"new"
+
+    # Deleting a whole member folder removes it locally
+    for path in member.iterdir():
+        path.unlink()
+    member.rmdir()
+    sync_dropbox.sync_folder(fake, "/kpop_images", local)
+    assert not (images_root / "twice/momo").exists()
+
+
+def test_reset_cursor_falls_back_to_full_listing(tmp_path):
+    remote = _remote_tree(tmp_path, 3)
+    fake = LocalDropbox(remote)
+    local = tmp_path / "local"
+    sync_dropbox.sync_folder(fake, "/kpop_images", local)
+
+    stray = local / "kpop_images/twice/momo/stray.jpg"
+    stray.write_bytes(b"not in dropbox")
+    fake.reset_cursors()
+    fake.listed = 0
+
+    sync_dropbox.sync_folder(fake, "/kpop_images", local)
+
+    assert fake.listed == 3
+    assert not stray.exists()
+    assert sync_dropbox.load_cursor(local / "kpop_images", "/kpop_images")
+
+
+def test_full_sync_keeps_photos_not_yet_in_dropbox(tmp_path):
+    remote = _remote_tree(tmp_path, 2)
+    fake = LocalDropbox(remote)
+    local = tmp_path / "local"
+    images_root = local / "kpop_images"
+    sync_dropbox.sync_folder(fake, "/kpop_images", local)
+
+    queue = upload_queue.UploadQueue(upload_queue.queue_dir(images_root))
+    queued = images_root / "twice/momo/momo__10.jpg"
+    failed = images_root / "twice/momo/momo__11.jpg"
+    queued.write_bytes(b"waiting")
+    failed.write_bytes(b"gave up")
+    queue.enqueue("kpop_images/twice/momo/momo__10.jpg")
+    job = queue.enqueue("kpop_images/twice/momo/momo__11.jpg")
+    for _ in range(upload_queue.MAX_ATTEMPTS):
+        queue.retry_later(job, "boom")
+    assert queue.status() == {"pending": 1, "failed": 1}
+
+    sync_dropbox.sync_folder(fake, "/kpop_images", local, full=True)
+
+    assert queued.read_bytes() == b"waiting"
+    assert failed.read_bytes() == b"gave up"
+
+
+def test_unchanged_files_are_not_rehashed(tmp_path, monkeypatch):
+    remote = _remote_tree(tmp_path, 4)
+    fake = LocalDropbox(remote)
+    local = tmp_path / "local"
+    cover = local / "cover_image" / "cover1.png"
+    cover.parent.mkdir(parents=True)
+    cover.write_bytes(b"cover")
+    sync_dropbox.sync_folder(fake, "/kpop_images", local)
+
+    hashed = []
+    real_hash = content_hash.hash_file
+    monkeypatch.setattr(
+        content_hash, "hash_file", lambda path: hashed.append(path) or real_hash(path)
+    )
+    sync_dropbox.sync_folder(fake, "/kpop_images", local, full=True)
+
+    assert hashed == []
+    # Files outside the synced folder are left alone
+    assert cover.read_bytes() == b"cover"
+
+
+def test_truncated_download_never_replaces_the_photo(tmp_path, monkeypatch):
+    remote = _remote_tree(tmp_path, 1)
+    fake = LocalDropbox(remote)
+    local = tmp_path / "local"
+    sync_dropbox.sync_folder(fake, "/kpop_images", local)
+    photo = local / "kpop_images/twice/momo/momo__00.jpg"
+
+    (remote / "kpop_images/twice/momo/momo__00.jpg").write_bytes(b"a newer photo")
+    path = "/kpop_images/twice/momo/momo__00.jpg"
+    fake.truncate[path] = sync_dropbox.DOWNLOAD_ATTEMPTS
+    progress = sync_dropbox.sync_folder(fake, "/kpop_images", local)
+    assert progress.failed == 1
+    assert photo.read_bytes() == b"photo-0"
+    assert not any((local / ".kpop_state" / sync_dropbox.DOWNLOAD_DIR).iterdir())
+
+    fake.truncate[path] = 1  # retried within the same run
+    progress = sync_dropbox.sync_folder(fake, "/kpop_images", local)
+    assert (progress.downloaded, progress.failed) == (1, 0)
+    assert photo.read_bytes() == b"a newer photo"
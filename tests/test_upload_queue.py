@@ -0,0 +1,120 @@
+import asyncio
+import shutil
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import app
+import upload_queue
+
+
+def test_queue_survives_restart_and_backs_off(tmp_path):
+    queue = upload_queue.UploadQueue(tmp_path / "q")
+    job = queue.enqueue("kpop_images/g/a/a__01.jpg")
+    queue.enqueue("kpop_images/g/a/a__02.jpg")
+
+    reopened = upload_queue.UploadQueue(tmp_path / "q")
+    assert [j["path"] for j in reopened.pending()] == [
+        "kpop_images/g/a/a__01.jpg",
+        "kpop_images/g/a/a__02.jpg",
+    ]
+    assert reopened.retry_later(job, "boom", now=1000.0)
+    assert [j["path"] for j in reopened.due(now=1000.0)] == ["kpop_images/g/a/a__02.jpg"]
+    assert reopened.next_due_in(now=1000.0) == 0.0
+    assert reopened.status() == {"pending": 2, "failed": 0}
+
+    for _ in range(upload_queue.MAX_ATTEMPTS):
+        reopened.retry_later(job, "boom", now=1000.0)
+    assert reopened.status() == {"pending": 1, "failed": 1}
+    assert reopened.held_paths() == {"kpop_images/g/a/a__01.jpg", "kpop_images/g/a/a__02.jpg"}
+    reopened.retarget("kpop_images/g/a/a__01.jpg", "kpop_images/g/a/a__03.jpg")
+    assert [j["path"] for j in reopened.failed()] == ["kpop_images/g/a/a__03.jpg"]
+
+
+def test_save_user_photo_queues_upload(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "DROPBOX_ROOT", tmp_path)
+    monkeypatch.setattr(app, "PHOTO_INDEX", app.photo_index.PhotoIndex())
+    assert app.save_user_photo("g", "idol", b"imgdata", ".jpg")
+    assert app.photo_upload_queue().pending_paths() == {"kpop_images/g/idol/idol__01.jpg"}
+
+    uploaded = []
+    fail = {"once": True}
+
+    def fake_upload(rel_path):
+        if fail.pop("once", False):
+            raise ConnectionError("network down")
+        uploaded.append(rel_path)
+
+    monkeypatch.setattr(app, "upload_photo_to_dropbox", fake_upload)
+    monkeypatch.setattr(upload_queue, "BACKOFF_BASE", 0.0)
+    assert asyncio.run(app.process_upload_queue()) == 0
+    assert app.photo_upload_queue().pending()[0]["attempts"] == 1
+    assert asyncio.run(app.process_upload_queue()) == 1
+    assert uploaded == ["kpop_images/g/idol/idol__01.jpg"]
+    assert app.photo_upload_queue().depth() == 0
+
+
+def test_on_photo_acknowledges_before_upload(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "DROPBOX_ROOT", tmp_path)
+    monkeypatch.setattr(app, "PHOTO_INDEX", app.photo_index.PhotoIndex())
+
+    def no_upload(rel_path):
+        raise AssertionError("upload must not run inside the handler")
+
+    monkeypatch.setattr(app, "upload_photo_to_dropbox", no_upload)
+    replies = []
+
+    async def get_file():
+        async def download_as_bytearray():
+            return bytearray(b"photo-bytes")
+
+        return SimpleNamespace(file_path="photos/file_1.jpg", download_as_bytearray=download_as_bytearray)
+
+    async def reply_text(text, **kwargs):
+        replies.append(text)
+
+    update = SimpleNamespace(
+        effective_user=SimpleNamespace(id=777),
+        message=SimpleNamespace(
+            photo=[SimpleNamespace(file_size=100, get_file=get_file)],
+            reply_text=reply_text,
+        ),
+    )
+    ctx = SimpleNamespace(
+        user_data={"mode": "upload_wait_photo", "upload_group": "g", "upload_member": "idol"}
+    )
+    asyncio.run(app.on_photo(update, ctx))
+    assert replies == ["Фото успешно загружено! В очереди на отправку в Dropbox: 1."]
+    assert Path(tmp_path / "kpop_images" / "g" / "idol" / "idol__01.jpg").exists()
+
+
+def test_uploaded_photo_is_not_synced_twice(tmp_path, monkeypatch):
+    pytest.importorskip("dropbox")
+    import sync_dropbox
+    from local_dropbox import LocalDropbox
+
+    remote = tmp_path / "remote"
+    (remote / "kpop_images/twice/momo").mkdir(parents=True)
+    (remote / "kpop_images/twice/momo/momo__01.jpg").write_bytes(b"theirs")
+    fake = LocalDropbox(remote)
+    local = tmp_path / "local"
+    sync_dropbox.sync_folder(fake, "/kpop_images", local)
+
+    monkeypatch.setattr(app, "DROPBOX_ROOT", local)
+    monkeypatch.setattr(app, "PHOTO_INDEX", app.photo_index.PhotoIndex())
+    monkeypatch.setattr(app, "FILENAME_ALLOCATOR", app.MemberFilenameAllocator())
+    monkeypatch.setattr(app, "_HASH_INDEX", None)
+    assert app.save_user_photo("twice", "Momo", b"mine", ".jpg")
+    [rel_path] = app.photo_upload_queue().pending_paths()
+    assert rel_path == "kpop_images/twice/momo/momo__02.jpg"
+
+    # The upload reaches Dropbox; the next listing reports its path_lower
+    shutil.copy(local / rel_path, remote / rel_path)
+    app.photo_upload_queue().complete(app.photo_upload_queue().pending()[0])
+    progress = sync_dropbox.sync_folder(fake, "/kpop_images", local)
+
+    assert progress.downloaded == 0
+    files = sorted(p.relative_to(local).as_posix()
+                   for p in (local / "kpop_images/twice").rglob("*.jpg"))
+    assert files == ["kpop_images/twice/momo/momo__01.jpg", rel_path]
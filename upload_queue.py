@@ -0,0 +1,141 @@
+"""Durable on-disk queue of photos waiting to be uploaded to Dropbox.
+
+``app.save_user_photo`` stores the photo locally and drops a small JSON job
+into ``<state>/upload_queue``; a background worker in ``app`` uploads it
+and removes the job. Jobs are plain files, so they survive restarts, and
+``sync_dropbox.py`` uses ``held_paths`` to avoid deleting photos that have
+not reached Dropbox yet.
+
+Failed attempts are retried with exponential backoff; after
+``MAX_ATTEMPTS`` the job is moved to ``upload_queue/failed`` for a human to
+look at. Its photo stays in ``held_paths``, so a sync never deletes it.
+"""
+
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+import photo_manifest
+
+QUEUE_DIR = "upload_queue"
+FAILED_DIR = "failed"
+MAX_ATTEMPTS = 10
+BACKOFF_BASE = 5.0  # seconds
+BACKOFF_MAX = 15 * 60.0
+
+Job = Dict[str, object]
+
+
+def queue_dir(images_root: Path) -> Path:
+    return photo_manifest.state_dir(images_root) / QUEUE_DIR
+
+
+class UploadQueue:
+    """FIFO of upload jobs, one JSON file per job in ``directory``."""
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = Path(directory)
+
+    def enqueue(self, rel_path: str) -> Job:
+        """Add a job for ``rel_path`` (relative to ``DROPBOX_ROOT``)."""
+        job: Job = {
+            "id": f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}",
+            "path": rel_path,
+            "attempts": 0,
+            "next_try": 0.0,
+            "error": None,
+        }
+        self._write(job)
+        return job
+
+    def _job_file(self, job: Job, directory: Optional[Path] = None) -> Path:
+        return (directory or self.directory) / f"{job['id']}.json"
+
+    def _write(self, job: Job, directory: Optional[Path] = None) -> None:
+        photo_manifest.write_json_atomic(self._job_file(job, directory), job)
+
+    def _read_dir(self, directory: Path) -> List[Job]:
+        jobs: List[Job] = []
+        try:
+            entries = sorted(p for p in directory.iterdir() if p.suffix == ".json")
+        except OSError:
+            return jobs
+        for path in entries:
+            try:
+                with path.open("r", encoding="utf-8") as f:
+                    jobs.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return jobs
+
+    def refresh(self, job: Job) -> Job:
+        """``job`` as stored now (``retarget`` may have changed its path)."""
+        try:
+            with self._job_file(job).open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return job
+
+    def pending(self) -> List[Job]:
+        """All waiting jobs, oldest first."""
+        return self._read_dir(self.directory)
+
+    def failed(self) -> List[Job]:
+        return self._read_dir(self.directory / FAILED_DIR)
+
+    def due(self, now: Optional[float] = None) -> List[Job]:
+        now = time.time() if now is None else now
+        return [job for job in self.pending() if float(job.get("next_try", 0)) <= now]
+
+    def next_due_in(self, now: Optional[float] = None) -> Optional[float]:
+        """Seconds until the earliest pending job is due (``None`` if empty)."""
+        now = time.time() if now is None else now
+        times = [float(job.get("next_try", 0)) for job in self.pending()]
+        return max(0.0, min(times) - now) if times else None
+
+    def complete(self, job: Job) -> None:
+        try:
+            os.remove(self._job_file(job))
+        except FileNotFoundError:
+            pass
+
+    def retry_later(self, job: Job, error: str, now: Optional[float] = None) -> bool:
+        """Record a failed attempt. Returns ``False`` if the job gave up."""
+        now = time.time() if now is None else now
+        attempts = int(job.get("attempts", 0)) + 1
+        job["attempts"] = attempts
+        job["error"] = error
+        if attempts >= MAX_ATTEMPTS:
+            self._write(job, self.directory / FAILED_DIR)
+            self.complete(job)
+            return False
+        job["next_try"] = now + min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+        self._write(job)
+        return True
+
+    def retarget(self, old_path: str, new_path: str) -> None:
+        """Point jobs for ``old_path`` at ``new_path`` (the file was renamed)."""
+        for directory in (self.directory, self.directory / FAILED_DIR):
+            for job in self._read_dir(directory):
+                if job.get("path") == old_path:
+                    job["path"] = new_path
+                    self._write(job, directory)
+
+    def depth(self) -> int:
+        try:
+            return sum(1 for p in self.directory.iterdir() if p.suffix == ".json")
+        except OSError:
+            return 0
+
+    def pending_paths(self) -> Set[str]:
+        return {str(job["path"]) for job in self.pending()}
+
+    def held_paths(self) -> Set[str]:
+        """Photos only the bot has: waiting for upload or given up on."""
+        return self.pending_paths() | {str(job["path"]) for job in self.failed()}
+
+    def status(self) -> Dict[str, int]:
+        return {"pending": self.depth(), "failed": len(self.failed())}